@@ -0,0 +1,103 @@
+"""Benchmark de arranque de `inicio.py`: primera pasada y pasadas siguientes, contra un CEN local.
+
+Cada variante corre en un proceso nuevo (imports en frío) con `streamlit.testing.AppTest`:
+
+- `perezoso`: la app tal cual (folium y matplotlib se cargan al precalentar o al dibujar,
+  hoja de estilos servida como archivo estático).
+- `ansioso`: importa folium y matplotlib antes del script y corre fuera de la raíz, sin
+  `.streamlit/config.toml` (sin estáticos: la hoja va incrustada en cada pasada), como antes
+  de cargar perezosamente.
+
+Reporta el tiempo de la primera pasada (vista de espera, sin datos), p50/p95 de las pasadas
+con datos y los bytes de Markdown que envía cada pasada.
+
+    python -m bench.bench_arranque
+    python -m bench.bench_arranque --reps 20 --json arranque.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from bench.cen_local import CENLocal
+
+RAIZ = Path(__file__).resolve().parent.parent
+VARIANTES = ('perezoso', 'ansioso')
+
+
+def hijo(variante, reps):
+    """Mide dentro de un proceso nuevo; imprime el resultado como JSON."""
+    t0 = time.perf_counter()
+    if variante == 'ansioso':
+        import folium.plugins  # noqa: F401
+        import matplotlib.figure  # noqa: F401
+        from matplotlib.backends import backend_agg  # noqa: F401
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(RAIZ / 'inicio.py'), default_timeout=120)
+    at.secrets['CEN_KEY'] = 'bench'
+    at.run()
+    primera = time.perf_counter() - t0
+
+    from monitor.poller import almacen
+    while almacen.leer()[1] is None:
+        time.sleep(0.05)
+    # Una pasada para llenar las caches de mapas y gráficos; después se mide el costo estable por pasada.
+    at.run()
+    tiempos = []
+    for _ in range(reps):
+        t = time.perf_counter()
+        at.run()
+        tiempos.append(time.perf_counter() - t)
+    return {
+        'primera_ms': primera * 1000,
+        'pasada_p50_ms': float(np.percentile(tiempos, 50) * 1000),
+        'pasada_p95_ms': float(np.percentile(tiempos, 95) * 1000),
+        'markdown_bytes': sum(len(m.value.encode()) for m in at.markdown),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--reps', type=int, default=10)
+    parser.add_argument('--latencia', type=float, default=0.05)
+    parser.add_argument('--json', help='guarda los resultados en este archivo')
+    parser.add_argument('--hijo', choices=VARIANTES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        print(json.dumps(hijo(args.hijo, args.reps)))
+        return
+
+    dir_tmp = tempfile.mkdtemp(prefix='bench_arranque_')
+    cen_local = CENLocal(args.latencia).iniciar()
+    resultados = {}
+    try:
+        for variante in VARIANTES:
+            env = {**os.environ, 'CEN_URL': cen_local.url, 'CEN_RPS': '1000', 'CEN_BURST': '1000',
+                   'MONITOR_DB': os.path.join(dir_tmp, f'{variante}.sqlite3'), 'PYTHONPATH': str(RAIZ)}
+            salida = subprocess.run(
+                [sys.executable, '-m', 'bench.bench_arranque', '--hijo', variante, '--reps', str(args.reps)],
+                cwd=RAIZ if variante == 'perezoso' else dir_tmp, env=env, capture_output=True, text=True, check=True,
+            )
+            resultados[variante] = json.loads(salida.stdout.strip().splitlines()[-1])
+    finally:
+        cen_local.detener()
+
+    print(f'{"variante":<10} {"1ª pasada ms":>13} {"p50 ms":>9} {"p95 ms":>9} {"markdown B":>11}')
+    for variante, r in resultados.items():
+        print(f'{variante:<10} {r["primera_ms"]:>13.0f} {r["pasada_p50_ms"]:>9.1f} {r["pasada_p95_ms"]:>9.1f} '
+              f'{r["markdown_bytes"]:>11}')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(resultados, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""Benchmark del ciclo refresco + render contra un CEN local.
+
+Mide, para 3, 30 y 300 centrales sintéticas: la descarga (red, reintentos y guardado
+en el historial), el parseo, `generate_chart_img` (png y svg), el HTML del mapa y la
+tabla de últimos registros. Reporta p50/p95, memoria pico y bytes emitidos.
+
+    python -m bench.bench_refresco
+    python -m bench.bench_refresco --centrales 3 30 --reps 10 --latencia 0.2 --tasa-429 0.05 --json bench.json
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from bench.cen_local import CENLocal
+
+
+def _medir(funcion, reps, preparar=None):
+    tiempos = []
+    resultado = None
+    for _ in range(reps):
+        if preparar is not None:
+            preparar()
+        t0 = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - t0)
+    if preparar is not None:
+        preparar()
+    tracemalloc.start()
+    funcion()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'p50_ms': float(np.percentile(tiempos, 50) * 1000),
+        'p95_ms': float(np.percentile(tiempos, 95) * 1000),
+        'pico_kb': pico / 1024,
+    }, resultado
+
+
+def _bytes_tabla(df):
+    import pyarrow as pa
+
+    sink = io.BytesIO()
+    tabla = pa.Table.from_pandas(df)
+    with pa.ipc.new_stream(sink, tabla.schema) as writer:
+        writer.write_table(tabla)
+    return sink.tell()
+
+
+def correr(n, reps, cen_local, dir_tmp):
+    from monitor import cen
+    from monitor.cache import cache_cen
+    from monitor.centrales import Registro
+    from monitor.graficos import cache_graficos, generate_chart_img
+    from monitor.historial import Historial
+    from monitor.mapas import cache_mapas, html_mapa_centrales
+    from monitor.motor import consultar_en_paralelo
+    from monitor.vistas import tabla_registros
+
+    centrales = Registro({'nombre': f'CENTRAL {i:03d}', 'id': 1000 + i, 'lat': -37.3 + i * 0.001, 'lon': -71.5}
+                         for i in range(n))
+    desde = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+    filas = {}
+    contador = [0]
+
+    def historial_nuevo():
+        contador[0] += 1
+        cen.historial = Historial(os.path.join(dir_tmp, f'h{n}_{contador[0]}.sqlite3'))
+        cache_cen.limpiar()
+
+    def descargar():
+        tareas = {nombre: (info['id'], nombre, 'bench', True) for nombre, info in centrales.items()}
+        return dict(consultar_en_paralelo(cen.obtener_datos_central, tareas))
+
+    bytes_antes = cen_local.bytes_enviados
+    pet_antes, r429_antes = cen_local.peticiones, cen_local.respuestas_429
+    filas['descarga'], _ = _medir(descargar, reps, historial_nuevo)
+    filas['descarga']['bytes'] = (cen_local.bytes_enviados - bytes_antes) // (reps + 1)
+    filas['descarga']['peticiones'] = (cen_local.peticiones - pet_antes) // (reps + 1)
+    filas['descarga']['429'] = cen_local.respuestas_429 - r429_antes
+
+    def parsear():
+        return [{'nombre': nombre, 'info': info,
+                 'datos': cen.resumir_central(nombre, cen.historial.leer(info['id'], desde=desde))}
+                for nombre, info in centrales.items()]
+
+    filas['parseo'], datos = _medir(parsear, reps)
+
+    for modo in ('png', 'svg'):
+        def graficos():
+            return [generate_chart_img(item['datos'].get('full_history'), modo=modo) for item in datos]
+
+        filas[f'grafico_{modo}'], imgs = _medir(graficos, reps, cache_graficos.limpiar)
+        filas[f'grafico_{modo}']['bytes'] = sum(len(i) for i in imgs if i)
+
+        def mapa():
+            return html_mapa_centrales(datos, modo)
+
+        # Con los gráficos ya en cache: mide sólo la construcción y serialización de folium.
+        filas[f'mapa_{modo}'], html = _medir(mapa, reps, cache_mapas.limpiar)
+        filas[f'mapa_{modo}']['bytes'] = len(html)
+
+    filas['tabla'], df = _medir(lambda: tabla_registros(datos), reps)
+    filas['tabla']['bytes'] = _bytes_tabla(df)
+    return filas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--centrales', type=int, nargs='+', default=[3, 30, 300])
+    parser.add_argument('--reps', type=int, default=5)
+    parser.add_argument('--latencia', type=float, default=0.1)
+    parser.add_argument('--tasa-429', type=float, default=0.0)
+    parser.add_argument('--rps', type=float, default=1000, help='tasa del limitador de la API durante la prueba')
+    parser.add_argument('--json', help='guarda los resultados en este archivo')
+    args = parser.parse_args()
+
+    dir_tmp = tempfile.mkdtemp(prefix='bench_monitor_')
+    cen_local = CENLocal(args.latencia, args.tasa_429).iniciar()
+    os.environ['CEN_URL'] = cen_local.url
+    os.environ.setdefault('MONITOR_DB', os.path.join(dir_tmp, 'historial.sqlite3'))
+
+    from monitor.motor import limitador_cen
+    limitador_cen.tasa = limitador_cen.capacidad = args.rps
+
+    resultados = {}
+    try:
+        for n in args.centrales:
+            resultados[n] = correr(n, args.reps, cen_local, dir_tmp)
+    finally:
+        cen_local.detener()
+
+    print(f'{"centrales":>9} {"etapa":<12} {"p50 ms":>10} {"p95 ms":>10} {"pico KB":>10} {"bytes":>12}')
+    for n, filas in resultados.items():
+        for etapa, r in filas.items():
+            print(f'{n:>9} {etapa:<12} {r["p50_ms"]:>10.1f} {r["p95_ms"]:>10.1f} {r["pico_kb"]:>10.0f} {r.get("bytes", ""):>12}')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'resultados': resultados}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
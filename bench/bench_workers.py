@@ -0,0 +1,96 @@
+"""Benchmark de varios workers contra un CEN local: peticiones al CEN según la cantidad de procesos.
+
+Cada worker es un proceso que arranca el sondeo como lo hace `inicio.py` (`iniciar_poller`)
+y lo deja correr `--duracion` segundos con un intervalo corto. Todos comparten el mismo
+`MONITOR_DB`. Dos modos:
+
+- `aislado`: como antes, cada proceso consulta el CEN por su cuenta.
+- `compartido`: `MONITOR_COMPARTIDO=1`; sólo el líder consulta y los demás cargan sus publicaciones.
+
+Reporta las peticiones que recibió el CEN, cuántos workers terminaron con datos y
+cuántas publicaciones cargó cada uno.
+
+    python -m bench.bench_workers
+    python -m bench.bench_workers --workers 1 2 4 8 --duracion 20 --json workers.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bench.cen_local import CENLocal
+
+RAIZ = Path(__file__).resolve().parent.parent
+MODOS = ('aislado', 'compartido')
+
+
+def hijo(duracion):
+    """Corre un worker `duracion` segundos; imprime su estado final como JSON."""
+    from monitor.metricas import metricas
+    from monitor.poller import almacen, iniciar_poller
+
+    poller = iniciar_poller('bench')
+    time.sleep(duracion)
+    version, datos, _ = almacen.leer()
+    _, contadores = metricas.resumen()
+    return {
+        'lider': getattr(poller, 'es_lider', True),
+        'con_datos': datos is not None,
+        'publicaciones': version,
+        'cargadas': contadores.get('coordinacion.instantaneas', 0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--duracion', type=float, default=12)
+    parser.add_argument('--intervalo', type=int, default=4, help='segundos entre ciclos de sondeo')
+    parser.add_argument('--latencia', type=float, default=0.02)
+    parser.add_argument('--json', help='guarda los resultados en este archivo')
+    parser.add_argument('--hijo', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        print(json.dumps(hijo(args.duracion)))
+        return
+
+    dir_tmp = tempfile.mkdtemp(prefix='bench_workers_')
+    cen_local = CENLocal(args.latencia).iniciar()
+    resultados = []
+    try:
+        for modo in MODOS:
+            for n in args.workers:
+                db = os.path.join(dir_tmp, f'{modo}_{n}.sqlite3')
+                env = {**os.environ, 'CEN_URL': cen_local.url, 'CEN_RPS': '1000', 'CEN_BURST': '1000',
+                       'CEN_POLL_SEG': str(args.intervalo), 'MONITOR_DB': db, 'PYTHONPATH': str(RAIZ),
+                       'MONITOR_COMPARTIDO': '1' if modo == 'compartido' else '0',
+                       'MONITOR_REVISION_SEG': '0.5', 'MONITOR_ARRIENDO_SEG': '3'}
+                antes = cen_local.peticiones
+                procesos = [subprocess.Popen([sys.executable, '-m', 'bench.bench_workers', '--hijo',
+                                              '--duracion', str(args.duracion)],
+                                             cwd=RAIZ, env=env, stdout=subprocess.PIPE, text=True)
+                            for _ in range(n)]
+                hijos = [json.loads(p.communicate()[0].strip().splitlines()[-1]) for p in procesos]
+                resultados.append({
+                    'modo': modo, 'workers': n, 'peticiones_cen': cen_local.peticiones - antes,
+                    'lideres': sum(h['lider'] for h in hijos), 'con_datos': sum(h['con_datos'] for h in hijos),
+                    'cargadas': [h['cargadas'] for h in hijos],
+                })
+    finally:
+        cen_local.detener()
+
+    print(f'{"modo":<11} {"workers":>7} {"peticiones CEN":>15} {"líderes":>8} {"con datos":>10}  cargadas por worker')
+    for r in resultados:
+        print(f'{r["modo"]:<11} {r["workers"]:>7} {r["peticiones_cen"]:>15} {r["lideres"]:>8} {r["con_datos"]:>10}  {r["cargadas"]}')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(resultados, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""Servidor local que imita `generacion-real/v3/findByDate` del CEN.
+
+Entrega payloads grabados (`bench/payloads/<idCentral>.json`, una lista de registros
+como los de `data`) o, si no hay grabación para la central, una serie sintética
+horaria. La latencia y la tasa de respuestas 429 son configurables.
+
+También responde en `/dga/caudales` lecturas sintéticas de estaciones DGA con el
+formato que espera `monitor.dga` (exportar `DGA_URL` con esa ruta).
+
+    python -m bench.cen_local --puerto 8765 --latencia 0.15 --tasa-429 0.05
+    python -m bench.cen_local --grabar 121 116 115 --user-key $CEN_KEY --desde 2024-06-01 --hasta 2024-06-08
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+
+DIR_PAYLOADS = Path(__file__).resolve().parent / 'payloads'
+RUTA = '/generacion-real/v3/findByDate'
+RUTA_DGA = '/dga/caudales'
+
+
+def serie_sintetica(id_central, desde, hasta):
+    """Generación horaria determinista por central, con ciclo diario y algunas horas en cero."""
+    rng = random.Random(int(id_central))
+    base = rng.uniform(20, 300)
+    registros = []
+    ts = datetime.strptime(desde, '%Y-%m-%d')
+    fin = datetime.strptime(hasta, '%Y-%m-%d') + timedelta(days=1)
+    while ts < fin:
+        h = ts.hour
+        gen = base * (0.6 + 0.4 * math.sin((h - 6) / 24 * 2 * math.pi)) * rng.uniform(0.9, 1.1)
+        if rng.random() < 0.03:
+            gen = 0
+        registros.append({
+            'id_central': int(id_central),
+            'fecha_hora': ts.strftime('%Y-%m-%d %H:%M:%S'),
+            'gen_real_mw': round(gen, 3),
+        })
+        ts += timedelta(hours=1)
+    return registros
+
+
+def caudales_sinteticos(bna, desde, hasta):
+    """Lecturas horarias deterministas por estación: caudal con ciclo diario y altura asociada."""
+    rng = random.Random(bna)
+    base = rng.uniform(5, 120)
+    registros = []
+    ts = datetime.strptime(desde, '%Y-%m-%d')
+    fin = datetime.strptime(hasta, '%Y-%m-%d') + timedelta(days=1)
+    while ts < fin:
+        caudal = base * (0.8 + 0.2 * math.sin((ts.hour - 9) / 24 * 2 * math.pi)) * rng.uniform(0.95, 1.05)
+        registros.append({
+            'fecha_hora': ts.strftime('%Y-%m-%d %H:%M:%S'),
+            'caudal_m3s': round(caudal, 2),
+            'altura_m': round(0.3 + caudal ** 0.4 / 4, 2),
+        })
+        ts += timedelta(hours=1)
+    return registros
+
+
+class CENLocal:
+    def __init__(self, latencia=0.1, tasa_429=0.0, dir_payloads=DIR_PAYLOADS, puerto=0):
+        self.latencia = latencia
+        self.tasa_429 = tasa_429
+        self.dir_payloads = Path(dir_payloads)
+        self._grabados = {}
+        self.peticiones = 0
+        self.respuestas_429 = 0
+        self.bytes_enviados = 0
+        self._lock = threading.Lock()
+        self.servidor = ThreadingHTTPServer(('127.0.0.1', puerto), self._handler())
+        self.servidor.daemon_threads = True
+        self._hilo = None
+
+    @property
+    def url(self):
+        host, puerto = self.servidor.server_address[:2]
+        return f'http://{host}:{puerto}{RUTA}'
+
+    @property
+    def url_dga(self):
+        host, puerto = self.servidor.server_address[:2]
+        return f'http://{host}:{puerto}{RUTA_DGA}'
+
+    def registros(self, id_central, desde, hasta):
+        if id_central not in self._grabados:
+            ruta = self.dir_payloads / f'{id_central}.json'
+            self._grabados[id_central] = json.loads(ruta.read_text()) if ruta.exists() else None
+        grabados = self._grabados[id_central]
+        if grabados is None:
+            return serie_sintetica(id_central, desde, hasta)
+        fin = (datetime.strptime(hasta, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+        return [r for r in grabados if desde <= r['fecha_hora'] < fin]
+
+    def _handler(self):
+        cen = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path not in (RUTA, RUTA_DGA):
+                    return self._responder(404, {'error': 'not found'})
+                q = {k: v[0] for k, v in parse_qs(url.query).items()}
+                with cen._lock:
+                    cen.peticiones += 1
+                if cen.latencia:
+                    time.sleep(cen.latencia * random.uniform(0.8, 1.2))
+                if random.random() < cen.tasa_429:
+                    with cen._lock:
+                        cen.respuestas_429 += 1
+                    return self._responder(429, {'error': 'Too Many Requests'}, {'Retry-After': '1'})
+                if url.path == RUTA_DGA:
+                    return self._responder(200, {'data': caudales_sinteticos(q.get('bna', ''), q['startDate'], q['endDate'])})
+                registros = cen.registros(q.get('idCentral', '0'), q['startDate'], q['endDate'])
+                size = int(q.get('pageSize', 50))
+                page = int(q.get('page', 1))
+                total = max(1, math.ceil(len(registros) / size))
+                self._responder(200, {
+                    'page': page,
+                    'totalPages': total,
+                    'totalItems': len(registros),
+                    'data': registros[(page - 1) * size: page * size],
+                })
+
+            def _responder(self, code, cuerpo, headers=None):
+                datos = json.dumps(cuerpo).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(datos)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(datos)
+                with cen._lock:
+                    cen.bytes_enviados += len(datos)
+
+        return Handler
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self.servidor.serve_forever, daemon=True, name='cen-local')
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+def grabar(ids, user_key, desde, hasta, dir_payloads=DIR_PAYLOADS):
+    """Descarga desde el CEN real los registros de `ids` y los deja como payloads para reproducir."""
+    from monitor.cen import iterar_registros
+    from monitor.cliente import URL_CEN
+
+    if 'localhost' in URL_CEN or '127.0.0.1' in URL_CEN:
+        raise SystemExit('CEN_URL apunta a un servidor local; no hay nada que grabar')
+    dir_payloads = Path(dir_payloads)
+    dir_payloads.mkdir(parents=True, exist_ok=True)
+    for id_central in ids:
+        registros = list(iterar_registros(id_central, desde, hasta, user_key))
+        (dir_payloads / f'{id_central}.json').write_text(json.dumps(registros))
+        print(f'{id_central}: {len(registros)} registros')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--puerto', type=int, default=8765)
+    parser.add_argument('--latencia', type=float, default=0.1, help='segundos por petición')
+    parser.add_argument('--tasa-429', type=float, default=0.0, help='fracción de respuestas 429')
+    parser.add_argument('--payloads', default=str(DIR_PAYLOADS))
+    parser.add_argument('--grabar', nargs='+', metavar='ID_CENTRAL')
+    parser.add_argument('--user-key')
+    parser.add_argument('--desde')
+    parser.add_argument('--hasta')
+    args = parser.parse_args()
+
+    if args.grabar:
+        return grabar(args.grabar, args.user_key, args.desde, args.hasta, args.payloads)
+
+    cen = CENLocal(args.latencia, args.tasa_429, args.payloads, args.puerto)
+    print(f'CEN local en {cen.url}  (exportar CEN_URL para usarlo desde la app)')
+    print(f'DGA local en {cen.url_dga}  (exportar DGA_URL)')
+    try:
+        cen.servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,20 @@
+import hashlib
+import json
+import os
+from datetime import date, timedelta
+from pathlib import Path
+
 import streamlit as st
-import requests
-import pandas as pd
-from datetime import datetime, timedelta
-import folium
-from folium.features import DivIcon
-from streamlit_folium import st_folium
-import time
-import random
-import matplotlib
-import matplotlib.pyplot as plt
-import io
-import base64
-import matplotlib.dates as mdates
-
-matplotlib.use('Agg')
+
+from monitor.alertas import detector
+from monitor.mapas import MODO_GRAFICOS, html_mapa_centrales, html_mapa_dga, precalentar
+from monitor.metricas import BUCKETS, metricas
+from monitor.centrales import registro
+from monitor.eventos import iniciar_eventos, script_suscripcion
+from monitor.exportar import FORMATOS, exportar_bytes
+from monitor.poller import ESPERA_INTERACTIVA, almacen, almacen_dga, iniciar_poller
+from monitor.vistas import (PERIODOS, RANGOS_DIAS, agregar_historia, comparar_caudales, reducir_serie, serie_historica,
+                            tabla_registros)
 
 st.set_page_config(
     page_title="Cuenca del Laja",
@@ -22,241 +23,30 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-st.markdown("""
-<style>
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;600;800&family=JetBrains+Mono:wght@400;500;700&display=swap');
-
-    :root {
-        --bg-core: #0e1117;
-        --bg-card: #161b22;
-        --bg-hover: #1f2630;
-        --accent: #2e9eff;
-        --success: #00d084;
-        --warning: #fcb900;
-        --danger: #ff4b4b;
-        --text-primary: #f0f6fc;
-        --text-secondary: #8b949e;
-        --border: 1px solid rgba(240, 246, 252, 0.1);
-    }
-
-    .stApp {
-        background-color: var(--bg-core);
-        font-family: 'Inter', sans-serif;
-    }
-    
-    h1, h2, h3 { font-family: 'Inter', sans-serif; letter-spacing: -0.5px; }
-    code, .mono { font-family: 'JetBrains Mono', monospace !important; }
-
-    .eng-card {
-        background-color: var(--bg-card);
-        border: var(--border);
-        border-radius: 8px;
-        padding: 20px;
-        margin-bottom: 16px;
-        transition: transform 0.2s ease, box-shadow 0.2s ease;
-    }
-    .eng-card:hover {
-        border-color: var(--accent);
-        box-shadow: 0 4px 20px rgba(0,0,0,0.3);
-    }
-
-    .metric-value {
-        font-family: 'Inter', sans-serif;
-        font-weight: 800;
-        font-size: 2.2rem;
-        color: var(--text-primary);
-        line-height: 1.1;
-    }
-    .metric-label {
-        font-family: 'JetBrains Mono', monospace;
-        font-size: 0.75rem;
-        text-transform: uppercase;
-        color: var(--text-secondary);
-        letter-spacing: 1px;
-        margin-bottom: 4px;
-    }
-    
-    .stProgress > div > div > div > div {
-        background-color: var(--accent);
-    }
-
-    .dga-container {
-        border: 1px solid #238636;
-        background: rgba(35, 134, 54, 0.05);
-        border-radius: 8px;
-        padding: 24px;
-        display: flex;
-        align-items: center;
-        justify-content: space-between;
-        gap: 20px;
-        flex-wrap: wrap;
-    }
-    .dga-link {
-        background-color: #238636;
-        color: white !important;
-        text-decoration: none;
-        padding: 12px 20px;
-        border-radius: 6px;
-        font-weight: 600;
-        font-size: 0.9rem;
-        transition: background 0.2s;
-        text-align: center;
-        white-space: nowrap;
-    }
-    .dga-link:hover { background-color: #2ea043; }
-
-    .welcome-box {
-        text-align: center;
-        padding: 60px 20px;
-        border: 1px dashed var(--text-secondary);
-        border-radius: 12px;
-        margin-top: 40px;
-    }
-
-    @media (max-width: 768px) {
-        .block-container { padding-left: 1rem; padding-right: 1rem; }
-        
-        .eng-card { padding: 15px; margin-bottom: 12px; }
-        .metric-value { font-size: 1.8rem; }
-        
-        h1 { font-size: 1.5rem; }
-        p { font-size: 0.85rem; }
-        
-        .dga-container { flex-direction: column; text-align: left; align-items: stretch; padding: 15px; }
-        .dga-link { width: 100%; margin-top: 10px; }
-        
-        iframe { border-radius: 8px; }
-    }
-
-    #MainMenu {visibility: hidden;}
-    footer {visibility: hidden;}
-    header {visibility: hidden;}
-</style>
-""", unsafe_allow_html=True)
-
-INFO_CENTRALES = {
-    'HE EL TORO': {'id': 121, 'coords': [-37.2750, -71.4528]},
-    'HE ANTUCO':  {'id': 116, 'coords': [-37.3098, -71.6267]},
-    'HP ABANICO': {'id': 115, 'coords': [-37.3644, -71.4894]},
-}
-EFICIENCIAS = {
-    'HE EL TORO': 4.5,
-    'HE ANTUCO':  1.6,
-    'HP ABANICO': 1.2,
-}
-CAPACIDADES_MW = {
-    'HE EL TORO': 450,
-    'HE ANTUCO':  320,
-    'HP ABANICO': 90,
-}
-EMBALSES = {
-    'HE EL TORO': 'Embalse El Toro',
-    'HE ANTUCO':  'Canal Laja',
-    'HP ABANICO': 'Embalse Abanico',
-}
-
-ESTACIONES_DGA = [
-    {"nombre": "Canal Litre en Bocatoma Rio Laja", "lat": -37.281, "lon": -71.966, "bna": "08380008-9"},
-    {"nombre": "Canal Mirrihue", "lat": -37.326, "lon": -71.655, "bna": "08375006-5"},
-    {"nombre": "Canal Zañartu Salida Laguna Trupan", "lat": -37.278, "lon": -71.821, "bna": "08122001-8"},
-    {"nombre": "Canal Collao", "lat": -37.306, "lon": -71.649, "bna": "08375005-7"},
-    {"nombre": "Canal Unificado Mirrihue Ortiz Pinochet", "lat": -37.335, "lon": -71.64, "bna": "08375011-1"},
-    {"nombre": "Rio Laja En Tucapel", "lat": -37.286, "lon": -71.981, "bna": "08380002-K"},
-    {"nombre": "Canal Laja Diguillin En B.T. Rio Huepil (Doh)", "lat": -37.197, "lon": -72.004, "bna": "08122005-0"},
-    {"nombre": "Rio Laja En Tucapel 2", "lat": -37.283, "lon": -71.987, "bna": "08380006-2"}
-]
-
-if 'session' not in st.session_state:
-    st.session_state.session = requests.Session()
-    st.session_state.session.headers.update({
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-    })
-
-@st.cache_data(ttl=600)
-def obtener_datos_central(id_central, nombre_central):
-    url = "https://sipub.api.coordinador.cl/generacion-real/v3/findByDate"
-    hoy = datetime.now()
-    startDate = (hoy - timedelta(days=1)).strftime('%Y-%m-%d')
-    endDate = (hoy + timedelta(days=1)).strftime('%Y-%m-%d')
-    
-    params = {
-        'startDate': startDate,
-        'endDate':   endDate,
-        'user_key':  st.secrets["CEN_KEY"],
-        'pageSize':  '50',
-        'idCentral': str(id_central),
-    }
-    
-    response = None
-    for i in range(4):
-        try:
-            response = st.session_state.session.get(url, params=params, timeout=20)
-            if response.status_code == 200:
-                break
-            if response.status_code in [429, 500, 502, 503, 504]:
-                wait_time = 2 + (i * 3) + random.random()
-                time.sleep(wait_time)
-                continue
-            return {'error': True, 'mensaje': f"HTTP {response.status_code}"}
-        except Exception as e:
-            if i < 3: 
-                time.sleep(2)
-                continue
-            return {'error': True, 'mensaje': f'Timeout: {e}'}
-
-    if response is None or response.status_code != 200:
-        code = getattr(response,'status_code','?')
-        msg = "Tráfico Alto (429)" if code == 429 else f"Falla CEN ({code})"
-        return {'error': True, 'mensaje': msg}
-
-    try:
-        lista = response.json().get('data', [])
-        lista.sort(key=lambda x: x.get('fecha_hora', ''), reverse=True)
-        
-        if not lista:
-            return {'error': True, 'mensaje': 'Sin datos'}
-
-        registros_cero, dato_activo = [], None
-        for d in lista:
-            gen = d.get('gen_real_mw', 0)
-            fh  = d.get('fecha_hora', '')
-            hs  = fh.split(' ')[1][:5] if ' ' in fh else fh
-            
-            if gen == 0:
-                registros_cero.append(hs)
-            else:
-                dato_activo = d
-                break 
-
-        if dato_activo is None:
-            dato_activo = lista[0]
-
-        gen_mw    = dato_activo.get('gen_real_mw', 0)
-        factor    = EFICIENCIAS.get(nombre_central, 1)
-        caudal    = round(gen_mw / factor, 1) if factor > 0 else 0
-        capacidad = CAPACIDADES_MW.get(nombre_central, 100)
-        uso_pct   = round((gen_mw / capacidad) * 100, 1) if capacidad > 0 else 0
-
-        status = 'online' if gen_mw > 0 else 'offline'
-
-        return {
-            'error': False,
-            'nombre':         nombre_central,
-            'embalse':        EMBALSES.get(nombre_central, '—'),
-            'gen_mw':         gen_mw,
-            'caudal':         caudal,
-            'uso_pct':        uso_pct,
-            'capacidad':      capacidad,
-            'last_update':    dato_activo.get('fecha_hora', 'N/A').split(' ')[1][:5], 
-            'status':         status,
-            'raw_data':       dato_activo,
-            'full_history':   lista 
-        }
-    except Exception as e:
-        return {'error': True, 'mensaje': f'Parseo: {e}'}
+RUTA_CSS = Path(__file__).resolve().parent / 'static' / 'monitor.css'
+
+@st.cache_resource
+def estilos():
+    """Hoja de estilos de la página y de los iframes.
+
+    Con `server.enableStaticServing` va como `<link>` a `static/monitor.css`: el navegador la
+    guarda en su cache y cada pasada envía una línea en vez de la hoja completa. Si el servidor
+    no sirve estáticos, se incrusta.
+    """
+    css = RUTA_CSS.read_text(encoding='utf-8')
+    if st.get_option('server.enableStaticServing'):
+        version = hashlib.blake2b(css.encode(), digest_size=4).hexdigest()
+        return f'<link rel="stylesheet" href="app/static/monitor.css?v={version}">'
+    return f'<style>\n{css}</style>'
 
-if 'datos'     not in st.session_state: st.session_state.datos     = None
-if 'ts_update' not in st.session_state: st.session_state.ts_update = None
+ESTILOS = estilos()
+st.markdown(ESTILOS, unsafe_allow_html=True)
+
+
+poller = iniciar_poller(st.secrets["CEN_KEY"])
+KPI_POR_PAGINA = int(os.environ.get('MONITOR_KPI_POR_PAGINA', '12'))
+REFRESCO_UI_SEG = float(os.environ.get('MONITOR_REFRESCO_UI_SEG', '30'))
+EN_VIVO = os.environ.get('MONITOR_EN_VIVO', '0') == '1'
 
 def render_header():
     col1, col2 = st.columns([3, 1])
@@ -270,44 +60,46 @@ def render_header():
         </div>
         """, unsafe_allow_html=True)
     with col2:
-        if st.button("↻ ACTUALIZAR DATOS", type="primary", use_container_width=True):
-            st.cache_data.clear()
-            temp = []
+        if st.button("↻ ACTUALIZAR DATOS", type="primary", width="stretch"):
             progress_text = st.empty()
             bar = st.progress(0)
-            
-            n = len(INFO_CENTRALES)
-            for i, (nombre, info) in enumerate(INFO_CENTRALES.items()):
-                progress_text.text(f"Consultando {nombre}...")
-                bar.progress((i + 0.5) / n)
-                if i > 0: time.sleep(1.5) 
-                resultado = obtener_datos_central(info['id'], nombre)
-                temp.append({'nombre': nombre, 'info': info, 'datos': resultado})
-            
-            bar.progress(1.0)
-            time.sleep(0.2)
+
+            def al_recibir(nombre, i, n):
+                bar.progress(i / n)
+                progress_text.text(f"Recibido {nombre} ({i}/{n})")
+
+            progress_text.text("Consultando centrales...")
+            if not poller.refrescar(al_recibir, espera_max=ESPERA_INTERACTIVA):
+                st.session_state['aviso_refresco'] = "La consulta al CEN sigue en curso: se muestran los últimos datos hasta que se publiquen los nuevos."
+
             bar.empty()
             progress_text.empty()
-            
-            st.session_state.datos = temp
-            st.session_state.ts_update = datetime.now().strftime("%H:%M:%S")
             st.rerun()
             
-        if st.session_state.ts_update:
-            st.caption(f"Última sync: {st.session_state.ts_update}")
+        _, _, ts_update = almacen.leer()
+        if ts_update:
+            st.caption(f"Última sync: {ts_update.strftime('%H:%M:%S')}")
+        if aviso := st.session_state.pop('aviso_refresco', None):
+            st.toast(aviso, icon="⏳")
+        # Cambiar de modo cambia qué fragmentos llevan temporizador: hace falta una pasada completa.
+        if st.toggle("EN VIVO", key="en_vivo") != st.session_state.get('vivo_pedido'):
+            st.rerun()
 
-def render_kpi_card(item):
+def html_alertas(alertas):
+    return "".join(f'<span class="alerta">⚠ {texto}</span>' for texto in alertas or ())
+
+def html_kpi_card(item):
     res = item['datos']
     if res.get('error'):
-        st.markdown(f"""
+        return f"""
         <div class="eng-card" style="border-color:var(--danger);">
             <div class="metric-label" style="color:var(--danger);">{res.get('nombre')}</div>
             <div style="font-size:0.9rem; color:var(--text-secondary); margin-top:10px;">
                 ⚠️ {res.get('mensaje')}
             </div>
+            <div class="alertas">{html_alertas(item.get('alertas'))}</div>
         </div>
-        """, unsafe_allow_html=True)
-        return
+        """
 
     status_color = "var(--text-secondary)"
     if res['status'] == 'online':
@@ -315,232 +107,149 @@ def render_kpi_card(item):
     elif res['status'] == 'offline':
         status_color = "var(--danger)"
 
-    html = f"""
-<div class="eng-card">
+    return f"""
+<div class="eng-card" data-central="{res['nombre']}">
     <div style="display:flex; justify-content:space-between; align-items:flex-start;">
         <div>
             <div class="metric-label">{res['nombre']}</div>
-            <div class="metric-value">{res['gen_mw']:.1f} <span style="font-size:1rem; color:var(--text-secondary);">MW</span></div>
+            <div class="metric-value"><span data-campo="gen_mw">{res['gen_mw']:.1f}</span> <span style="font-size:1rem; color:var(--text-secondary);">MW</span></div>
         </div>
         <div style="text-align:right;">
-            <div class="metric-label" style="color:{status_color}">● {res['status'].upper()}</div>
-            <div style="font-family:'JetBrains Mono'; font-size:0.8rem; color:var(--text-secondary); margin-top:5px;">
-                {res['last_update']} UTC-3
+            <div class="metric-label" data-campo="status" style="color:{status_color}">● {res['status'].upper()}</div>
+            <div data-campo="last_update" style="font-family:'JetBrains Mono'; font-size:0.8rem; color:var(--text-secondary); margin-top:5px;">
+                {res['last_update']} {res['zona']}
             </div>
         </div>
     </div>
     <div style="margin-top:15px; margin-bottom:5px;">
         <div style="display:flex; justify-content:space-between; font-size:0.8rem; margin-bottom:4px; font-family:'JetBrains Mono';">
-            <span>Carga: {res['uso_pct']}%</span>
-            <span>Caudal Est: {res['caudal']} m³/s</span>
+            <span data-campo="uso_pct">Carga: {res['uso_pct']}%</span>
+            <span data-campo="caudal">Caudal Est: {res['caudal']} m³/s</span>
         </div>
         <div style="width:100%; height:4px; background:rgba(255,255,255,0.1); border-radius:2px;">
-            <div style="width:{res['uso_pct']}%; height:100%; background:{status_color}; border-radius:2px; transition:width 0.5s;"></div>
+            <div data-campo="barra" style="width:{res['uso_pct']}%; height:100%; background:{status_color}; border-radius:2px; transition:width 0.5s;"></div>
         </div>
     </div>
+    <div class="alertas" data-campo="alertas">{html_alertas(item.get('alertas'))}</div>
 </div>
 """
-    st.markdown(html, unsafe_allow_html=True)
-
-def generate_chart_img(data_list, efficiency=1.0):
-    if not data_list: return None
-    
-    df = pd.DataFrame(data_list)
-    df['dt'] = pd.to_datetime(df['fecha_hora'])
-    df = df.sort_values('dt').tail(24) 
-    
-    if df.empty: return None
-
-    df['gen'] = df['gen_real_mw']
-    df['caudal'] = df['gen'] / efficiency
-
-    plt.style.use('dark_background')
-    
-    fig, ax1 = plt.subplots(figsize=(5.5, 3), dpi=100)
-    fig.patch.set_facecolor('#0e1117') 
-    ax1.set_facecolor('#0e1117')
-
-    color_gen = '#2e9eff'
-    ax1.plot(df['dt'], df['gen'], color=color_gen, linewidth=2, label='Gen (MW)')
-    ax1.fill_between(df['dt'], df['gen'], color=color_gen, alpha=0.15)
-    
-    ax1.set_ylabel('Generación (MW)', color=color_gen, fontsize=8, fontweight='bold', labelpad=5)
-    ax1.tick_params(axis='y', labelcolor=color_gen, labelsize=8, color=color_gen)
-    ax1.spines['left'].set_color(color_gen)
-    ax1.spines['left'].set_linewidth(0.5)
-
-    ax2 = ax1.twinx()
-    color_flow = '#00e5b0'
-    ax2.plot(df['dt'], df['caudal'], color=color_flow, linewidth=2, linestyle='--', label='Caudal (m³/s)')
-    
-    ax2.set_ylabel('Caudal Est. (m³/s)', color=color_flow, fontsize=8, fontweight='bold', rotation=270, labelpad=15)
-    ax2.tick_params(axis='y', labelcolor=color_flow, labelsize=8, color=color_flow)
-    ax2.spines['right'].set_color(color_flow)
-    ax2.spines['right'].set_linewidth(0.5)
 
-    ax1.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
-    ax1.tick_params(axis='x', rotation=0, labelsize=8, colors='#8b949e')
-    
-    ax1.spines['top'].set_visible(False)
-    ax2.spines['top'].set_visible(False)
-    ax1.spines['bottom'].set_color('#30363d')
-    ax2.spines['bottom'].set_visible(False)
-    
-    ax1.grid(visible=True, axis='y', color='#30363d', linestyle=':', linewidth=0.5)
-    ax1.grid(visible=False, axis='x')
-
-    plt.tight_layout()
-    
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png', transparent=True, bbox_inches='tight')
-    plt.close(fig)
-    buf.seek(0)
-    
-    img_base64 = base64.b64encode(buf.read()).decode('utf-8')
-    return f'<img src="data:image/png;base64,{img_base64}" style="width:100%; border-radius:6px;">'
-
-def render_map(data_list):
-    m = folium.Map(
-        location=[-37.32, -71.55], 
-        zoom_start=11, 
-        tiles='https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}',
-        attr='Esri',
-        prefer_canvas=True
-    )
-    folium.TileLayer(
-        tiles='https://services.arcgisonline.com/ArcGIS/rest/services/Reference/World_Boundaries_and_Places/MapServer/tile/{z}/{y}/{x}',
-        attr='Esri',
-        overlay=True,
-        opacity=0.5
-    ).add_to(m)
-    
-    for item in data_list:
-        res = item['datos']
-        if res.get('error'): continue
-        
-        is_active = res['gen_mw'] > 0
-        color = "#00e5b0" if is_active else "#8b949e"
-        
-        eficiencia = EFICIENCIAS.get(res['nombre'], 1.0)
-        chart_img = generate_chart_img(res.get('full_history', []), efficiency=eficiencia)
-        
-        popup_html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                @import url('https://fonts.googleapis.com/css2?family=JetBrains+Mono:wght@400;700&family=Inter:wght@400;700;800&display=swap');
-                body {{ margin: 0; padding: 0; background: transparent; font-family: 'Inter', sans-serif; }}
-                .popup-card {{
-                    width: 85vw;
-                    max-width: 380px;
-                    background: rgba(14, 17, 23, 0.95);
-                    backdrop-filter: blur(10px);
-                    border: 1px solid rgba(255, 255, 255, 0.1);
-                    border-radius: 12px;
-                    padding: 16px;
-                    color: #f0f6fc;
-                    box-shadow: 0 14px 40px rgba(0,0,0,0.6);
-                }}
-                .header {{ display: flex; justify-content: space-between; align-items: center; border-bottom: 1px solid rgba(255,255,255,0.1); padding-bottom: 10px; margin-bottom: 12px; }}
-                .title {{ font-size: 16px; font-weight: 800; color: #fff; letter-spacing: -0.5px; }}
-                .status {{ font-family: 'JetBrains Mono'; font-size: 10px; font-weight: 700; color: {color}; background: rgba(255,255,255,0.05); padding: 4px 8px; border-radius: 4px; text-transform: uppercase; }}
-                .chart-container {{ margin-top: 5px; margin-bottom: 5px; }}
-                .footer {{ display: flex; justify-content: space-between; align-items: center; margin-top: 10px; padding-top: 8px; border-top: 1px solid rgba(255,255,255,0.05); }}
-                .ts {{ font-size: 10px; color: #666; font-family: 'JetBrains Mono'; }}
-                .val-highlight {{ font-size: 12px; font-weight: 700; color: #fff; }}
-            </style>
-        </head>
-        <body>
-            <div class="popup-card">
-                <div class="header">
-                    <div class="title">{res['nombre']}</div>
-                    <div class="status">● {res['status']}</div>
-                </div>
-                <div class="chart-container">
-                    {chart_img if chart_img else '<div style="padding:20px;text-align:center;color:#666">Esperando datos...</div>'}
-                </div>
-                <div class="footer">
-                    <div class="ts">Último: {res['last_update']} UTC-3</div>
-                    <div class="val-highlight">{res['gen_mw']:.1f} MW</div>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
-        marker_html = f"""
-        <div style="position: relative; display: flex; align-items: center; justify-content: center; width: 24px; height: 24px;">
-            <div style="
-                position: absolute;
-                width: 12px; height: 12px;
-                background-color: {color};
-                border-radius: 50%;
-                border: 2px solid #0e1117;
-                z-index: 2;
-                box-shadow: 0 0 10px {color};
-            "></div>
-            <div style="
-                position: absolute;
-                width: 24px; height: 24px;
-                background-color: {color};
-                border-radius: 50%;
-                opacity: 0.4;
-                z-index: 1;
-                animation: pulse-ring 2s cubic-bezier(0.215, 0.61, 0.355, 1) infinite;
-            "></div>
-            <style>
-                @keyframes pulse-ring {{
-                    0% {{ transform: scale(0.5); opacity: 0; }}
-                    50% {{ opacity: 0.5; }}
-                    100% {{ transform: scale(1.5); opacity: 0; }}
-                }}
-            </style>
-        </div>
-        """
+# Actualiza en su lugar los campos de cada tarjeta y el total con lo que llega por el canal de eventos.
+_JS_TARJETAS = """function (centrales, tipo) {
+    Object.keys(centrales).forEach(function (nombre) {
+        var c = centrales[nombre];
+        if (!c.error) GEN[nombre] = c.gen_mw;
+        var tarjeta = document.querySelector('[data-central="' + CSS.escape(nombre) + '"]');
+        if (!tarjeta || c.error || !tarjeta.querySelector('[data-campo]')) return;
+        var campo = function (n) { return tarjeta.querySelector('[data-campo="' + n + '"]'); };
+        var color = c.status === 'online' ? (c.uso_pct < 90 ? 'var(--success)' : 'var(--warning)') : 'var(--danger)';
+        campo('gen_mw').textContent = c.gen_mw.toFixed(1);
+        campo('status').textContent = '● ' + c.status.toUpperCase();
+        campo('status').style.color = color;
+        campo('last_update').textContent = c.last_update + ' ' + c.zona;
+        campo('uso_pct').textContent = 'Carga: ' + c.uso_pct + '%';
+        campo('caudal').textContent = 'Caudal Est: ' + c.caudal + ' m³/s';
+        campo('barra').style.width = c.uso_pct + '%';
+        campo('barra').style.background = color;
+        campo('alertas').innerHTML = (c.alertas || []).map(function (a) { return '<span class="alerta">⚠ ' + a + '</span>'; }).join('');
+        if (tipo === 'cambios') {
+            tarjeta.classList.add('actualizada');
+            setTimeout(function () { tarjeta.classList.remove('actualizada'); }, 1500);
+        }
+    });
+    var total = Object.keys(GEN).reduce(function (s, n) { return s + GEN[n]; }, 0);
+    document.querySelector('[data-campo="total"]').textContent = total.toFixed(1);
+}"""
+
+def html_kpis_vivo(pagina, datos):
+    """Documento con las tarjetas de `pagina` y el total de `datos`, suscrito al canal de eventos."""
+    tarjetas = "".join(html_kpi_card(item) for item in pagina)
+    gen = {item['nombre']: item['datos']['gen_mw'] for item in datos if not item['datos'].get('error')}
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+{ESTILOS}
+<style>
+    body {{ margin: 0; background: transparent; color: var(--text-primary); font-family: 'Inter', sans-serif; }}
+    .eng-card.actualizada {{ border-color: var(--accent); }}
+</style>
+</head>
+<body>
+<div class="kpi-grid">{tarjetas}</div>
+<div style="text-align:right; margin-bottom:20px; font-family:'JetBrains Mono'; color:var(--text-secondary);">
+    TOTAL SISTEMA: <span style="color:var(--text-primary); font-weight:bold;"><span data-campo="total">{sum(gen.values()):.1f}</span> MW</span>
+</div>
+<script>
+var GEN = {json.dumps(gen)};
+{script_suscripcion(_JS_TARJETAS)}
+</script>
+</body>
+</html>"""
+
+def render_kpi_grid(datos, vivo=False):
+    """Tarjetas de una página de centrales en un solo bloque HTML, con búsqueda y paginación.
+
+    En vivo las tarjetas van en un iframe que se actualiza solo por el canal de eventos.
+    """
+    pagina = datos
+    if len(datos) > KPI_POR_PAGINA:
+        col_buscar, col_pagina = st.columns([3, 1])
+        with col_buscar:
+            buscar = st.text_input("Buscar central", placeholder="Buscar central…", label_visibility="collapsed")
+        if buscar:
+            pagina = [item for item in datos if buscar.lower() in item['nombre'].lower()]
+        n_paginas = max(1, -(-len(pagina) // KPI_POR_PAGINA))
+        with col_pagina:
+            n = st.number_input("Página", min_value=1, max_value=n_paginas, value=1,
+                                label_visibility="collapsed", disabled=n_paginas == 1)
+        pagina = pagina[(n - 1) * KPI_POR_PAGINA:n * KPI_POR_PAGINA]
+
+    if vivo:
+        # La altura la informa el propio documento: las columnas de la grilla dependen del ancho de la ventana.
+        st.iframe(html_kpis_vivo(pagina, datos), height="content")
+        return
 
-        folium.Marker(
-            location=item['info']['coords'],
-            popup=folium.Popup(popup_html, max_width=400),
-            tooltip=f"{res['nombre']} | {res['gen_mw']} MW",
-            icon=DivIcon(html=marker_html, icon_size=(24, 24), icon_anchor=(12, 12))
-        ).add_to(m)
-    
-    st.markdown("""
-    <style>
-    .leaflet-popup-content-wrapper { background: transparent !important; box-shadow: none !important; border: none !important; }
-    .leaflet-popup-tip { display: none; }
-    </style>
+    # Una sola línea por tarjeta: las líneas en blanco o indentadas cortan el bloque HTML en Markdown.
+    tarjetas = "".join(" ".join(linea.strip() for linea in html_kpi_card(item).splitlines()) for item in pagina)
+    st.markdown(f'<div class="kpi-grid">{tarjetas}</div>', unsafe_allow_html=True)
+    total_mw = sum(item['datos']['gen_mw'] for item in datos if not item['datos'].get('error'))
+            
+    st.markdown(f"""
+    <div style="text-align:right; margin-bottom:20px; font-family:'JetBrains Mono'; color:var(--text-secondary);">
+        TOTAL SISTEMA: <span style="color:var(--text-primary); font-weight:bold;">{total_mw:.1f} MW</span>
+    </div>
     """, unsafe_allow_html=True)
-    
-    st_folium(m, width="100%", height=500, returned_objects=[])
+
+def render_map(data_list, modo_grafico=MODO_GRAFICOS, vivo=False):
+    with metricas.span('render_map'):
+        st.iframe(html_mapa_centrales(data_list, modo_grafico, vivo), height=500)
 
 def render_dga_map():
     st.markdown("### Estaciones DGA relevantes")
-    m_dga = folium.Map(
-        location=[-37.28, -71.80], 
-        zoom_start=10, 
-        tiles='https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}',
-        attr='Esri',
-        prefer_canvas=True
-    )
-    
-    for est in ESTACIONES_DGA:
-        popup_html = f"""
-        <div style="font-family: 'Inter', sans-serif; color: #333; padding: 5px;">
-            <div style="font-weight: 800; font-size: 14px; margin-bottom: 5px;">{est['nombre']}</div>
-            <div style="font-family: 'JetBrains Mono', monospace; font-size: 12px;">Código BNA: <b>{est['bna']}</b></div>
-        </div>
-        """
-        
-        folium.Marker(
-            location=[est["lat"], est["lon"]],
-            popup=folium.Popup(popup_html, max_width=300),
-            tooltip=est["nombre"],
-            icon=folium.Icon(color="blue", icon="info-sign")
-        ).add_to(m_dga)
-        
-    st_folium(m_dga, width="100%", height=400, returned_objects=[], key="dga_map")
+    _, lecturas, _ = almacen_dga.leer()
+    with metricas.span('render_dga_map'):
+        st.iframe(html_mapa_dga(lecturas), height=400)
+
+@st.fragment
+def render_comparacion_caudales():
+    _, lecturas, _ = almacen_dga.leer()
+    if not lecturas or not len(registro):
+        return
+    con_datos = [item['estacion'] for item in lecturas if not item['datos'].get('error')]
+    if not con_datos:
+        return
+    st.markdown("### 🌊 CAUDAL MEDIDO VS ESTIMADO")
+    col_est, col_central = st.columns([1, 1])
+    with col_est:
+        estacion = st.selectbox("Estación DGA", con_datos, format_func=lambda est: est['nombre'])
+    with col_central:
+        central = st.selectbox("Central", list(registro))
+    with metricas.span('comparacion_caudales'):
+        tabla = comparar_caudales(estacion['bna'], central)
+    if tabla.empty:
+        st.info("Sin lecturas para comparar.")
+    else:
+        st.line_chart(tabla, height=300)
 
 def render_dga_section():
     st.markdown("### 📡 DIRECCIÓN GENERAL DE AGUAS")
@@ -559,10 +268,94 @@ def render_dga_section():
     </div>
     """, unsafe_allow_html=True)
 
-def main():
-    render_header()
+def render_exportar(dias):
+    """Descarga de la historia guardada; el archivo se arma por lotes recién al hacer clic."""
+    with st.popover("⬇ EXPORTAR", width="stretch"):
+        datos = st.radio("Datos", ["Generación", "Caudales DGA"], horizontal=True)
+        if datos == "Generación":
+            tipo = 'generacion'
+            claves = st.multiselect("Centrales", list(registro), placeholder="Todas")
+        else:
+            tipo = 'caudales'
+            claves = st.multiselect("Estaciones", registro.estaciones, format_func=lambda est: est['nombre'],
+                                    placeholder="Todas")
+        hoy = date.today()
+        rango = st.date_input("Fechas", value=(hoy - timedelta(days=dias), hoy), max_value=hoy)
+        formato = st.radio("Formato", list(FORMATOS), horizontal=True)
+        if len(rango) != 2:
+            return
+        desde, hasta = rango[0].isoformat(), (rango[1] + timedelta(days=1)).isoformat()
+        st.download_button(
+            "Descargar",
+            data=lambda: exportar_bytes(formato, tipo, claves or None, desde, hasta),
+            file_name=f"{tipo}_{rango[0]:%Y%m%d}_{rango[1]:%Y%m%d}.{formato}",
+            mime=FORMATOS[formato],
+            on_click="ignore",
+            type="primary",
+            width="stretch",
+        )
+
+def render_historico():
+    st.markdown("### 📈 HISTÓRICO")
+    col_rango, col_periodo, col_relleno, col_exportar = st.columns([2, 1, 1, 1])
+    with col_rango:
+        rango = st.radio("Rango", list(RANGOS_DIAS), horizontal=True, label_visibility="collapsed")
+    with col_periodo:
+        periodo = st.radio("Periodo", list(PERIODOS), horizontal=True, label_visibility="collapsed")
+    with col_relleno:
+        if poller.rellenando:
+            st.caption("Descargando historia en segundo plano…")
+        elif st.button("COMPLETAR HISTORIA", width="stretch"):
+            poller.rellenar(RANGOS_DIAS[rango])
+            st.rerun(scope="fragment")
+    with col_exportar:
+        render_exportar(RANGOS_DIAS[rango])
+
+    with metricas.span('historico'):
+        serie = serie_historica(RANGOS_DIAS[rango])
+        tabla = agregar_historia(serie, PERIODOS[periodo])
+    if tabla.empty:
+        st.info("Sin historia guardada para este rango. Use COMPLETAR HISTORIA para descargarla.")
+        return
+
+    formato_periodo = "%Y-%m-%d" if PERIODOS[periodo] == 'D' else "%Y-%m"
+    col_gen, col_energia = st.columns([1, 1])
+    with col_gen:
+        st.caption("Generación (MW)")
+        st.line_chart(reducir_serie(serie), height=300)
+    with col_energia:
+        st.caption(f"Energía {periodo.lower()} (MWh)")
+        st.bar_chart(tabla, x='Periodo', y='Energía (MWh)', color='Central', height=300)
+
+    st.dataframe(
+        tabla.sort_values(['Periodo', 'Central'], ascending=[False, True]),
+        width="stretch",
+        height=350,
+        hide_index=True,
+        column_config={
+            "Periodo": st.column_config.DatetimeColumn(format=formato_periodo),
+            "Energía (MWh)": st.column_config.NumberColumn(format="%.0f"),
+            "Factor de planta (%)": st.column_config.NumberColumn(format="%.1f %%"),
+            "Caudal medio (m³/s)": st.column_config.NumberColumn(format="%.1f"),
+            "Horas fuera de línea": st.column_config.NumberColumn(format="%.0f h"),
+        }
+    )
+
+def leer_datos(avanzar):
+    """`(version, datos, ts)` de la versión del almacén que muestra la sesión, fijada en `st.session_state`.
+
+    Con `avanzar` se fija la última publicada; si no, se repite la fijada mientras el almacén
+    la conserve. Así las tarjetas y el mapa/tabla de una misma pasada muestran la misma versión
+    aunque entre uno y otro llegue una publicación.
+    """
+    if avanzar or 'version' not in st.session_state:
+        st.session_state['version'] = almacen.leer()[0]
+    return almacen.leer(st.session_state['version'])
+
+def render_generacion(vivo=False):
+    _, datos, _ = leer_datos(avanzar=True)
     
-    if st.session_state.datos is None:
+    if datos is None:
         st.markdown("""
         <div class="welcome-box">
             <h2 style="color:var(--accent);">SISTEMA EN ESPERA</h2>
@@ -572,55 +365,33 @@ def main():
             </p>
         </div>
         """, unsafe_allow_html=True)
-        st.divider()
-        render_dga_map()
-        render_dga_section()
         return
 
     st.markdown("### ⚡ GENERACIÓN")
-    cols = st.columns(3)
-    total_mw = 0
-    
-    for i, item in enumerate(st.session_state.datos):
-        with cols[i]:
-            render_kpi_card(item)
-            if not item['datos'].get('error'):
-                total_mw += item['datos']['gen_mw']
-            
-    st.markdown(f"""
-    <div style="text-align:right; margin-bottom:20px; font-family:'JetBrains Mono'; color:var(--text-secondary);">
-        TOTAL SISTEMA: <span style="color:var(--text-primary); font-weight:bold;">{total_mw:.1f} MW</span>
-    </div>
-    """, unsafe_allow_html=True)
+    render_kpi_grid(datos, vivo)
+
+def render_mapa_y_registros(vivo=False):
+    # El HTML del mapa y la tabla están en cache por contenido y versión: mientras no llegue
+    # un dato nuevo, cada tic sólo reenvía lo mismo (y el navegador ya lo tiene en su cache).
+    # En vivo las tarjetas no se vuelven a ejecutar (las actualiza el canal): aquí se avanza la versión.
+    version, datos, _ = leer_datos(avanzar=vivo)
+    if datos is None:
+        return
 
     col_map, col_table = st.columns([1, 1])
     
     with col_map:
         st.markdown("### 🗺️ UBICACIÓN GEOGRÁFICA")
-        render_map(st.session_state.datos)
+        render_map(datos, vivo=vivo)
 
     with col_table:
         st.markdown("### 📊 ÚLTIMOS REGISTROS")
-        all_records = []
-        for item in st.session_state.datos:
-            res = item['datos']
-            if res.get('error'): continue
-            
-            hist = res.get('full_history', [])
-            for h in hist[:5]:
-                fecha_hora = h.get('fecha_hora', '')
-                hora = fecha_hora.split(' ')[1][:5] if ' ' in fecha_hora else fecha_hora
-                all_records.append({
-                    'Central': res['nombre'],
-                    'Hora': hora,
-                    'Gen (MW)': h.get('gen_real_mw', 0)
-                })
-        
-        if all_records:
-            df = pd.DataFrame(all_records)
+        with metricas.span('tabla'):
+            df = tabla_registros(datos, version=version)
+        if df is not None:
             st.dataframe(
                 df, 
-                use_container_width=True, 
+                width="stretch", 
                 height=500, 
                 hide_index=True,
                 column_config={
@@ -630,9 +401,88 @@ def main():
         else:
             st.info("Sin datos históricos recientes.")
 
-    st.divider()
+@st.fragment(run_every=REFRESCO_UI_SEG)
+def render_alertas():
+    bitacora = detector.bitacora()
+    if bitacora.empty:
+        return
+    activas = detector.resumen()
+    resumen = ", ".join(f"{tipo}: {n}" for tipo, n in sorted(activas.items())) or "sin alertas activas"
+    with st.expander(f"🚨 ALERTAS ({resumen})"):
+        st.dataframe(
+            bitacora,
+            width="stretch",
+            height=300,
+            hide_index=True,
+            column_config={
+                "fecha_hora": st.column_config.DatetimeColumn("Fecha", format="DD/MM HH:mm"),
+                "central": "Central",
+                "alerta": "Alerta",
+                "evento": "Evento",
+                "detalle": "Detalle",
+            }
+        )
+
+@st.fragment
+def render_modo_historico():
+    if st.toggle("MODO HISTÓRICO"):
+        st.divider()
+        render_historico()
+
+@st.fragment(run_every=REFRESCO_UI_SEG)
+def render_dga():
     render_dga_map()
+
+def main():
+    # Sólo la primera carga y ACTUALIZAR DATOS ejecutan la página entera; cada fragmento se
+    # re-ejecuta solo (temporizador o sus propios controles) y lo estático no vuelve a correr.
+    # En vivo las tarjetas reciben los cambios por el canal de eventos: sin temporizador.
+    st.session_state.setdefault('en_vivo', EN_VIVO)
+    st.session_state['vivo_pedido'] = st.session_state['en_vivo']
+    vivo = st.session_state['en_vivo'] and iniciar_eventos(almacen) is not None
+    # El canal sólo lleva los campos de las tarjetas y los marcadores: el encabezado ("Última sync"),
+    # la tabla y los gráficos de los popups siguen con temporizador también en vivo.
+    st.fragment(render_header, run_every=REFRESCO_UI_SEG)()
+    st.fragment(render_generacion, run_every=None if vivo else REFRESCO_UI_SEG)(vivo)
+    # Con las tarjetas ya enviadas, folium y matplotlib se importan en segundo plano para el mapa.
+    precalentar()
+    if st.session_state['en_vivo'] and not vivo:
+        st.warning("Modo en vivo no disponible: el puerto del canal de eventos está ocupado.")
+    st.fragment(render_mapa_y_registros, run_every=REFRESCO_UI_SEG)(vivo)
+    render_alertas()
+    render_modo_historico()
+    st.divider()
+    render_dga()
+    render_comparacion_caudales()
     render_dga_section()
 
+@st.fragment(run_every=REFRESCO_UI_SEG)
+def render_diagnostico():
+    import pandas as pd
+
+    st.divider()
+    st.markdown("### 🩺 DIAGNÓSTICO")
+    etapas, contadores = metricas.resumen()
+
+    cols = st.columns(4)
+    for col, (titulo, prefijo) in zip(cols, [("Cache CEN", 'cache_cen'), ("Cache gráficos", 'cache_graficos'),
+                                             ("Cache mapas", 'cache_mapas')]):
+        tasa = metricas.tasa_aciertos(prefijo)
+        col.metric(titulo, f"{tasa:.0%}" if tasa is not None else "—")
+    cols[3].metric("Reintentos API", contadores.get('cen.reintentos', 0))
+
+    if etapas:
+        st.dataframe(pd.DataFrame.from_dict(etapas, orient='index'), width="stretch",
+                     column_config={c: st.column_config.NumberColumn(format="%.1f") for c in ('p50_ms', 'p95_ms', 'max_ms')})
+        histogramas = metricas.histogramas()
+        etapa = st.selectbox("Histograma", sorted(histogramas))
+        etiquetas = [f"≤{b}s" for b in BUCKETS] + [f">{BUCKETS[-1]}s"]
+        st.bar_chart(pd.DataFrame({'mediciones': histogramas[etapa]}, index=pd.Index(etiquetas, name='duración')), sort=False)
+
+    st.json(contadores, expanded=False)
+    st.download_button("Exportar métricas (Prometheus)", metricas.prometheus(), file_name="monitor.prom", mime="text/plain")
+
 if __name__ == "__main__":
     main()
+    if st.query_params.get('diag'):
+        render_diagnostico()
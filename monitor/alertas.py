@@ -0,0 +1,131 @@
+"""Detección de apagones, rampas, sobrecapacidad y datos atrasados sobre la generación de cada central.
+
+El detector procesa sólo los registros posteriores al último que vio de cada central y
+guarda un estado de tamaño fijo por central (último instante, última generación, racha
+en cero, alertas activas): no vuelve a recorrer la historia en cada sondeo.
+"""
+import os
+import threading
+from collections import Counter, deque
+
+import pandas as pd
+
+from monitor.centrales import registro
+from monitor.metricas import metricas
+from monitor.modelo import ZONA
+
+HORAS_APAGON = int(os.environ.get('MONITOR_ALERTA_HORAS_CERO', '3'))
+# Variación entre horas consecutivas, en % de la capacidad de la central.
+RAMPA_PCT = float(os.environ.get('MONITOR_ALERTA_RAMPA_PCT', '50'))
+HORAS_ATRASO = float(os.environ.get('MONITOR_ALERTA_HORAS_ATRASO', '3'))
+MAX_BITACORA = int(os.environ.get('MONITOR_ALERTA_BITACORA', '500'))
+
+TIPOS = {
+    'apagon':         'Apagón',
+    'rampa':          'Rampa',
+    'sobrecapacidad': 'Sobre capacidad',
+    'atraso':         'Datos atrasados',
+}
+
+
+class _EstadoCentral:
+    __slots__ = ('ultimo_ts', 'ultima_gen', 'horas_cero', 'activas')
+
+    def __init__(self):
+        self.ultimo_ts = None
+        self.ultima_gen = None
+        self.horas_cero = 0
+        self.activas = {}
+
+
+class DetectorAlertas:
+    """Alertas activas por central y una bitácora acotada de inicios y términos."""
+
+    def __init__(self, centrales=registro, horas_apagon=HORAS_APAGON, rampa_pct=RAMPA_PCT,
+                 horas_atraso=HORAS_ATRASO, max_bitacora=MAX_BITACORA):
+        self.centrales = centrales
+        self.horas_apagon = horas_apagon
+        self.rampa_pct = rampa_pct
+        self.horas_atraso = horas_atraso
+        self._estados = {}
+        self._bitacora = deque(maxlen=max_bitacora)
+        self._lock = threading.Lock()
+
+    def procesar(self, nombre, datos, ahora=None):
+        """Incorpora el resultado de una consulta (`datos` de `resumir_central`) y devuelve las alertas activas."""
+        ahora = ahora or pd.Timestamp.now(tz=ZONA)
+        with self._lock:
+            estado = self._estados.setdefault(nombre, _EstadoCentral())
+            historia = None if datos.get('error') else datos.get('full_history')
+            nuevos = historia is not None and not historia.empty and (
+                estado.ultimo_ts is None or historia['fecha_hora'].iat[0] > estado.ultimo_ts)
+            if nuevos:
+                # La serie viene más reciente primero; sólo interesan los registros que no se han visto.
+                fechas = historia['fecha_hora'].iloc[::-1]
+                desde = 0 if estado.ultimo_ts is None else int(fechas.searchsorted(estado.ultimo_ts, side='right'))
+                gen = historia['gen_real_mw'].to_numpy()[::-1]
+                for ts, mw in zip(fechas.iloc[desde:], gen[desde:].tolist()):
+                    self._registro(nombre, estado, ts, mw)
+            atrasado = estado.ultimo_ts is not None and ahora - estado.ultimo_ts > pd.Timedelta(hours=self.horas_atraso)
+            if atrasado:
+                horas = (ahora - estado.ultimo_ts) / pd.Timedelta(hours=1)
+                self._activar(nombre, estado, 'atraso', ahora, f"Sin datos nuevos hace {horas:.0f} h")
+            else:
+                self._desactivar(nombre, estado, 'atraso', ahora)
+            return list(estado.activas.values())
+
+    def _registro(self, nombre, estado, ts, mw):
+        capacidad = self.centrales.capacidad(nombre)
+        if estado.ultimo_ts is not None:
+            horas = max((ts - estado.ultimo_ts) / pd.Timedelta(hours=1), 1)
+            rampa = (mw - estado.ultima_gen) / horas
+            if abs(rampa) > capacidad * self.rampa_pct / 100:
+                self._activar(nombre, estado, 'rampa', ts, f"Rampa {rampa:+.1f} MW/h")
+            else:
+                self._desactivar(nombre, estado, 'rampa', ts)
+
+        estado.horas_cero = estado.horas_cero + 1 if mw == 0 else 0
+        if estado.horas_cero >= self.horas_apagon:
+            self._activar(nombre, estado, 'apagon', ts, f"Apagón {estado.horas_cero} h")
+        else:
+            self._desactivar(nombre, estado, 'apagon', ts)
+
+        if mw > capacidad:
+            self._activar(nombre, estado, 'sobrecapacidad', ts, f"Sobre capacidad {mw:.1f}/{capacidad:.0f} MW")
+        else:
+            self._desactivar(nombre, estado, 'sobrecapacidad', ts)
+
+        estado.ultimo_ts = ts
+        estado.ultima_gen = mw
+
+    def _activar(self, nombre, estado, tipo, ts, texto):
+        # El texto se actualiza en cada registro (p. ej. las horas del apagón); sólo el inicio va a la bitácora.
+        if tipo not in estado.activas:
+            self._bitacora.append({'fecha_hora': ts, 'central': nombre, 'alerta': TIPOS[tipo],
+                                   'evento': 'inicio', 'detalle': texto})
+            metricas.contar(f'alertas.{tipo}')
+        estado.activas[tipo] = texto
+
+    def _desactivar(self, nombre, estado, tipo, ts):
+        if estado.activas.pop(tipo, None) is not None:
+            self._bitacora.append({'fecha_hora': ts, 'central': nombre, 'alerta': TIPOS[tipo],
+                                   'evento': 'fin', 'detalle': ''})
+
+    def activas(self, nombre):
+        with self._lock:
+            estado = self._estados.get(nombre)
+            return list(estado.activas.values()) if estado else []
+
+    def resumen(self):
+        """Cantidad de centrales con cada tipo de alerta activa."""
+        with self._lock:
+            return Counter(TIPOS[t] for estado in self._estados.values() for t in estado.activas)
+
+    def bitacora(self):
+        """Eventos de alerta, más reciente primero."""
+        with self._lock:
+            eventos = list(self._bitacora)
+        return pd.DataFrame(eventos[::-1], columns=['fecha_hora', 'central', 'alerta', 'evento', 'detalle'])
+
+
+detector = DetectorAlertas()
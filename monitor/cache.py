@@ -0,0 +1,148 @@
+"""Cache de respuestas del CEN compartida por todas las sesiones del proceso."""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from monitor.metricas import metricas
+
+
+class _Entrada:
+    __slots__ = ('valor', 'ts', 'vigente')
+
+    def __init__(self, valor, ts):
+        self.valor = valor
+        self.ts = ts
+        self.vigente = True
+
+
+def _es_error(valor):
+    return isinstance(valor, dict) and valor.get('error')
+
+
+class CacheRespuestas:
+    """Cache por clave `(id, startDate, endDate)`, donde `id` es la central (o estación DGA).
+
+    - Las peticiones concurrentes por la misma clave se colapsan en una sola carga.
+    - Una entrada vencida o invalidada se entrega de inmediato mientras un único hilo
+      la refresca en segundo plano (stale-while-revalidate).
+    - Los errores no reemplazan al último valor bueno.
+    """
+
+    def __init__(self, ttl=600, refresco_min=30, nombre='cache_cen'):
+        self.ttl = ttl
+        self.nombre = nombre
+        self.refresco_min = refresco_min
+        self._entradas = {}
+        self._en_vuelo = {}
+        self._lock = threading.Lock()
+
+    def _ultima_de_central(self, id_central):
+        candidatas = [(c, e) for c, e in self._entradas.items() if c[0] == id_central]
+        return max(candidatas, key=lambda ce: ce[1].ts)[1] if candidatas else None
+
+    def obtener(self, clave, cargar, esperar=False):
+        """Entrega el valor de `clave`, llamando a `cargar()` sólo si hace falta.
+
+        Con `esperar=True` una entrada vencida no se entrega: se espera la carga en curso.
+        """
+        with self._lock:
+            ahora = time.monotonic()
+            entrada = self._entradas.get(clave)
+            if entrada is not None and entrada.vigente and ahora - entrada.ts < self.ttl:
+                metricas.contar(f'{self.nombre}.hit')
+                return entrada.valor
+            # Cambio de ventana (p. ej. a medianoche): lo último de la central sirve como valor viejo.
+            vieja = entrada or self._ultima_de_central(clave[0])
+            futuro = self._en_vuelo.get(clave)
+            propio = futuro is None
+            if propio:
+                futuro = Future()
+                self._en_vuelo[clave] = futuro
+
+        metricas.contar(f'{self.nombre}.stale' if vieja is not None and not esperar else f'{self.nombre}.miss')
+        if vieja is not None and not esperar:
+            if propio:
+                threading.Thread(target=self._cargar, args=(clave, cargar, futuro, vieja),
+                                 daemon=True, name=f'cache-{clave[0]}').start()
+            return vieja.valor
+
+        if propio:
+            self._cargar(clave, cargar, futuro, vieja)
+        return futuro.result()
+
+    def _cargar(self, clave, cargar, futuro, vieja):
+        try:
+            valor = cargar()
+        except Exception as e:
+            valor = {'error': True, 'mensaje': f'Falla interna: {e}'}
+        with self._lock:
+            if _es_error(valor):
+                if vieja is not None:
+                    valor = vieja.valor
+            else:
+                for otra in [c for c in self._entradas if c[0] == clave[0] and c != clave]:
+                    del self._entradas[otra]
+                self._entradas[clave] = _Entrada(valor, time.monotonic())
+            del self._en_vuelo[clave]
+        futuro.set_result(valor)
+
+    def invalidar(self, id_central):
+        """Marca como vencidas las entradas de una central, salvo si se refrescaron hace poco."""
+        with self._lock:
+            ahora = time.monotonic()
+            for clave, entrada in self._entradas.items():
+                if clave[0] == id_central and ahora - entrada.ts >= self.refresco_min:
+                    entrada.vigente = False
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+
+class CacheLRU:
+    """LRU de valores ya generados (imágenes, HTML, tablas), acotado por el tamaño total en bytes.
+
+    `medir(valor)` da el tamaño de cada valor; por defecto `len`, que sirve para textos.
+    """
+
+    def __init__(self, max_bytes, nombre=None, medir=len):
+        self.max_bytes = max_bytes
+        self.nombre = nombre
+        self.medir = medir
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        with self._lock:
+            item = self._items.get(clave)
+            valor = None
+            if item is not None:
+                valor = item[0]
+                self._items.move_to_end(clave)
+        if self.nombre:
+            metricas.contar(f'{self.nombre}.hit' if valor is not None else f'{self.nombre}.miss')
+        return valor
+
+    def guardar(self, clave, valor):
+        tam = self.medir(valor)
+        if tam > self.max_bytes:
+            return
+        with self._lock:
+            anterior = self._items.pop(clave, None)
+            if anterior is not None:
+                self._bytes -= anterior[1]
+            self._items[clave] = (valor, tam)
+            self._bytes += tam
+            while self._bytes > self.max_bytes:
+                _, (_, viejo) = self._items.popitem(last=False)
+                self._bytes -= viejo
+
+    def limpiar(self):
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+
+cache_cen = CacheRespuestas()
@@ -0,0 +1,140 @@
+"""Consulta y parseo de la generación real publicada por el CEN."""
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from monitor.cache import cache_cen
+from monitor.centrales import registro
+from monitor.cliente import ErrorCEN, cliente_cen
+from monitor.historial import historial
+from monitor.metricas import metricas
+from monitor.modelo import normalizar, zona_horaria
+
+PAGE_SIZE = int(os.environ.get('CEN_PAGE_SIZE', '50'))
+# Tope de páginas por consulta, por si la API no respeta `page` ni informa `totalPages`.
+MAX_PAGINAS = int(os.environ.get('CEN_MAX_PAGINAS', '500'))
+
+
+def obtener_datos_central(id_central, nombre_central, user_key, esperar=False, espera_max=None):
+    hoy = datetime.now()
+    desde = (hoy - timedelta(days=1)).strftime('%Y-%m-%d')
+    # Sólo se piden al CEN los días desde el último registro guardado; tras una caída de más
+    # de un día la ventana empieza antes de `desde`, para no dejar un hueco en la historia.
+    ultimo = historial.ultimo_ts(id_central)
+    startDate = min(ultimo[:10], hoy.strftime('%Y-%m-%d')) if ultimo else desde
+    endDate = (hoy + timedelta(days=1)).strftime('%Y-%m-%d')
+    return cache_cen.obtener(
+        (id_central, startDate, endDate),
+        lambda: consultar_central(id_central, nombre_central, startDate, endDate, user_key, desde, espera_max),
+        esperar=esperar,
+    )
+
+
+def rellenar_historial(id_central, user_key, desde, espera_max=None):
+    """Descarga los días desde `desde` hasta ayer a los que les falten horas en la historia guardada.
+
+    Los días incompletos consecutivos se piden en una sola consulta; hoy queda para el sondeo.
+    Devuelve la cantidad de registros guardados (0 si la historia ya estaba completa).
+    """
+    dias = historial.dias_incompletos(id_central, desde, datetime.now().strftime('%Y-%m-%d'))
+    total = 0
+    try:
+        with metricas.span('cen.relleno'):
+            for inicio, fin in _tramos(dias):
+                total += historial.guardar(id_central, iterar_registros(id_central, inicio, fin, user_key, espera_max=espera_max))
+    except ErrorCEN as e:
+        metricas.contar('cen.errores')
+        return {'error': True, 'mensaje': e.mensaje}
+    return total
+
+
+def _tramos(dias):
+    """Agrupa días `YYYY-MM-DD` ordenados en tramos consecutivos `(primero, día siguiente al último)`."""
+    tramos = []
+    for dia in dias:
+        fecha = datetime.strptime(dia, '%Y-%m-%d')
+        if tramos and tramos[-1][1] == fecha:
+            tramos[-1][1] = fecha + timedelta(days=1)
+        else:
+            tramos.append([fecha, fecha + timedelta(days=1)])
+    return [(inicio.strftime('%Y-%m-%d'), fin.strftime('%Y-%m-%d')) for inicio, fin in tramos]
+
+
+def consultar_central(id_central, nombre_central, startDate, endDate, user_key, desde, espera_max=None):
+    try:
+        with metricas.span('cen.descarga'):
+            historial.guardar(id_central, iterar_registros(id_central, startDate, endDate, user_key, espera_max=espera_max))
+    except ErrorCEN as e:
+        metricas.contar('cen.errores')
+        return {'error': True, 'mensaje': e.mensaje}
+    try:
+        with metricas.span('cen.parseo'):
+            return resumir_central(nombre_central, historial.leer(id_central, desde=desde))
+    except Exception as e:
+        return {'error': True, 'mensaje': f'Parseo: {e}'}
+
+
+def iterar_registros(id_central, startDate, endDate, user_key, page_size=PAGE_SIZE, espera_max=None,
+                     max_paginas=MAX_PAGINAS):
+    """Recorre todas las páginas de findByDate entregando los registros uno a uno.
+
+    Se detiene en la última página, tras `max_paginas` páginas o cuando una página termina en
+    la misma `fecha_hora` que la anterior (la API ignoró `page` y repite la misma).
+    """
+    params = {
+        'startDate': startDate,
+        'endDate':   endDate,
+        'user_key':  user_key,
+        'pageSize':  str(page_size),
+        'idCentral': str(id_central),
+    }
+    anterior = None
+    for page in range(1, max_paginas + 1):
+        cuerpo = cliente_cen.pedir({**params, 'page': str(page)}, espera_max)
+        registros = cuerpo.get('data') or []
+        ultima = registros[-1].get('fecha_hora') if registros else None
+        if ultima is not None and ultima == anterior:
+            metricas.contar('cen.paginas_repetidas')
+            return
+        yield from registros
+        total = cuerpo.get('totalPages')
+        if len(registros) < page_size or (total is not None and page >= int(total)):
+            return
+        anterior = ultima
+    metricas.contar('cen.paginas_tope')
+
+
+def resumir_central(nombre_central, historia):
+    """Resume la serie (más reciente primero) de una central para los KPI.
+
+    La serie se normaliza aquí, una vez por descarga; el resumen y `full_history` ya
+    traen fechas locales y las columnas derivadas.
+    """
+    if historia.empty:
+        return {'error': True, 'mensaje': 'Sin datos'}
+
+    historia = normalizar(historia, nombre_central)
+    activos = np.flatnonzero(historia['gen_real_mw'].to_numpy() != 0)
+    dato_activo = historia.iloc[activos[0] if activos.size else 0]
+
+    gen_mw    = round(float(dato_activo['gen_real_mw']), 3)
+    caudal    = round(float(dato_activo['caudal_m3s']), 1)
+    capacidad = registro.capacidad(nombre_central)
+    uso_pct   = round(float(dato_activo['uso_pct']), 1)
+
+    status = 'online' if dato_activo['online'] else 'offline'
+
+    return {
+        'error': False,
+        'nombre':         nombre_central,
+        'embalse':        registro.embalse(nombre_central),
+        'gen_mw':         gen_mw,
+        'caudal':         caudal,
+        'uso_pct':        uso_pct,
+        'capacidad':      capacidad,
+        'last_update':    dato_activo['hora'],
+        'zona':           zona_horaria(dato_activo['fecha_hora']),
+        'status':         status,
+        'full_history':   historia
+    }
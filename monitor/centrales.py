@@ -0,0 +1,95 @@
+"""Registro de centrales y estaciones DGA, leído una vez de un archivo de configuración.
+
+El archivo puede ser JSON o YAML, con listas `centrales` y `estaciones_dga`, o CSV con
+una columna `tipo` (`central` / `estacion`) y las columnas de ambas.
+"""
+import csv
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+RUTA_REGISTRO = os.environ.get('MONITOR_REGISTRO', str(Path(__file__).resolve().parent / 'centrales.json'))
+
+EFICIENCIA_DEFECTO = 1.0
+CAPACIDAD_DEFECTO = 100.0
+
+
+class Registro:
+    """Centrales en arreglos paralelos indexados por posición, más las estaciones DGA.
+
+    `indice` traduce nombre -> posición. `items()` y `values()` entregan `(nombre, info)`
+    con `info = {'id', 'coords'}`, igual que un dict de centrales.
+    """
+
+    def __init__(self, centrales, estaciones=()):
+        centrales = list(centrales)
+        self.nombres = tuple(c['nombre'] for c in centrales)
+        self.indice = {nombre: i for i, nombre in enumerate(self.nombres)}
+        if len(self.indice) != len(self.nombres):
+            raise ValueError('Registro de centrales: nombres repetidos')
+        self.ids = np.array([int(c['id']) for c in centrales], dtype=np.int32)
+        if len(set(self.ids.tolist())) != len(self.ids):
+            raise ValueError('Registro de centrales: idCentral repetidos')
+        self.coords = np.array([[float(c['lat']), float(c['lon'])] for c in centrales], dtype=np.float64).reshape(-1, 2)
+        self.eficiencias = np.array([float(c.get('eficiencia') or EFICIENCIA_DEFECTO) for c in centrales], dtype=np.float32)
+        self.capacidades = np.array([float(c.get('capacidad_mw') or CAPACIDAD_DEFECTO) for c in centrales], dtype=np.float32)
+        self.embalses = tuple(c.get('embalse') or '—' for c in centrales)
+        self.estaciones = tuple({'nombre': e['nombre'], 'lat': float(e['lat']), 'lon': float(e['lon']), 'bna': e['bna']}
+                                for e in estaciones)
+
+    def __len__(self):
+        return len(self.nombres)
+
+    def __iter__(self):
+        return iter(self.nombres)
+
+    def __contains__(self, nombre):
+        return nombre in self.indice
+
+    def info(self, nombre):
+        i = self.indice[nombre]
+        return {'id': int(self.ids[i]), 'coords': self.coords[i].tolist()}
+
+    def items(self):
+        return ((nombre, self.info(nombre)) for nombre in self.nombres)
+
+    def values(self):
+        return (self.info(nombre) for nombre in self.nombres)
+
+    def eficiencia(self, nombre):
+        i = self.indice.get(nombre)
+        return EFICIENCIA_DEFECTO if i is None else float(self.eficiencias[i])
+
+    def capacidad(self, nombre):
+        i = self.indice.get(nombre)
+        return CAPACIDAD_DEFECTO if i is None else float(self.capacidades[i])
+
+    def embalse(self, nombre):
+        i = self.indice.get(nombre)
+        return '—' if i is None else self.embalses[i]
+
+
+def cargar_registro(ruta=RUTA_REGISTRO):
+    ruta = Path(ruta)
+    sufijo = ruta.suffix.lower()
+    if sufijo == '.csv':
+        with open(ruta, newline='', encoding='utf-8') as f:
+            filas = list(csv.DictReader(f))
+        datos = {
+            'centrales': [f for f in filas if f.get('tipo', 'central') == 'central'],
+            'estaciones_dga': [f for f in filas if f.get('tipo') == 'estacion'],
+        }
+    elif sufijo in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError('Para leer el registro en YAML instale PyYAML, o use JSON/CSV') from None
+        datos = yaml.safe_load(ruta.read_text(encoding='utf-8'))
+    else:
+        datos = json.loads(ruta.read_text(encoding='utf-8'))
+    return Registro(datos.get('centrales') or [], datos.get('estaciones_dga') or [])
+
+
+registro = cargar_registro()
@@ -0,0 +1,235 @@
+"""Cliente HTTP del CEN, único por proceso.
+
+Un solo pool de conexiones para todas las sesiones y el sondeo, reintentos con backoff,
+Retry-After y circuit breaker compartido.
+"""
+import math
+import os
+import random
+import socket
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+from monitor.metricas import metricas
+from monitor.motor import MAX_WORKERS, limitador_cen
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import brotli  # noqa: F401  (urllib3 lo usa para decodificar "br")
+    _ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    _ACCEPT_ENCODING = 'gzip, deflate'
+
+URL_CEN = os.environ.get('CEN_URL', "https://sipub.api.coordinador.cl/generacion-real/v3/findByDate")
+CODIGOS_REINTENTABLES = (429, 500, 502, 503, 504)
+POOL = int(os.environ.get('CEN_POOL', str(MAX_WORKERS)))
+KEEPALIVE_SEG = int(os.environ.get('CEN_KEEPALIVE_SEG', '60'))
+HTTP2 = os.environ.get('CEN_HTTP2', '0') == '1'
+CABECERAS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Accept-Encoding': _ACCEPT_ENCODING,
+    'Connection': 'keep-alive',
+}
+ERRORES_RED = (requests.RequestException,) + ((httpx.TransportError,) if httpx else ())
+
+
+class _AdaptadorKeepAlive(HTTPAdapter):
+    """Activa TCP keep-alive en los sockets del pool para que las conexiones ociosas no se caigan en silencio."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        opciones = list(HTTPConnection.default_socket_options) + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+        if hasattr(socket, 'TCP_KEEPIDLE'):
+            opciones.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, KEEPALIVE_SEG))
+        kwargs['socket_options'] = opciones
+        super().init_poolmanager(*args, **kwargs)
+
+
+def crear_session(pool=POOL, http2=HTTP2):
+    """Cliente HTTP compartible entre hilos.
+
+    Con `http2=True` y `httpx[http2]` instalado usa httpx, que es thread-safe y multiplexa
+    sobre una conexión. Si no, una `requests.Session` con pool de `pool` conexiones por host,
+    bloqueante cuando se agota, y sin cookies para que ningún hilo mute estado compartido.
+    """
+    if http2 and httpx is not None:
+        return httpx.Client(
+            http2=True,
+            headers=CABECERAS,
+            limits=httpx.Limits(max_connections=pool, max_keepalive_connections=pool, keepalive_expiry=KEEPALIVE_SEG),
+        )
+    session = requests.Session()
+    session.headers.update(CABECERAS)
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    adaptador = _AdaptadorKeepAlive(pool_connections=4, pool_maxsize=pool, pool_block=True, max_retries=0)
+    session.mount('https://', adaptador)
+    session.mount('http://', adaptador)
+    return session
+
+
+class ErrorCEN(Exception):
+    def __init__(self, mensaje):
+        super().__init__(mensaje)
+        self.mensaje = mensaje
+
+
+class CircuitBreaker:
+    """Corta las llamadas a la API para todas las centrales tras `umbral` fallas seguidas.
+
+    Abierto durante `enfriamiento` segundos (o lo que pida un Retry-After mayor); luego deja
+    pasar una única petición de prueba y vuelve a cerrarse si responde bien.
+    """
+
+    def __init__(self, umbral=5, enfriamiento=60, nombre='cen'):
+        self.umbral = umbral
+        self.enfriamiento = enfriamiento
+        self.nombre = nombre
+        self._fallas = 0
+        self._abierto_hasta = 0.0
+        self._probando = False
+        self._lock = threading.Lock()
+
+    def permitir(self):
+        """Segundos que faltan para poder llamar a la API: 0 si se puede ya, `inf` si el circuito está abierto.
+
+        Un valor finito es una pausa pedida con Retry-After sin que el circuito se haya abierto.
+        """
+        with self._lock:
+            disparado = self._fallas >= self.umbral
+            restante = self._abierto_hasta - time.monotonic()
+            if restante > 0:
+                return math.inf if disparado else restante
+            if disparado:
+                if self._probando:
+                    return math.inf
+                self._probando = True
+            return 0
+
+    def exito(self):
+        with self._lock:
+            self._fallas = 0
+            self._probando = False
+
+    def falla(self, retry_after=None):
+        with self._lock:
+            self._fallas += 1
+            self._probando = False
+            pausa = retry_after or 0
+            if self._fallas >= self.umbral:
+                pausa = max(pausa, self.enfriamiento)
+                metricas.contar(f'{self.nombre}.circuito_abierto')
+            if pausa:
+                self._abierto_hasta = max(self._abierto_hasta, time.monotonic() + pausa)
+
+    @property
+    def estado(self):
+        with self._lock:
+            if time.monotonic() < self._abierto_hasta:
+                return 'abierto'
+            return 'semiabierto' if self._fallas >= self.umbral else 'cerrado'
+
+
+def _retry_after(response):
+    valor = response.headers.get('Retry-After')
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(valor).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class ClienteCEN:
+
+    def __init__(self, url=URL_CEN, session=None, breaker=None, limitador=limitador_cen, intentos=4,
+                 backoff_base=1.0, backoff_tope=30.0, timeout=20, nombre='cen'):
+        self.url = url
+        self.nombre = nombre
+        self.session = session if session is not None else crear_session()
+        self.breaker = breaker or CircuitBreaker()
+        self.limitador = limitador
+        self.intentos = intentos
+        self.backoff_base = backoff_base
+        self.backoff_tope = backoff_tope
+        self.timeout = timeout
+
+    def _backoff(self, intento):
+        # "Full jitter": evita que las centrales que fallaron juntas reintenten juntas.
+        return random.uniform(0, min(self.backoff_tope, self.backoff_base * 2 ** intento))
+
+    def pedir(self, params, espera_max=None):
+        """GET a findByDate; devuelve el JSON o lanza ErrorCEN.
+
+        `espera_max` acota el tiempo total dedicado a reintentos: si la próxima espera lo
+        excede se desiste de inmediato, para que quien llama use el último valor en cache.
+        """
+        inicio = time.monotonic()
+        mensaje = 'Falla CEN'
+        for intento in range(self.intentos):
+            # Una pausa breve (Retry-After de otra central) se respeta esperando; un circuito
+            # abierto o una pausa más larga que el presupuesto se rechaza sin llamar a la API.
+            while (restante := self.breaker.permitir()):
+                presupuesto = self.backoff_tope if espera_max is None else espera_max - (time.monotonic() - inicio)
+                if restante > presupuesto:
+                    metricas.contar(f'{self.nombre}.rechazos_circuito')
+                    raise ErrorCEN(f'{self.nombre.upper()} en pausa (circuito abierto)')
+                with metricas.span(f'{self.nombre}.espera_reintento'):
+                    time.sleep(restante)
+
+            self.limitador.adquirir()
+            retry_after = None
+            try:
+                with metricas.span(f'{self.nombre}.red'):
+                    response = self.session.get(self.url, params=params, timeout=self.timeout)
+            except ERRORES_RED as e:
+                metricas.contar(f'{self.nombre}.excepciones')
+                self.breaker.falla()
+                mensaje = f'Timeout: {e}' if 'timeout' in type(e).__name__.lower() else f'Conexión: {e}'
+            else:
+                metricas.contar(f'{self.nombre}.http_{response.status_code}')
+                if response.status_code == 200:
+                    self.breaker.exito()
+                    try:
+                        return response.json()
+                    except ValueError as e:
+                        raise ErrorCEN(f'Parseo: {e}')
+                if response.status_code not in CODIGOS_REINTENTABLES:
+                    self.breaker.exito()
+                    raise ErrorCEN(f"HTTP {response.status_code}")
+                retry_after = _retry_after(response)
+                self.breaker.falla(retry_after)
+                mensaje = "Tráfico Alto (429)" if response.status_code == 429 else f"Falla CEN ({response.status_code})"
+
+            if intento == self.intentos - 1:
+                break
+            espera = max(self._backoff(intento), retry_after or 0)
+            if espera_max is not None and time.monotonic() - inicio + espera > espera_max:
+                break
+            metricas.contar(f'{self.nombre}.reintentos')
+            with metricas.span(f'{self.nombre}.espera_reintento'):
+                time.sleep(espera)
+        raise ErrorCEN(mensaje)
+
+
+cliente_cen = ClienteCEN(
+    intentos=int(os.environ.get('CEN_REINTENTOS', '4')),
+    backoff_base=float(os.environ.get('CEN_BACKOFF_BASE', '1')),
+    backoff_tope=float(os.environ.get('CEN_BACKOFF_TOPE', '30')),
+    breaker=CircuitBreaker(
+        umbral=int(os.environ.get('CEN_CB_UMBRAL', '5')),
+        enfriamiento=float(os.environ.get('CEN_CB_ENFRIAMIENTO', '60')),
+    ),
+)
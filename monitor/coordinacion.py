@@ -0,0 +1,333 @@
+"""Modo con varios procesos de la app (workers) sobre la misma base SQLite del historial.
+
+Se activa con `MONITOR_COMPARTIDO=1` en todos los workers, con el mismo `MONITOR_DB`:
+
+    MONITOR_COMPARTIDO=1 MONITOR_SSE_PUERTO=8599 streamlit run inicio.py --server.port 8501
+    MONITOR_COMPARTIDO=1 MONITOR_SSE_PUERTO=8600 streamlit run inicio.py --server.port 8502
+
+Un solo proceso, el líder, consulta el CEN y la DGA. Lo elige un arriendo en la base: el
+líder lo renueva cada `REVISION_SEG` y cualquier otro lo toma si vence (el líder se cayó o
+se colgó). El líder guarda cada publicación de sus almacenes en la base; los demás
+(seguidores) cargan la versión nueva y la publican en su almacén local, sin llamar a las
+APIs. ACTUALIZAR DATOS y COMPLETAR HISTORIA en un seguidor quedan como pedidos que atiende
+el líder. Agregar workers suma capacidad de servir sesiones, no consultas al CEN.
+"""
+import atexit
+import io
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from monitor.alertas import detector
+from monitor.historial import conexion_del_hilo, historial
+from monitor.metricas import metricas
+from monitor.poller import Poller
+
+MODO_COMPARTIDO = os.environ.get('MONITOR_COMPARTIDO', '0') == '1'
+ARRIENDO_SEG = float(os.environ.get('MONITOR_ARRIENDO_SEG', '30'))
+REVISION_SEG = float(os.environ.get('MONITOR_REVISION_SEG', '2'))
+# Lo más que espera un seguidor a que el líder publique lo pedido; ACTUALIZAR DATOS espera menos (`espera_max`).
+ESPERA_PEDIDO = float(os.environ.get('MONITOR_ESPERA_PEDIDO_SEG', '60'))
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS lider (
+    rol         TEXT PRIMARY KEY,
+    dueno       TEXT NOT NULL,
+    vence       REAL NOT NULL,
+    rellenando  INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS instantaneas (
+    almacen TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    ts      TEXT NOT NULL,
+    datos   TEXT NOT NULL,
+    marcos  BLOB NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS pedidos (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    orden     TEXT NOT NULL,
+    argumento TEXT,
+    ts        REAL NOT NULL
+);
+"""
+
+# Toma el arriendo si está libre, vencido o ya es propio, en una sola sentencia (atómica).
+_TOMAR_ARRIENDO = (
+    'INSERT INTO lider (rol, dueno, vence, rellenando) VALUES (?, ?, ?, ?) '
+    'ON CONFLICT (rol) DO UPDATE SET dueno = excluded.dueno, vence = excluded.vence, rellenando = excluded.rellenando '
+    'WHERE lider.dueno = excluded.dueno OR lider.vence < ?'
+)
+_GUARDAR_INSTANTANEA = (
+    'INSERT INTO instantaneas (almacen, version, ts, datos, marcos) VALUES (?, 1, ?, ?, ?) '
+    'ON CONFLICT (almacen) DO UPDATE SET version = instantaneas.version + 1, ts = excluded.ts, '
+    'datos = excluded.datos, marcos = excluded.marcos '
+    'RETURNING version'
+)
+
+
+def serializar(datos):
+    """Instantánea como `(json, bytes)`: los DataFrames van como flujos Arrow IPC, lo demás en JSON.
+
+    Sólo datos, sin código: cargar una instantánea de la base no ejecuta nada de quien la escribió.
+    """
+    import pyarrow as pa
+
+    marcos = []
+
+    def convertir(valor):
+        if isinstance(valor, pd.DataFrame):
+            marcos.append(valor)
+            return {'__marco__': len(marcos) - 1, 'attrs': valor.attrs}
+        if isinstance(valor, dict):
+            return {k: convertir(v) for k, v in valor.items()}
+        if isinstance(valor, (list, tuple)):
+            return [convertir(v) for v in valor]
+        if isinstance(valor, np.generic):
+            return valor.item()
+        return valor
+
+    cabecera = convertir(list(datos))
+    destino = io.BytesIO()
+    largos = []
+    for marco in marcos:
+        inicio = destino.tell()
+        tabla = pa.Table.from_pandas(marco, preserve_index=False)
+        with pa.ipc.new_stream(destino, tabla.schema) as escritor:
+            escritor.write_table(tabla)
+        largos.append(destino.tell() - inicio)
+    return json.dumps({'datos': cabecera, 'largos': largos}, ensure_ascii=False), destino.getvalue()
+
+
+def deserializar(texto, binario):
+    """Inversa de `serializar`: devuelve la tupla de ítems con sus DataFrames."""
+    import pyarrow as pa
+
+    contenido = json.loads(texto)
+    marcos, inicio = [], 0
+    for largo in contenido['largos']:
+        marcos.append(pa.ipc.open_stream(pa.py_buffer(binario[inicio:inicio + largo])).read_all().to_pandas())
+        inicio += largo
+
+    def convertir(valor):
+        if isinstance(valor, dict):
+            if '__marco__' in valor:
+                marco = marcos[valor['__marco__']]
+                marco.attrs.update(valor['attrs'])
+                return marco
+            return {k: convertir(v) for k, v in valor.items()}
+        if isinstance(valor, list):
+            return [convertir(v) for v in valor]
+        return valor
+
+    return tuple(convertir(item) for item in contenido['datos'])
+
+
+class BaseCompartida:
+    """Tablas de coordinación (arriendo del líder, instantáneas, pedidos) junto al historial.
+
+    Las instantáneas se guardan con `serializar` (JSON y Arrow IPC), no con pickle.
+    Cada hilo usa su propia conexión.
+    """
+
+    def __init__(self, ruta=None, rol='poller'):
+        self.ruta = ruta or historial.ruta
+        self.rol = rol
+        self._local = threading.local()
+        with self._conexion() as con:
+            columnas = {fila[1] for fila in con.execute('PRAGMA table_info(instantaneas)')}
+            if columnas and 'marcos' not in columnas:
+                # Formato anterior (pickle): las instantáneas son desechables, el líder las vuelve a escribir.
+                con.execute('DROP TABLE instantaneas')
+            con.executescript(_ESQUEMA)
+
+    def _conexion(self):
+        return conexion_del_hilo(self._local, self.ruta)
+
+    def tomar_arriendo(self, dueno, duracion=ARRIENDO_SEG, rellenando=False):
+        """Toma o renueva el arriendo por `duracion` segundos; devuelve True si `dueno` es el líder."""
+        ahora = time.time()
+        with self._conexion() as con:
+            con.execute(_TOMAR_ARRIENDO, (self.rol, dueno, ahora + duracion, int(rellenando), ahora))
+            fila = con.execute('SELECT dueno FROM lider WHERE rol = ?', (self.rol,)).fetchone()
+        return fila is not None and fila[0] == dueno
+
+    def soltar_arriendo(self, dueno):
+        with self._conexion() as con:
+            con.execute('UPDATE lider SET vence = 0 WHERE rol = ? AND dueno = ?', (self.rol, dueno))
+
+    def lider(self):
+        """`(dueno, vence, rellenando)` del arriendo actual, o None si nadie lo ha tomado."""
+        fila = self._conexion().execute('SELECT dueno, vence, rellenando FROM lider WHERE rol = ?', (self.rol,)).fetchone()
+        return None if fila is None else (fila[0], fila[1], bool(fila[2]))
+
+    def guardar_instantanea(self, almacen, datos, ts):
+        """Reemplaza la instantánea de `almacen`; devuelve su nueva versión."""
+        texto, binario = serializar(datos)
+        with self._conexion() as con:
+            return con.execute(_GUARDAR_INSTANTANEA, (almacen, ts.isoformat(), texto, binario)).fetchone()[0]
+
+    def version(self, almacen):
+        fila = self._conexion().execute('SELECT version FROM instantaneas WHERE almacen = ?', (almacen,)).fetchone()
+        return fila[0] if fila else 0
+
+    def leer_instantanea(self, almacen):
+        """`(version, datos, ts)` de la última instantánea de `almacen`, o None si no hay."""
+        fila = self._conexion().execute(
+            'SELECT version, datos, marcos, ts FROM instantaneas WHERE almacen = ?', (almacen,)
+        ).fetchone()
+        if fila is None:
+            return None
+        return fila[0], deserializar(fila[1], fila[2]), datetime.fromisoformat(fila[3])
+
+    def pedir(self, orden, argumento=None):
+        with self._conexion() as con:
+            con.execute('INSERT INTO pedidos (orden, argumento, ts) VALUES (?, ?, ?)',
+                        (orden, None if argumento is None else str(argumento), time.time()))
+
+    def ultimo_pedido(self):
+        fila = self._conexion().execute('SELECT MAX(id) FROM pedidos').fetchone()
+        return fila[0] or 0
+
+    def pedidos(self, desde_id):
+        """Pedidos con id mayor que `desde_id`, en orden; borra los de más de una hora."""
+        with self._conexion() as con:
+            con.execute('DELETE FROM pedidos WHERE ts < ?', (time.time() - 3600,))
+            return con.execute('SELECT id, orden, argumento FROM pedidos WHERE id > ? ORDER BY id', (desde_id,)).fetchall()
+
+
+class Coordinador(threading.Thread):
+    """Elige al líder y reparte los datos entre workers; se usa en lugar del `Poller` del proceso.
+
+    El `Poller` corre en todos los procesos pero sólo consulta mientras el suyo es el líder.
+    """
+
+    def __init__(self, user_key, almacen, almacen_dga=None, base=None, revision=REVISION_SEG,
+                 arriendo=ARRIENDO_SEG, detector=detector):
+        super().__init__(daemon=True, name='coordinador')
+        self.almacen = almacen
+        self.almacen_dga = almacen_dga
+        self.base = base or BaseCompartida()
+        self.revision = revision
+        self.arriendo = arriendo
+        self.detector = detector
+        self.dueno = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+        self.es_lider = False
+        self.poller = Poller(user_key, almacen, almacen_dga=almacen_dga, activo=lambda: self.es_lider)
+        self._almacenes = {'generacion': almacen}
+        if almacen_dga is not None:
+            self._almacenes['dga'] = almacen_dga
+        self._versiones = dict.fromkeys(self._almacenes, 0)
+        self._ultimo_pedido = None
+        for nombre, alm in self._almacenes.items():
+            alm.suscribir(lambda version, datos, nombre=nombre: self._compartir(nombre, datos))
+
+    def run(self):
+        self.poller.start()
+        atexit.register(self.base.soltar_arriendo, self.dueno)
+        while True:
+            try:
+                self.revisar()
+            except sqlite3.Error:
+                # Base ocupada o inaccesible: se reintenta en la próxima revisión sin soltar el hilo.
+                metricas.contar('coordinacion.errores')
+            time.sleep(self.revision)
+
+    def revisar(self):
+        """Una vuelta: renueva o disputa el arriendo y, según el rol, atiende pedidos o carga datos."""
+        if self.poller.is_alive():
+            lider = self.base.tomar_arriendo(self.dueno, self.arriendo, self.poller.rellenando)
+        else:
+            # Sin hilo de sondeo este proceso no puede cumplir como líder: suelta el arriendo para otro worker.
+            self.base.soltar_arriendo(self.dueno)
+            lider = False
+        asume = lider and not self.es_lider
+        if asume:
+            metricas.contar('coordinacion.liderazgos')
+            # Los pedidos anteriores a asumir ya no se atienden: el ciclo inmediato los cubre.
+            self._ultimo_pedido = self.base.ultimo_pedido()
+        self.es_lider = lider
+        if asume:
+            self.poller.despertar()
+        if lider:
+            self._atender_pedidos()
+        else:
+            self._seguir()
+        historial.revisar_cambios()
+
+    def _compartir(self, nombre, datos):
+        # Se llama en cada publicación local; las que vienen de la base (como seguidor) no se devuelven.
+        if self.es_lider:
+            alm = self._almacenes[nombre]
+            self._versiones[nombre] = self.base.guardar_instantanea(nombre, datos, alm.leer()[2])
+
+    def _seguir(self):
+        for nombre, alm in self._almacenes.items():
+            if self.base.version(nombre) <= self._versiones[nombre]:
+                continue
+            instantanea = self.base.leer_instantanea(nombre)
+            if instantanea is None:
+                continue
+            version, datos, ts = instantanea
+            if nombre == 'generacion':
+                # La bitácora de alertas es local: se arma con las mismas series que publicó el líder.
+                for item in datos:
+                    self.detector.procesar(item['nombre'], item['datos'])
+            alm.publicar(datos, ts)
+            # Después de publicar: quien espera en `refrescar` ya encuentra los datos en el almacén.
+            self._versiones[nombre] = version
+            metricas.contar('coordinacion.instantaneas')
+
+    def _atender_pedidos(self):
+        for id_pedido, orden, argumento in self.base.pedidos(self._ultimo_pedido):
+            self._ultimo_pedido = id_pedido
+            if orden == 'refrescar':
+                self.poller.despertar()
+            elif orden == 'rellenar':
+                self.poller.rellenar(int(argumento))
+
+    # Misma interfaz que `Poller` para la app.
+
+    @property
+    def rellenando(self):
+        if self.es_lider:
+            return self.poller.rellenando
+        lider = self.base.lider()
+        return lider is not None and lider[2]
+
+    def rellenar(self, dias):
+        if self.es_lider:
+            return self.poller.rellenar(dias)
+        self.base.pedir('rellenar', dias)
+        return True
+
+    def refrescar(self, al_recibir=None, espera_max=None):
+        """Como líder, consulta aquí mismo; como seguidor, lo pide al líder y espera a cargar su publicación.
+
+        El seguidor espera a lo más `espera_max` (o `ESPERA_PEDIDO`) y devuelve False si la
+        publicación no llegó: se cargará igual en una revisión posterior, sin nadie esperando.
+        """
+        if self.es_lider:
+            return self.poller.refrescar(al_recibir, espera_max)
+        version = self.base.version('generacion')
+        self.base.pedir('refrescar')
+        limite = time.monotonic() + (ESPERA_PEDIDO if espera_max is None else min(espera_max, ESPERA_PEDIDO))
+        while self._versiones['generacion'] <= version:
+            if time.monotonic() >= limite:
+                metricas.contar('coordinacion.pedidos_sin_respuesta')
+                return False
+            time.sleep(0.2)
+        if al_recibir is not None:
+            _, datos, _ = self.almacen.leer()
+            for i, item in enumerate(datos or (), 1):
+                al_recibir(item['nombre'], i, len(datos))
+        return True
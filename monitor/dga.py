@@ -0,0 +1,78 @@
+"""Lecturas de caudal y altura de las estaciones DGA, guardadas junto a la generación.
+
+La DGA no publica una API JSON estable: `DGA_URL` apunta a un servicio que responde
+`GET ?bna=&startDate=&endDate=` con `{"data": [{fecha_hora, caudal_m3s, altura_m}, ...]}`,
+sea un puente al portal SNIA o el servidor local de `bench.cen_local`. Sin `DGA_URL`
+la ingesta queda desactivada.
+"""
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from monitor.cache import CacheRespuestas
+from monitor.cliente import CircuitBreaker, ClienteCEN, ErrorCEN
+from monitor.historial import historial
+from monitor.metricas import metricas
+from monitor.motor import limitador_dga
+
+URL_DGA = os.environ.get('DGA_URL', '')
+DIAS_DGA = int(os.environ.get('DGA_DIAS', '2'))
+
+cliente_dga = ClienteCEN(
+    url=URL_DGA,
+    breaker=CircuitBreaker(nombre='dga'),
+    limitador=limitador_dga,
+    intentos=int(os.environ.get('DGA_REINTENTOS', '3')),
+    nombre='dga',
+)
+cache_dga = CacheRespuestas(ttl=int(os.environ.get('DGA_TTL_SEG', '900')), nombre='cache_dga')
+
+
+def dga_habilitada():
+    return bool(cliente_dga.url)
+
+
+def obtener_datos_estacion(estacion, esperar=False, espera_max=None):
+    hoy = datetime.now()
+    desde = (hoy - timedelta(days=DIAS_DGA)).strftime('%Y-%m-%d')
+    ultimo = historial.ultimo_ts_caudal(estacion['bna'])
+    startDate = min(max(ultimo[:10], desde), hoy.strftime('%Y-%m-%d')) if ultimo else desde
+    endDate = (hoy + timedelta(days=1)).strftime('%Y-%m-%d')
+    return cache_dga.obtener(
+        (estacion['bna'], startDate, endDate),
+        lambda: consultar_estacion(estacion, startDate, endDate, desde, espera_max),
+        esperar=esperar,
+    )
+
+
+def consultar_estacion(estacion, startDate, endDate, desde, espera_max=None):
+    try:
+        with metricas.span('dga.descarga'):
+            cuerpo = cliente_dga.pedir({'bna': estacion['bna'], 'startDate': startDate, 'endDate': endDate}, espera_max)
+            historial.guardar_caudales(estacion['bna'], cuerpo.get('data') or [])
+    except ErrorCEN as e:
+        metricas.contar('dga.errores')
+        return {'error': True, 'nombre': estacion['nombre'], 'mensaje': e.mensaje}
+    with metricas.span('dga.parseo'):
+        return resumir_estacion(estacion, historial.leer_caudales(estacion['bna'], desde=desde))
+
+
+def resumir_estacion(estacion, historia):
+    """Última lectura con caudal de la estación (serie más reciente primero)."""
+    if historia.empty:
+        return {'error': True, 'nombre': estacion['nombre'], 'mensaje': 'Sin datos'}
+    validos = np.flatnonzero(~np.isnan(historia['caudal_m3s'].to_numpy()))
+    if not validos.size:
+        return {'error': True, 'nombre': estacion['nombre'], 'mensaje': 'Sin lecturas de caudal'}
+    ultima = historia.iloc[validos[0]]
+    altura = float(ultima['altura_m'])
+    return {
+        'error': False,
+        'nombre':       estacion['nombre'],
+        'bna':          estacion['bna'],
+        'caudal':       round(float(ultima['caudal_m3s']), 2),
+        'altura':       None if np.isnan(altura) else round(altura, 2),
+        'last_update':  ultima['fecha_hora'].strftime('%d/%m %H:%M'),
+        'full_history': historia,
+    }
@@ -0,0 +1,161 @@
+"""Actualizaciones en vivo hacia los navegadores (Server-Sent Events).
+
+Cada vez que el sondeo publica, el canal compara los valores de cada central con los
+anteriores y empuja sólo los que cambiaron. Las tarjetas y el mapa se suscriben con
+`EventSource` y se actualizan en su lugar: ni el navegador consulta la API ni Streamlit
+re-ejecuta el script.
+"""
+import json
+import os
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from monitor.metricas import metricas
+
+PUERTO_EVENTOS = int(os.environ.get('MONITOR_SSE_PUERTO', '8599'))
+# URL pública del canal si hay un proxy delante; si no, el navegador usa su propio host y PUERTO_EVENTOS.
+URL_EVENTOS = os.environ.get('MONITOR_SSE_URL', '')
+LATIDO_SEG = 15
+RUTA_EVENTOS = '/eventos'
+CAMPOS_VIVO = ('gen_mw', 'status', 'uso_pct', 'caudal', 'last_update', 'zona', 'error', 'mensaje')
+
+
+def estado_vivo(datos):
+    """Valores de cada central que muestran las tarjetas y el mapa, por nombre."""
+    return {item['nombre']: {**{c: item['datos'].get(c) for c in CAMPOS_VIVO}, 'alertas': item.get('alertas') or []}
+            for item in datos or ()}
+
+
+def _sse(evento, datos):
+    return f'event: {evento}\ndata: {json.dumps(datos, ensure_ascii=False)}\n\n'.encode()
+
+
+class CanalEventos:
+    """Difunde a cada cliente conectado los cambios entre publicaciones sucesivas del almacén.
+
+    Cada cliente tiene una cola acotada; si se llena (cliente lento o colgado) se le
+    desconecta, y al reconectar recibe de nuevo el estado completo.
+    """
+
+    def __init__(self, max_cola=64):
+        self.max_cola = max_cola
+        self._clientes = set()
+        self._estado = {}
+        self._version = 0
+        self._lock = threading.Lock()
+
+    @property
+    def conectados(self):
+        with self._lock:
+            return len(self._clientes)
+
+    def suscribir(self):
+        cola = queue.Queue(self.max_cola)
+        with self._lock:
+            self._clientes.add(cola)
+            return cola, _sse('estado', {'version': self._version, 'centrales': self._estado})
+
+    def desuscribir(self, cola):
+        with self._lock:
+            self._clientes.discard(cola)
+
+    def publicar(self, version, datos):
+        """Observador del almacén: envía sólo las centrales cuyo estado cambió."""
+        actual = estado_vivo(datos)
+        with self._lock:
+            cambios = {n: v for n, v in actual.items() if self._estado.get(n) != v}
+            self._estado = actual
+            self._version = version
+            clientes = list(self._clientes)
+        if not cambios:
+            return 0
+        mensaje = _sse('cambios', {'version': version, 'centrales': cambios})
+        for cola in clientes:
+            try:
+                cola.put_nowait(mensaje)
+            except queue.Full:
+                self.desuscribir(cola)
+                metricas.contar('eventos.desconectados')
+        metricas.contar('eventos.enviados', len(clientes))
+        return len(cambios)
+
+
+def _handler(canal):
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split('?')[0] != RUTA_EVENTOS:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            cola, inicial = canal.suscribir()
+            try:
+                self.wfile.write(b'retry: 3000\n\n' + inicial)
+                self.wfile.flush()
+                while True:
+                    try:
+                        mensaje = cola.get(timeout=LATIDO_SEG)
+                    except queue.Empty:
+                        mensaje = b': latido\n\n'
+                    self.wfile.write(mensaje)
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                canal.desuscribir(cola)
+
+    return Handler
+
+
+def script_suscripcion(aplicar_js, url=URL_EVENTOS, puerto=PUERTO_EVENTOS):
+    """JS que abre el canal y llama a `aplicar_js(centrales, tipo)` con el estado inicial ('estado') y cada cambio."""
+    return f"""
+(function () {{
+    var url = {json.dumps(url)};
+    if (!url) {{
+        var loc = window.location;
+        try {{ if (!loc.hostname) loc = window.parent.location; }} catch (e) {{}}
+        url = (loc.protocol === 'https:' ? 'https:' : 'http:') + '//' + (loc.hostname || 'localhost') + ':' + {puerto} + '{RUTA_EVENTOS}';
+    }}
+    var aplicar = {aplicar_js};
+    var fuente = new EventSource(url);
+    ['estado', 'cambios'].forEach(function (tipo) {{
+        fuente.addEventListener(tipo, function (e) {{ aplicar(JSON.parse(e.data).centrales, tipo); }});
+    }});
+}})();
+"""
+
+
+canal = CanalEventos()
+_servidor = None
+_servidor_lock = threading.Lock()
+
+
+def iniciar_eventos(almacen, puerto=PUERTO_EVENTOS):
+    """Levanta el servidor de eventos la primera vez y lo suscribe al almacén.
+
+    Devuelve None si el puerto está ocupado (p. ej. otro proceso ya lo sirve).
+    """
+    global _servidor
+    with _servidor_lock:
+        if _servidor is None:
+            try:
+                _servidor = ThreadingHTTPServer(('0.0.0.0', puerto), _handler(canal))
+            except OSError:
+                metricas.contar('eventos.puerto_ocupado')
+                return None
+            _servidor.daemon_threads = True
+            threading.Thread(target=_servidor.serve_forever, daemon=True, name='eventos').start()
+            almacen.suscribir(canal.publicar)
+            version, datos, _ = almacen.leer()
+            if datos is not None:
+                canal.publicar(version, datos)
+        return _servidor
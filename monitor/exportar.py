@@ -0,0 +1,198 @@
+"""Exportación de la historia guardada (generación por central y caudales DGA) a CSV, Parquet o Arrow.
+
+Se lee del historial y se escribe por lotes, así un rango largo nunca se carga entero en
+memoria. Lo usa el botón de descarga de la app y sirve como comando para tareas programadas:
+
+    python -m monitor.exportar --desde 2026-09-01 --formato parquet --salida generacion.parquet
+    python -m monitor.exportar --datos caudales --estacion 08380008-9 > caudales.csv
+    python -m monitor.exportar --actualizar --central "HE EL TORO" --desde 2026-10-01 --salida toro.arrow
+
+Con `--actualizar` antes descarga lo que falte por el mismo camino que el sondeo de la app
+(cliente con reintentos, cache, parseo y guardado), sin levantar Streamlit. La clave del CEN
+se toma de `--user-key` o de la variable `CEN_KEY`.
+"""
+import argparse
+import io
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from monitor.centrales import registro
+from monitor.historial import historial
+from monitor.modelo import a_hora_local, normalizar
+
+LOTE = int(os.environ.get('MONITOR_EXPORTAR_LOTE', '50000'))
+FORMATOS = {
+    'csv':     'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow':   'application/vnd.apache.arrow.stream',
+}
+
+
+def lotes_generacion(nombres=None, desde=None, hasta=None, lote=LOTE):
+    """Serie de cada central (más reciente primero) en DataFrames de a lo más `lote` filas.
+
+    Columnas: `central`, `fecha_hora` (hora de Chile), `gen_real_mw`, `caudal_m3s`, `uso_pct`, `online`.
+    Si el rango no tiene registros entrega un solo lote vacío con esas columnas.
+    """
+    vacio = True
+    for nombre in nombres or registro:
+        for parte in historial.leer_lotes(registro.info(nombre)['id'], desde, hasta, lote):
+            vacio = False
+            yield _marco_generacion(parte, nombre)
+    if vacio:
+        parte = pd.DataFrame({'fecha_hora': pd.Series([], dtype='datetime64[us]'),
+                              'gen_real_mw': np.array([], dtype=np.float32)})
+        yield _marco_generacion(parte, next(iter(nombres or registro)))
+
+
+def _marco_generacion(parte, nombre):
+    marco = normalizar(parte, nombre).drop(columns='hora')
+    marco.insert(0, 'central', pd.Series([nombre] * len(marco), dtype=str))
+    return marco
+
+
+def lotes_caudales(estaciones=None, desde=None, hasta=None, lote=LOTE):
+    """Lecturas de cada estación DGA: `estacion`, `bna`, `fecha_hora`, `caudal_m3s`, `altura_m`.
+
+    Como en `lotes_generacion`, un rango sin lecturas entrega un solo lote vacío.
+    """
+    vacio = True
+    for estacion in estaciones or registro.estaciones:
+        for parte in historial.leer_caudales_lotes(estacion['bna'], desde, hasta, lote):
+            vacio = False
+            yield _marco_caudales(parte, estacion)
+    if vacio:
+        parte = pd.DataFrame({'fecha_hora': pd.Series([], dtype='datetime64[us]'),
+                              'caudal_m3s': np.array([], dtype=np.float32),
+                              'altura_m': np.array([], dtype=np.float32)})
+        yield _marco_caudales(parte, {'nombre': '', 'bna': ''})
+
+
+def _marco_caudales(parte, estacion):
+    parte['fecha_hora'] = a_hora_local(parte['fecha_hora'])
+    parte.insert(0, 'estacion', pd.Series([estacion['nombre']] * len(parte), dtype=str))
+    parte.insert(1, 'bna', pd.Series([estacion['bna']] * len(parte), dtype=str))
+    return parte
+
+
+def escribir(lotes, destino, formato='csv'):
+    """Escribe los lotes uno tras otro en `destino` (archivo binario); devuelve la cantidad de filas.
+
+    El encabezado (CSV) o el esquema (Parquet, Arrow) sale con el primer lote, aunque venga vacío.
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f'Formato desconocido: {formato} (use {", ".join(FORMATOS)})')
+    filas = 0
+    if formato == 'csv':
+        for i, marco in enumerate(lotes):
+            destino.write(marco.to_csv(index=False, header=i == 0, float_format='%.6g').encode())
+            filas += len(marco)
+        return filas
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    escritor = None
+    try:
+        for marco in lotes:
+            tabla = pa.Table.from_pandas(marco, preserve_index=False)
+            if escritor is None:
+                escritor = pq.ParquetWriter(destino, tabla.schema) if formato == 'parquet' else pa.ipc.new_stream(destino, tabla.schema)
+            escritor.write_table(tabla)
+            filas += len(marco)
+    finally:
+        if escritor is not None:
+            escritor.close()
+    return filas
+
+
+def exportar(destino, formato='csv', datos='generacion', claves=None, desde=None, hasta=None, lote=LOTE):
+    """Exporta `datos` ('generacion' o 'caudales') de las centrales o estaciones `claves` (todas si es None)."""
+    if datos == 'caudales':
+        return escribir(lotes_caudales(claves, desde, hasta, lote), destino, formato)
+    return escribir(lotes_generacion(claves, desde, hasta, lote), destino, formato)
+
+
+def exportar_bytes(formato='csv', datos='generacion', claves=None, desde=None, hasta=None):
+    """Como `exportar`, a bytes: para el botón de descarga, que necesita el archivo completo."""
+    destino = io.BytesIO()
+    exportar(destino, formato, datos, claves, desde, hasta)
+    return destino.getvalue()
+
+
+def actualizar(user_key, datos='generacion', claves=None, desde=None):
+    """Descarga lo que falte de las centrales (o estaciones) antes de exportar; devuelve los errores por nombre."""
+    from monitor.cen import obtener_datos_central, rellenar_historial
+    from monitor.dga import dga_habilitada, obtener_datos_estacion
+    from monitor.motor import consultar_en_paralelo
+
+    if datos == 'caudales':
+        if not dga_habilitada():
+            return {'DGA': 'Sin DGA_URL: la ingesta de la DGA está desactivada'}
+        tareas = {est['nombre']: (est, True) for est in claves or registro.estaciones}
+        resultados = dict(consultar_en_paralelo(obtener_datos_estacion, tareas))
+    else:
+        nombres = claves or list(registro)
+        if desde:
+            tareas = {nombre: (registro.info(nombre)['id'], user_key, desde) for nombre in nombres}
+            for nombre, resultado in consultar_en_paralelo(rellenar_historial, tareas):
+                if isinstance(resultado, dict):
+                    print(f'{nombre}: relleno incompleto ({resultado["mensaje"]})', file=sys.stderr)
+        tareas = {nombre: (registro.info(nombre)['id'], nombre, user_key, True) for nombre in nombres}
+        resultados = dict(consultar_en_paralelo(obtener_datos_central, tareas))
+    return {nombre: r['mensaje'] for nombre, r in resultados.items() if r.get('error')}
+
+
+def _estaciones(claves):
+    por_clave = {e['bna']: e for e in registro.estaciones} | {e['nombre']: e for e in registro.estaciones}
+    desconocidas = [c for c in claves if c not in por_clave]
+    if desconocidas:
+        raise SystemExit(f'Estaciones desconocidas: {", ".join(desconocidas)}')
+    return [por_clave[c] for c in claves]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m monitor.exportar', description=__doc__.splitlines()[0])
+    parser.add_argument('--datos', choices=('generacion', 'caudales'), default='generacion')
+    parser.add_argument('--central', action='append', default=[], help='Nombre de la central (repetible; todas por omisión)')
+    parser.add_argument('--estacion', action='append', default=[], help='BNA o nombre de la estación DGA (repetible)')
+    parser.add_argument('--desde', help='YYYY-MM-DD, inclusive')
+    parser.add_argument('--hasta', help='YYYY-MM-DD, exclusive')
+    parser.add_argument('--formato', choices=tuple(FORMATOS), help='Por omisión, la extensión de --salida o csv')
+    parser.add_argument('--salida', default='-', help="Archivo de salida ('-' para la salida estándar)")
+    parser.add_argument('--lote', type=int, default=LOTE, help='Filas por lote')
+    parser.add_argument('--actualizar', action='store_true', help='Descargar lo que falte antes de exportar')
+    parser.add_argument('--user-key', default=os.environ.get('CEN_KEY'))
+    args = parser.parse_args(argv)
+
+    if args.datos == 'caudales':
+        claves = _estaciones(args.estacion) if args.estacion else None
+    else:
+        desconocidas = [c for c in args.central if c not in registro]
+        if desconocidas:
+            parser.error(f'Centrales desconocidas: {", ".join(desconocidas)}')
+        claves = args.central or None
+    formato = args.formato or Path(args.salida).suffix.lstrip('.').lower()
+    if formato not in FORMATOS:
+        formato = 'csv'
+
+    if args.actualizar:
+        if args.datos == 'generacion' and not args.user_key:
+            parser.error('--actualizar necesita --user-key o la variable CEN_KEY')
+        for nombre, mensaje in actualizar(args.user_key, args.datos, claves, args.desde).items():
+            print(f'{nombre}: {mensaje}', file=sys.stderr)
+
+    if args.salida == '-':
+        filas = exportar(sys.stdout.buffer, formato, args.datos, claves, args.desde, args.hasta, args.lote)
+        sys.stdout.buffer.flush()
+    else:
+        with open(args.salida, 'wb') as destino:
+            filas = exportar(destino, formato, args.datos, claves, args.desde, args.hasta, args.lote)
+    print(f'{filas} filas exportadas ({formato})', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,304 @@
+"""Gráficos de las ventanas emergentes del mapa.
+
+matplotlib se importa la primera vez que se dibuja un PNG (o al precalentar): el modo SVG no lo necesita.
+"""
+import base64
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from monitor.cache import CacheLRU
+from monitor.metricas import metricas
+from monitor.modelo import hora_local_ingenua
+
+cache_graficos = CacheLRU(int(float(os.environ.get('MONITOR_CHART_CACHE_MB', '32')) * 1024 * 1024), 'cache_graficos')
+_executor = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix='graficos')
+
+
+_COLUMNAS_PRONOSTICO = ['gen_mw', 'gen_inf', 'gen_sup', 'caudal_m3s', 'caudal_inf', 'caudal_sup']
+
+
+def _clave_grafico(df, pronostico=None):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(df['fecha_hora'].array.asi8.tobytes())
+    h.update(df['gen_real_mw'].to_numpy().tobytes())
+    h.update(df['caudal_m3s'].to_numpy().tobytes())
+    if pronostico is not None:
+        h.update(pronostico['fecha_hora'].array.asi8.tobytes())
+        h.update(pronostico[_COLUMNAS_PRONOSTICO].to_numpy().tobytes())
+    return h.digest()
+
+
+def generate_chart_img(historia, modo='png', pronostico=None):
+    """HTML del gráfico de la ventana emergente, a partir de la serie normalizada (`monitor.modelo`).
+
+    `modo='png'` dibuja con matplotlib; `modo='svg'` genera un SVG en línea directamente
+    desde los datos, sin matplotlib y varias veces más liviano. Con `pronostico`
+    (`monitor.pronostico`) se agregan las líneas punteadas y la banda de confianza.
+    """
+    if historia is None or historia.empty: return None
+    
+    # La serie viene más reciente primero: las últimas 24 horas, en orden cronológico.
+    df = historia.iloc[23::-1]
+    clave = (modo, _clave_grafico(df, pronostico))
+    img = cache_graficos.obtener(clave)
+    if img is None:
+        with metricas.span(f'grafico.{modo}'):
+            img = _svg_grafico(df, pronostico) if modo == 'svg' else _dibujar_grafico(df, pronostico)
+        cache_graficos.guardar(clave, img)
+    return img
+
+
+def generar_graficos(pedidos, modo='png'):
+    """Dibuja en paralelo varios gráficos; `pedidos` es un dict clave -> (historia, pronóstico o None)."""
+    futuros = {clave: _executor.submit(generate_chart_img, historia, modo, pronostico)
+               for clave, (historia, pronostico) in pedidos.items()}
+    return {clave: futuro.result() for clave, futuro in futuros.items()}
+
+
+COLOR_GEN = '#2e9eff'
+COLOR_CAUDAL = '#00e5b0'
+
+
+class _PlantillaGrafico:
+    """Figura de dos ejes ya estilizada; en cada dibujo sólo se reemplazan los datos.
+
+    No usa pyplot: cada hilo tiene su propia `Figure` con un canvas Agg, así que varios
+    gráficos pueden dibujarse en paralelo sin compartir estado global.
+    """
+
+    def __init__(self):
+        import matplotlib.dates as mdates
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        self.fig = Figure(figsize=(5.5, 3), dpi=100)
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.fig.patch.set_alpha(0)
+        ax1 = self.ax1 = self.fig.add_subplot()
+        ax1.patch.set_alpha(0)
+
+        self.linea_gen, = ax1.plot([], [], color=COLOR_GEN, linewidth=2, label='Gen (MW)')
+        self.relleno = ax1.fill_between([0, 1], [0, 0], color=COLOR_GEN, alpha=0.15)
+        self.pron_gen, = ax1.plot([], [], color=COLOR_GEN, linewidth=1.5, linestyle=':')
+        self.banda_gen = ax1.fill_between([0, 1], [0, 0], color=COLOR_GEN, alpha=0.12, linewidth=0)
+        self.ahora = ax1.axvline(0, color='#8b949e', linewidth=0.6, linestyle='--')
+
+        ax1.set_ylabel('Generación (MW)', color=COLOR_GEN, fontsize=8, fontweight='bold', labelpad=5)
+        ax1.tick_params(axis='y', labelcolor=COLOR_GEN, labelsize=8, color=COLOR_GEN)
+        ax1.spines['left'].set_color(COLOR_GEN)
+        ax1.spines['left'].set_linewidth(0.5)
+
+        ax2 = self.ax2 = ax1.twinx()
+        ax2.patch.set_alpha(0)
+        self.linea_caudal, = ax2.plot([], [], color=COLOR_CAUDAL, linewidth=2, linestyle='--', label='Caudal (m³/s)')
+        self.pron_caudal, = ax2.plot([], [], color=COLOR_CAUDAL, linewidth=1.5, linestyle=':')
+        self.banda_caudal = ax2.fill_between([0, 1], [0, 0], color=COLOR_CAUDAL, alpha=0.08, linewidth=0)
+
+        ax2.set_ylabel('Caudal Est. (m³/s)', color=COLOR_CAUDAL, fontsize=8, fontweight='bold', rotation=270, labelpad=15)
+        ax2.tick_params(axis='y', labelcolor=COLOR_CAUDAL, labelsize=8, color=COLOR_CAUDAL)
+        ax2.spines['right'].set_color(COLOR_CAUDAL)
+        ax2.spines['right'].set_linewidth(0.5)
+
+        ax1.xaxis_date()
+        ax1.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
+        ax1.tick_params(axis='x', rotation=0, labelsize=8, colors='#8b949e')
+
+        ax1.spines['top'].set_visible(False)
+        ax2.spines['top'].set_visible(False)
+        ax1.spines['right'].set_visible(False)
+        ax2.spines['left'].set_visible(False)
+        ax1.spines['bottom'].set_color('#30363d')
+        ax2.spines['bottom'].set_visible(False)
+
+        ax1.grid(visible=True, axis='y', color='#30363d', linestyle=':', linewidth=0.5)
+        ax1.grid(visible=False, axis='x')
+
+        # El layout se calcula una sola vez, con etiquetas del ancho máximo esperado.
+        ax1.set_xlim(mdates.date2num(np.datetime64('2000-01-01T00:00')), mdates.date2num(np.datetime64('2000-01-01T23:00')))
+        ax1.set_ylim(0, 1000)
+        ax2.set_ylim(0, 1000)
+        self.fig.tight_layout()
+
+    def dibujar(self, x, gen, caudal, pron=None):
+        """`pron`, si viene, es `(x, gen, gen_inf, gen_sup, caudal, caudal_inf, caudal_sup)` del pronóstico."""
+        self.linea_gen.set_data(x, gen)
+        self.linea_caudal.set_data(x, caudal)
+        self.relleno.set_verts([np.column_stack([
+            np.concatenate([x[:1], x, x[-1:]]),
+            np.concatenate([[0], gen, [0]]),
+        ])])
+
+        x_max, gen_max, caudal_min, caudal_max = x.max(), gen.max(), caudal.min(), caudal.max()
+        for artista in (self.pron_gen, self.banda_gen, self.ahora, self.pron_caudal, self.banda_caudal):
+            artista.set_visible(pron is not None)
+        if pron is not None:
+            xp, gen_p, gen_inf, gen_sup, caudal_p, caudal_inf, caudal_sup = pron
+            self.pron_gen.set_data(xp, gen_p)
+            self.pron_caudal.set_data(xp, caudal_p)
+            self.banda_gen.set_verts([_banda(xp, gen_inf, gen_sup)])
+            self.banda_caudal.set_verts([_banda(xp, caudal_inf, caudal_sup)])
+            self.banda_gen.set_visible(np.isfinite(gen_sup).any())
+            self.banda_caudal.set_visible(np.isfinite(caudal_sup).any())
+            self.ahora.set_xdata([x[-1], x[-1]])
+            x_max, gen_max = xp.max(), _extremo(max, gen_max, gen_p, gen_sup)
+            caudal_min = _extremo(min, caudal_min, caudal_p, caudal_inf)
+            caudal_max = _extremo(max, caudal_max, caudal_p, caudal_sup)
+
+        self.ax1.set_xlim(*_con_margen(x.min(), x_max))
+        self.ax1.set_ylim(*_con_margen(min(0, gen.min()), max(0, gen_max)))
+        self.ax2.set_ylim(*_con_margen(caudal_min, caudal_max))
+
+        buf = io.BytesIO()
+        self.canvas.print_png(buf)
+        return buf.getvalue()
+
+
+def _banda(x, inf, sup):
+    ok = np.isfinite(inf) & np.isfinite(sup)
+    x, inf, sup = x[ok], inf[ok], sup[ok]
+    return np.column_stack([np.concatenate([x, x[::-1]]), np.concatenate([sup, inf[::-1]])])
+
+
+def _extremo(f, actual, *series):
+    """`f` (min o max) entre `actual` y los valores finitos de `series`; ignora las que no tienen ninguno."""
+    valores = np.concatenate(series)
+    valores = valores[np.isfinite(valores)]
+    return f(actual, f(valores)) if valores.size else actual
+
+
+def _con_margen(lo, hi):
+    if hi <= lo:
+        lo, hi = lo - 0.5, hi + 0.5
+    pad = (hi - lo) * 0.05
+    return lo - pad, hi + pad
+
+
+_plantillas = threading.local()
+
+
+def precalentar_graficos():
+    """Importa matplotlib y arma la plantilla de uno de los hilos de dibujo (carga fuentes y estilos)."""
+    _executor.submit(_plantilla).result()
+
+
+def _plantilla():
+    plantilla = getattr(_plantillas, 'plantilla', None)
+    if plantilla is None:
+        plantilla = _plantillas.plantilla = _PlantillaGrafico()
+    return plantilla
+
+
+def _dibujar_grafico(df, pronostico=None):
+    import matplotlib.dates as mdates
+
+    plantilla = _plantilla()
+    x = mdates.date2num(hora_local_ingenua(df))
+    pron = None
+    if pronostico is not None:
+        pron = (mdates.date2num(hora_local_ingenua(pronostico)),
+                *(pronostico[c].to_numpy(dtype=np.float64) for c in _COLUMNAS_PRONOSTICO))
+    png = plantilla.dibujar(x, df['gen_real_mw'].to_numpy(dtype=np.float64), df['caudal_m3s'].to_numpy(dtype=np.float64),
+                            pron)
+
+    img_base64 = base64.b64encode(png).decode('utf-8')
+    return f'<img src="data:image/png;base64,{img_base64}" style="width:100%; border-radius:6px;">'
+
+
+_SVG_ANCHO, _SVG_ALTO = 550, 300
+_SVG_IZQ, _SVG_DER, _SVG_SUP, _SVG_INF = 52, 56, 10, 26
+_SVG_PASOS_HORA = (1, 2, 3, 4, 6, 12, 24)
+
+
+def _ticks(lo, hi, n=5):
+    paso = (hi - lo) / n
+    mag = 10 ** np.floor(np.log10(paso))
+    paso = next(m * mag for m in (1, 2, 2.5, 5, 10) if m * mag >= paso)
+    return np.round(np.arange(np.ceil(lo / paso) * paso, hi + paso * 1e-9, paso), 10) + 0.0
+
+
+def _segundos(df):
+    return hora_local_ingenua(df).astype('datetime64[s]').astype(np.int64).astype(np.float64)
+
+
+def _svg_grafico(df, pronostico=None):
+    t = _segundos(df)
+    gen = df['gen_real_mw'].to_numpy(dtype=np.float64)
+    caudal = df['caudal_m3s'].to_numpy(dtype=np.float64)
+    t_max, gen_max, caudal_min, caudal_max = t.max(), gen.max(), caudal.min(), caudal.max()
+    if pronostico is not None:
+        tp = _segundos(pronostico)
+        gen_p, gen_inf, gen_sup, caudal_p, caudal_inf, caudal_sup = (
+            pronostico[c].to_numpy(dtype=np.float64) for c in _COLUMNAS_PRONOSTICO)
+        t_max, gen_max = tp.max(), _extremo(max, gen_max, gen_p, gen_sup)
+        caudal_min = _extremo(min, caudal_min, caudal_p, caudal_inf)
+        caudal_max = _extremo(max, caudal_max, caudal_p, caudal_sup)
+
+    x0, x1 = _con_margen(t.min(), t_max)
+    lo1, hi1 = _con_margen(min(0, gen.min()), max(0, gen_max))
+    lo2, hi2 = _con_margen(caudal_min, caudal_max)
+    ancho = _SVG_ANCHO - _SVG_IZQ - _SVG_DER
+    alto = _SVG_ALTO - _SVG_SUP - _SVG_INF
+    fondo = _SVG_SUP + alto
+
+    def px(v):
+        return _SVG_IZQ + (v - x0) / (x1 - x0) * ancho
+
+    def py(v, lo, hi):
+        return _SVG_SUP + (hi - v) / (hi - lo) * alto
+
+    def puntos(xs, ys):
+        # Los puntos sin valor (NaN) no se escriben: `nan` no es una coordenada SVG válida.
+        return ' '.join(f'{a:.1f},{b:.1f}' for a, b in zip(xs, ys) if np.isfinite(a) and np.isfinite(b))
+
+    def agregar(plantilla, *listas):
+        if all(listas):
+            partes.append(plantilla.format(*listas))
+
+    xs = px(t)
+    y_gen = py(gen, lo1, hi1)
+    y_caudal = py(caudal, lo2, hi2)
+    y_cero = py(0, lo1, hi1)
+
+    partes = []
+    for v in _ticks(lo1, hi1):
+        y = py(v, lo1, hi1)
+        partes.append(f'<line x1="{_SVG_IZQ}" x2="{_SVG_IZQ + ancho}" y1="{y:.1f}" y2="{y:.1f}" stroke="#30363d" stroke-width="0.7" stroke-dasharray="1,2"/>')
+        partes.append(f'<text x="{_SVG_IZQ - 6}" y="{y + 4:.1f}" text-anchor="end" fill="{COLOR_GEN}">{v:g}</text>')
+    for v in _ticks(lo2, hi2):
+        y = py(v, lo2, hi2)
+        partes.append(f'<text x="{_SVG_IZQ + ancho + 6}" y="{y + 4:.1f}" fill="{COLOR_CAUDAL}">{v:g}</text>')
+
+    horas = (x1 - x0) / 3600
+    paso = 3600 * next((p for p in _SVG_PASOS_HORA if horas / p <= 8), _SVG_PASOS_HORA[-1])
+    for v in np.arange(np.ceil(x0 / paso) * paso, x1, paso):
+        etiqueta = str(np.datetime64(int(v), 's'))[11:16]
+        partes.append(f'<text x="{px(v):.1f}" y="{fondo + 16}" text-anchor="middle" fill="#8b949e">{etiqueta}</text>')
+
+    partes.append(f'<polygon points="{xs[0]:.1f},{y_cero:.1f} {puntos(xs, y_gen)} {xs[-1]:.1f},{y_cero:.1f}" fill="{COLOR_GEN}" fill-opacity="0.15"/>')
+    partes.append(f'<polyline points="{puntos(xs, y_gen)}" fill="none" stroke="{COLOR_GEN}" stroke-width="2"/>')
+    partes.append(f'<polyline points="{puntos(xs, y_caudal)}" fill="none" stroke="{COLOR_CAUDAL}" stroke-width="2" stroke-dasharray="7,3"/>')
+    if pronostico is not None:
+        xp = px(tp)
+        partes.append(f'<line x1="{xs[-1]:.1f}" x2="{xs[-1]:.1f}" y1="{_SVG_SUP}" y2="{fondo}" stroke="#8b949e" stroke-width="0.6" stroke-dasharray="4,3"/>')
+        agregar(f'<polygon points="{{}} {{}}" fill="{COLOR_GEN}" fill-opacity="0.12"/>',
+                puntos(xp, py(gen_sup, lo1, hi1)), puntos(xp[::-1], py(gen_inf, lo1, hi1)[::-1]))
+        agregar(f'<polygon points="{{}} {{}}" fill="{COLOR_CAUDAL}" fill-opacity="0.08"/>',
+                puntos(xp, py(caudal_sup, lo2, hi2)), puntos(xp[::-1], py(caudal_inf, lo2, hi2)[::-1]))
+        agregar(f'<polyline points="{{}}" fill="none" stroke="{COLOR_GEN}" stroke-width="1.5" stroke-dasharray="2,3"/>',
+                puntos(xp, py(gen_p, lo1, hi1)))
+        agregar(f'<polyline points="{{}}" fill="none" stroke="{COLOR_CAUDAL}" stroke-width="1.5" stroke-dasharray="2,3"/>',
+                puntos(xp, py(caudal_p, lo2, hi2)))
+    partes.append(f'<line x1="{_SVG_IZQ}" x2="{_SVG_IZQ + ancho}" y1="{fondo}" y2="{fondo}" stroke="#30363d"/>')
+    partes.append(f'<line x1="{_SVG_IZQ}" x2="{_SVG_IZQ}" y1="{_SVG_SUP}" y2="{fondo}" stroke="{COLOR_GEN}" stroke-width="0.5"/>')
+    partes.append(f'<line x1="{_SVG_IZQ + ancho}" x2="{_SVG_IZQ + ancho}" y1="{_SVG_SUP}" y2="{fondo}" stroke="{COLOR_CAUDAL}" stroke-width="0.5"/>')
+    partes.append(f'<text transform="translate(14 {_SVG_SUP + alto / 2:.0f}) rotate(-90)" text-anchor="middle" fill="{COLOR_GEN}" font-weight="bold">Generación (MW)</text>')
+    partes.append(f'<text transform="translate({_SVG_ANCHO - 10} {_SVG_SUP + alto / 2:.0f}) rotate(90)" text-anchor="middle" fill="{COLOR_CAUDAL}" font-weight="bold">Caudal Est. (m³/s)</text>')
+
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {_SVG_ANCHO} {_SVG_ALTO}" '
+            f'style="width:100%; border-radius:6px;" font-family="Inter, sans-serif" font-size="11">'
+            + ''.join(partes) + '</svg>')
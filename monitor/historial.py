@@ -0,0 +1,234 @@
+"""Almacén local en SQLite con la serie histórica de generación por central."""
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+RUTA_DB = os.environ.get('MONITOR_DB', str(Path(__file__).resolve().parent.parent / 'datos' / 'historial.sqlite3'))
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS generacion (
+    id_central  INTEGER NOT NULL,
+    fecha_hora  TEXT    NOT NULL,
+    gen_real_mw REAL    NOT NULL,
+    PRIMARY KEY (id_central, fecha_hora)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS caudales (
+    bna        TEXT NOT NULL,
+    fecha_hora TEXT NOT NULL,
+    caudal_m3s REAL,
+    altura_m   REAL,
+    PRIMARY KEY (bna, fecha_hora)
+) WITHOUT ROWID;
+"""
+
+
+_UPSERT_GENERACION = (
+    'INSERT INTO generacion (id_central, fecha_hora, gen_real_mw) VALUES (?, ?, ?) '
+    'ON CONFLICT (id_central, fecha_hora) DO UPDATE SET gen_real_mw = excluded.gen_real_mw'
+)
+_UPSERT_CAUDALES = (
+    'INSERT INTO caudales (bna, fecha_hora, caudal_m3s, altura_m) VALUES (?, ?, ?, ?) '
+    'ON CONFLICT (bna, fecha_hora) DO UPDATE SET caudal_m3s = excluded.caudal_m3s, altura_m = excluded.altura_m'
+)
+
+
+_SELECT_GENERACION = 'SELECT fecha_hora, gen_real_mw FROM generacion WHERE id_central = ?'
+_SELECT_CAUDALES = 'SELECT fecha_hora, caudal_m3s, altura_m FROM caudales WHERE bna = ?'
+
+
+def _consulta(sql, clave, desde, hasta):
+    args = [clave]
+    if desde:
+        sql += ' AND fecha_hora >= ?'
+        args.append(desde)
+    if hasta:
+        sql += ' AND fecha_hora < ?'
+        args.append(hasta)
+    return sql + ' ORDER BY fecha_hora DESC', args
+
+
+def _marco_generacion(filas):
+    fecha_hora, gen = zip(*filas) if filas else ((), ())
+    return pd.DataFrame({
+        'fecha_hora':  pd.to_datetime(pd.Series(fecha_hora, dtype=object), format='ISO8601'),
+        'gen_real_mw': np.asarray(gen, dtype=np.float32),
+    })
+
+
+def _marco_caudales(filas):
+    fecha_hora, caudal, altura = zip(*filas) if filas else ((), (), ())
+    return pd.DataFrame({
+        'fecha_hora': pd.to_datetime(pd.Series(fecha_hora, dtype=object), format='ISO8601'),
+        'caudal_m3s': np.asarray(caudal, dtype=np.float64).astype(np.float32),
+        'altura_m':   np.asarray(altura, dtype=np.float64).astype(np.float32),
+    })
+
+
+def conexion_del_hilo(local, ruta):
+    """Conexión a `ruta` propia del hilo que llama, guardada en `local` (un `threading.local`)."""
+    con = getattr(local, 'con', None)
+    if con is None:
+        con = sqlite3.connect(ruta, timeout=30)
+        con.execute('PRAGMA journal_mode=WAL')
+        con.execute('PRAGMA synchronous=NORMAL')
+        local.con = con
+    return con
+
+
+class Historial:
+    """Serie `(id_central, fecha_hora) -> gen_real_mw`.
+
+    La clave primaria agrupa físicamente los registros por central y fecha, y hace que
+    volver a guardar una misma hora sea idempotente (el CEN puede corregir valores recientes).
+    Cada hilo usa su propia conexión.
+    """
+
+    def __init__(self, ruta=RUTA_DB):
+        self.ruta = ruta
+        self._local = threading.local()
+        # Aumenta con cada escritura: sirve de clave a los agregados en cache.
+        self.version = 0
+        self._version_lock = threading.Lock()
+        if ruta != ':memory:':
+            Path(ruta).parent.mkdir(parents=True, exist_ok=True)
+        with self._conexion() as con:
+            con.executescript(_ESQUEMA)
+
+    def _conexion(self):
+        return conexion_del_hilo(self._local, self.ruta)
+
+    def guardar(self, id_central, registros, lote=1000):
+        """Inserta `registros` (cualquier iterable, se consume en streaming) en lotes de `lote` filas.
+
+        Cada lote es una transacción corta: el iterable se consume fuera de ella, para no
+        retener el bloqueo de escritura mientras se descargan las páginas siguientes.
+        """
+        total = 0
+        filas = []
+        for r in registros:
+            if r.get('fecha_hora'):
+                filas.append((id_central, r['fecha_hora'], r.get('gen_real_mw') or 0))
+            if len(filas) >= lote:
+                total += self._escribir(filas)
+                filas = []
+        if filas:
+            total += self._escribir(filas)
+        return total
+
+    def guardar_caudales(self, bna, registros, lote=1000):
+        """Como `guardar`, para las lecturas `{fecha_hora, caudal_m3s, altura_m}` de una estación DGA."""
+        total = 0
+        filas = []
+        for r in registros:
+            if r.get('fecha_hora'):
+                filas.append((bna, r['fecha_hora'], r.get('caudal_m3s'), r.get('altura_m')))
+            if len(filas) >= lote:
+                total += self._escribir(filas, _UPSERT_CAUDALES)
+                filas = []
+        if filas:
+            total += self._escribir(filas, _UPSERT_CAUDALES)
+        return total
+
+    def _escribir(self, filas, sql=None):
+        with self._conexion() as con:
+            con.executemany(sql or _UPSERT_GENERACION, filas)
+        self._nueva_version()
+        return len(filas)
+
+    def _nueva_version(self):
+        with self._version_lock:
+            self.version += 1
+
+    def revisar_cambios(self):
+        """Aumenta `version` si otra conexión (p. ej. otro proceso) escribió desde la última revisión.
+
+        Usa `PRAGMA data_version`, que cambia con cada commit ajeno a la conexión del hilo que
+        llama; conviene llamarla siempre desde el mismo hilo. Devuelve True si hubo cambios.
+        """
+        data_version = self._conexion().execute('PRAGMA data_version').fetchone()[0]
+        anterior = getattr(self._local, 'data_version', None)
+        self._local.data_version = data_version
+        if anterior is not None and data_version != anterior:
+            self._nueva_version()
+            return True
+        return False
+
+    def ultimo_ts(self, id_central):
+        fila = self._conexion().execute(
+            'SELECT MAX(fecha_hora) FROM generacion WHERE id_central = ?', (id_central,)
+        ).fetchone()
+        return fila[0]
+
+    def dias_incompletos(self, id_central, desde, hasta):
+        """Días (`YYYY-MM-DD`) entre `desde` y `hasta` (sin incluirlo) con menos de 24 horas guardadas."""
+        completos = {fila[0] for fila in self._conexion().execute(
+            'SELECT substr(fecha_hora, 1, 10) AS dia FROM generacion '
+            'WHERE id_central = ? AND fecha_hora >= ? AND fecha_hora < ? GROUP BY dia HAVING COUNT(*) >= 24',
+            (id_central, desde, hasta),
+        )}
+        return [dia for dia in pd.date_range(desde, hasta, freq='D', inclusive='left').strftime('%Y-%m-%d')
+                if dia not in completos]
+
+    def leer(self, id_central, desde=None, hasta=None):
+        """Serie de la central entre `desde` y `hasta` (texto `YYYY-MM-DD[ HH:MM:SS]`), más reciente primero.
+
+        Devuelve un DataFrame con `fecha_hora` datetime64 y `gen_real_mw` float32.
+        """
+        filas = self._conexion().execute(*_consulta(_SELECT_GENERACION, id_central, desde, hasta)).fetchall()
+        return _marco_generacion(filas)
+
+    def leer_lotes(self, id_central, desde=None, hasta=None, lote=50000):
+        """Como `leer`, en DataFrames de a lo más `lote` filas: el rango nunca se carga entero."""
+        cursor = self._conexion().execute(*_consulta(_SELECT_GENERACION, id_central, desde, hasta))
+        while filas := cursor.fetchmany(lote):
+            yield _marco_generacion(filas)
+
+    def ultimo_ts_caudal(self, bna):
+        fila = self._conexion().execute('SELECT MAX(fecha_hora) FROM caudales WHERE bna = ?', (bna,)).fetchone()
+        return fila[0]
+
+    def leer_caudales(self, bna, desde=None, hasta=None):
+        """Lecturas de la estación desde `desde`, más reciente primero; `caudal_m3s` y `altura_m` float32 (NaN si faltan)."""
+        filas = self._conexion().execute(*_consulta(_SELECT_CAUDALES, bna, desde, hasta)).fetchall()
+        return _marco_caudales(filas)
+
+    def leer_caudales_lotes(self, bna, desde=None, hasta=None, lote=50000):
+        """Como `leer_caudales`, en DataFrames de a lo más `lote` filas."""
+        cursor = self._conexion().execute(*_consulta(_SELECT_CAUDALES, bna, desde, hasta))
+        while filas := cursor.fetchmany(lote):
+            yield _marco_caudales(filas)
+
+    def leer_ancho(self, ids, desde=None, hasta=None):
+        """Serie de varias centrales en columnas (una por id), indexada por `fecha_hora` ascendente.
+
+        Las horas sin registro de una central quedan en NaN. Las fechas se convierten después
+        de pivotar, una vez por hora y no por fila.
+        """
+        sql = f'SELECT id_central, fecha_hora, gen_real_mw FROM generacion WHERE id_central IN ({",".join("?" * len(ids))})'
+        args = list(ids)
+        if desde:
+            sql += ' AND fecha_hora >= ?'
+            args.append(desde)
+        if hasta:
+            sql += ' AND fecha_hora < ?'
+            args.append(hasta)
+        filas = self._conexion().execute(sql, args).fetchall()
+        id_central, fecha_hora, gen = zip(*filas) if filas else ((), (), ())
+        larga = pd.DataFrame({
+            'id_central':  np.asarray(id_central, dtype=np.int32),
+            'fecha_hora':  pd.Series(fecha_hora, dtype=object),
+            'gen_real_mw': np.asarray(gen, dtype=np.float32),
+        })
+        ancha = larga.pivot(index='fecha_hora', columns='id_central', values='gen_real_mw')
+        ancha = ancha.reindex(columns=list(ids)).astype(np.float32)
+        ancha.index = pd.to_datetime(pd.Series(ancha.index, dtype=object), format='ISO8601')
+        ancha.index.name = 'fecha_hora'
+        return ancha.sort_index()
+
+
+historial = Historial()
@@ -0,0 +1,303 @@
+"""Construcción de los mapas folium, cacheados como HTML ya renderizado.
+
+folium (y matplotlib, vía `monitor.graficos`) se importan recién al construir un mapa o al
+precalentar, no al importar este módulo. En la primera pasada, incluso la vista de espera,
+folium se carga igual, pero después de enviar el encabezado y las tarjetas: `precalentar` lo
+importa en otro hilo y el mapa DGA se arma más abajo en la misma pasada. Las pasadas que
+sirven los mapas desde la cache no los vuelven a construir.
+"""
+import hashlib
+import json
+import os
+import threading
+
+from monitor.cache import CacheLRU
+from monitor.centrales import registro
+from monitor.eventos import script_suscripcion
+from monitor.graficos import generar_graficos, precalentar_graficos
+from monitor.metricas import metricas
+
+
+# 'auto' usa PNG mientras haya pocas centrales y SVG inline (mucho más liviano) sobre ese número.
+MODO_GRAFICOS = os.environ.get('MONITOR_GRAFICOS', 'auto')
+MAX_CENTRALES_PNG = int(os.environ.get('MONITOR_MAX_CENTRALES_PNG', '30'))
+# Sobre este número de centrales los marcadores se agrupan según el zoom.
+MAX_MARCADORES_SUELTOS = int(os.environ.get('MONITOR_MAX_MARCADORES', '25'))
+
+# Las ventanas emergentes llevan su propia tarjeta; se quita el marco blanco de Leaflet.
+_CSS_POPUP = """
+<style>
+.leaflet-popup-content-wrapper { background: transparent !important; box-shadow: none !important; border: none !important; }
+.leaflet-popup-tip { display: none; }
+</style>
+"""
+
+cache_mapas = CacheLRU(int(float(os.environ.get('MONITOR_MAP_CACHE_MB', '16')) * 1024 * 1024), 'cache_mapas')
+
+
+def _clave_mapa(data_list, modo_grafico, vivo=False):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f'{modo_grafico}|{vivo}'.encode())
+    for item in data_list:
+        res = item['datos']
+        h.update(repr((item['nombre'], item['info']['coords'], res.get('error'), res.get('mensaje'),
+                       res.get('gen_mw'), res.get('status'), res.get('last_update'))).encode())
+        historia = res.get('full_history')
+        if historia is not None:
+            h.update(historia['fecha_hora'].array.asi8.tobytes())
+            h.update(historia['gen_real_mw'].to_numpy().tobytes())
+        pronostico = item.get('pronostico')
+        if pronostico is not None:
+            h.update(pronostico['fecha_hora'].array.asi8.tobytes())
+            h.update(pronostico[['gen_mw', 'gen_inf', 'gen_sup']].to_numpy().tobytes())
+    return h.digest()
+
+
+_precalentado = threading.Event()
+_precalentar_lock = threading.Lock()
+
+
+def precalentar():
+    """Importa folium y matplotlib en un hilo aparte, una vez por proceso."""
+    with _precalentar_lock:
+        if _precalentado.is_set():
+            return
+        _precalentado.set()
+
+    def importar():
+        with metricas.span('mapa.precalentar'):
+            import folium.plugins  # noqa: F401
+            precalentar_graficos()
+
+    threading.Thread(target=importar, daemon=True, name='precalentar').start()
+
+
+def _renderizar(m):
+    import folium
+
+    m.get_root().header.add_child(folium.Element(_CSS_POPUP), name='css_popup')
+    return m.get_root().render()
+
+
+def html_mapa_centrales(data_list, modo_grafico=MODO_GRAFICOS, vivo=False):
+    """HTML del mapa de centrales; sólo se reconstruye cuando cambian los datos que muestra.
+
+    Con `vivo=True` los marcadores se suscriben al canal de eventos y actualizan color y
+    tooltip en su lugar.
+    """
+    if modo_grafico == 'auto':
+        modo_grafico = 'png' if len(data_list) <= MAX_CENTRALES_PNG else 'svg'
+    clave = _clave_mapa(data_list, modo_grafico, vivo)
+    html = cache_mapas.obtener(clave)
+    if html is None:
+        with metricas.span('mapa.centrales.construccion'):
+            html = _renderizar(_construir_mapa_centrales(data_list, modo_grafico, vivo))
+        cache_mapas.guardar(clave, html)
+    return html
+
+
+def html_mapa_dga(lecturas=None):
+    """HTML del mapa de estaciones DGA con su última lectura; se reconstruye sólo cuando cambia alguna."""
+    lecturas = {item['estacion']['bna']: item['datos'] for item in lecturas or ()}
+    clave = ('dga',) + tuple(sorted((bna, res.get('caudal'), res.get('altura'), res.get('last_update'))
+                                    for bna, res in lecturas.items()))
+    html = cache_mapas.obtener(clave)
+    if html is None:
+        with metricas.span('mapa.dga.construccion'):
+            html = _renderizar(_construir_mapa_dga(lecturas))
+        cache_mapas.guardar(clave, html)
+    return html
+
+
+# Recolorea el punto y reescribe el tooltip de cada marcador con el valor recibido.
+_JS_MARCADORES = """function (centrales) {
+    Object.keys(centrales).forEach(function (nombre) {
+        var c = centrales[nombre], marcador = MARCADORES[nombre];
+        if (!marcador || c.error) return;
+        var color = c.gen_mw > 0 ? '#00e5b0' : '#8b949e';
+        marcador.setTooltipContent(nombre + ' | ' + c.gen_mw + ' MW');
+        var el = marcador.getElement();
+        if (!el) return;
+        el.querySelectorAll('.punto-central').forEach(function (d) {
+            d.style.backgroundColor = color;
+            d.style.boxShadow = d.style.boxShadow ? '0 0 10px ' + color : '';
+        });
+    });
+}"""
+
+
+def _construir_mapa_centrales(data_list, modo_grafico, vivo=False):
+    import folium
+    from folium.features import DivIcon
+    from folium.plugins import MarkerCluster
+
+    m = folium.Map(
+        location=[-37.32, -71.55], 
+        zoom_start=11, 
+        tiles='https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}',
+        attr='Esri',
+        prefer_canvas=True
+    )
+    folium.TileLayer(
+        tiles='https://services.arcgisonline.com/ArcGIS/rest/services/Reference/World_Boundaries_and_Places/MapServer/tile/{z}/{y}/{x}',
+        attr='Esri',
+        overlay=True,
+        opacity=0.5
+    ).add_to(m)
+    capa = m
+    if len(data_list) > MAX_MARCADORES_SUELTOS:
+        capa = MarkerCluster(options={'maxClusterRadius': 40}).add_to(m)
+        m.fit_bounds([item['info']['coords'] for item in data_list])
+    
+    marcadores = {}
+    graficos = generar_graficos({
+        item['nombre']: (item['datos'].get('full_history'), item.get('pronostico'))
+        for item in data_list if not item['datos'].get('error')
+    }, modo=modo_grafico)
+
+    for item in data_list:
+        res = item['datos']
+        if res.get('error'): continue
+        
+        is_active = res['gen_mw'] > 0
+        color = "#00e5b0" if is_active else "#8b949e"
+        
+        chart_img = graficos[item['nombre']]
+        pronostico = item.get('pronostico')
+        leyenda = ''
+        if chart_img and pronostico is not None:
+            # La banda sólo se anuncia cuando el modelo ya tiene una estimación del error.
+            banda = ' · banda 80 %' if pronostico['gen_sup'].notna().any() else ''
+            leyenda = f'<div class="ts">Pronóstico {len(pronostico)} h · {pronostico.attrs.get("modelo", "")}{banda}</div>'
+        
+        popup_html = f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <style>
+                @import url('https://fonts.googleapis.com/css2?family=JetBrains+Mono:wght@400;700&family=Inter:wght@400;700;800&display=swap');
+                body {{ margin: 0; padding: 0; background: transparent; font-family: 'Inter', sans-serif; }}
+                .popup-card {{
+                    width: 85vw;
+                    max-width: 380px;
+                    background: rgba(14, 17, 23, 0.95);
+                    backdrop-filter: blur(10px);
+                    border: 1px solid rgba(255, 255, 255, 0.1);
+                    border-radius: 12px;
+                    padding: 16px;
+                    color: #f0f6fc;
+                    box-shadow: 0 14px 40px rgba(0,0,0,0.6);
+                }}
+                .header {{ display: flex; justify-content: space-between; align-items: center; border-bottom: 1px solid rgba(255,255,255,0.1); padding-bottom: 10px; margin-bottom: 12px; }}
+                .title {{ font-size: 16px; font-weight: 800; color: #fff; letter-spacing: -0.5px; }}
+                .status {{ font-family: 'JetBrains Mono'; font-size: 10px; font-weight: 700; color: {color}; background: rgba(255,255,255,0.05); padding: 4px 8px; border-radius: 4px; text-transform: uppercase; }}
+                .chart-container {{ margin-top: 5px; margin-bottom: 5px; }}
+                .footer {{ display: flex; justify-content: space-between; align-items: center; margin-top: 10px; padding-top: 8px; border-top: 1px solid rgba(255,255,255,0.05); }}
+                .ts {{ font-size: 10px; color: #666; font-family: 'JetBrains Mono'; }}
+                .val-highlight {{ font-size: 12px; font-weight: 700; color: #fff; }}
+            </style>
+        </head>
+        <body>
+            <div class="popup-card">
+                <div class="header">
+                    <div class="title">{res['nombre']}</div>
+                    <div class="status">● {res['status']}</div>
+                </div>
+                <div class="chart-container">
+                    {chart_img if chart_img else '<div style="padding:20px;text-align:center;color:#666">Esperando datos...</div>'}
+                    {leyenda}
+                </div>
+                <div class="footer">
+                    <div class="ts">Último: {res['last_update']} {res['zona']}</div>
+                    <div class="val-highlight">{res['gen_mw']:.1f} MW</div>
+                </div>
+            </div>
+        </body>
+        </html>
+        """
+        
+        marker_html = f"""
+        <div style="position: relative; display: flex; align-items: center; justify-content: center; width: 24px; height: 24px;">
+            <div class="punto-central" style="
+                position: absolute;
+                width: 12px; height: 12px;
+                background-color: {color};
+                border-radius: 50%;
+                border: 2px solid #0e1117;
+                z-index: 2;
+                box-shadow: 0 0 10px {color};
+            "></div>
+            <div class="punto-central" style="
+                position: absolute;
+                width: 24px; height: 24px;
+                background-color: {color};
+                border-radius: 50%;
+                opacity: 0.4;
+                z-index: 1;
+                animation: pulse-ring 2s cubic-bezier(0.215, 0.61, 0.355, 1) infinite;
+            "></div>
+            <style>
+                @keyframes pulse-ring {{
+                    0% {{ transform: scale(0.5); opacity: 0; }}
+                    50% {{ opacity: 0.5; }}
+                    100% {{ transform: scale(1.5); opacity: 0; }}
+                }}
+            </style>
+        </div>
+        """
+
+        marcador = folium.Marker(
+            location=item['info']['coords'],
+            popup=folium.Popup(popup_html, max_width=400),
+            tooltip=f"{res['nombre']} | {res['gen_mw']} MW",
+            icon=DivIcon(html=marker_html, icon_size=(24, 24), icon_anchor=(12, 12))
+        ).add_to(capa)
+        marcadores[item['nombre']] = marcador.get_name()
+
+    if vivo:
+        indice = ", ".join(f"{json.dumps(nombre)}: {var}" for nombre, var in marcadores.items())
+        # Los marcadores se declaran más abajo en el mismo <script>: se espera a que existan.
+        m.get_root().script.add_child(folium.Element(
+            "document.addEventListener('DOMContentLoaded', function () {\n"
+            f"var MARCADORES = {{{indice}}};\n" + script_suscripcion(_JS_MARCADORES) + "});\n"
+        ))
+    return m
+
+
+def _construir_mapa_dga(lecturas):
+    import folium
+
+    m_dga = folium.Map(
+        location=[-37.28, -71.80], 
+        zoom_start=10, 
+        tiles='https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}',
+        attr='Esri',
+        prefer_canvas=True
+    )
+    
+    for est in registro.estaciones:
+        res = lecturas.get(est['bna']) or {}
+        lectura_html = ""
+        tooltip = est["nombre"]
+        if res and not res.get('error'):
+            altura = f" · {res['altura']} m" if res['altura'] is not None else ""
+            lectura_html = f"""
+            <div style="font-family: 'JetBrains Mono', monospace; font-size: 12px; margin-top: 5px;">
+                Caudal: <b>{res['caudal']} m³/s</b>{altura}<br>
+                <span style="color: #666;">{res['last_update']}</span>
+            </div>"""
+            tooltip = f"{est['nombre']} | {res['caudal']} m³/s"
+        popup_html = f"""
+        <div style="font-family: 'Inter', sans-serif; color: #333; padding: 5px;">
+            <div style="font-weight: 800; font-size: 14px; margin-bottom: 5px;">{est['nombre']}</div>
+            <div style="font-family: 'JetBrains Mono', monospace; font-size: 12px;">Código BNA: <b>{est['bna']}</b></div>{lectura_html}
+        </div>
+        """
+        
+        folium.Marker(
+            location=[est["lat"], est["lon"]],
+            popup=folium.Popup(popup_html, max_width=300),
+            tooltip=tooltip,
+            icon=folium.Icon(color="blue", icon="info-sign")
+        ).add_to(m_dga)
+    return m_dga
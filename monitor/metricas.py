@@ -0,0 +1,113 @@
+"""Tiempos y contadores de las etapas calientes, compartidos por todo el proceso."""
+import bisect
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+import numpy as np
+
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+RUTA_PROMETHEUS = os.environ.get('MONITOR_METRICAS_PROM')
+
+
+class Metricas:
+    """Anillo con las últimas mediciones, histogramas acumulados por etapa y contadores."""
+
+    def __init__(self, capacidad=5000):
+        self._recientes = deque(maxlen=capacidad)
+        self._histogramas = {}
+        self._sumas = Counter()
+        self._contadores = Counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, etapa):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(etapa, time.perf_counter() - t0)
+
+    def registrar(self, etapa, segundos):
+        with self._lock:
+            self._recientes.append((time.time(), etapa, segundos))
+            cubetas = self._histogramas.setdefault(etapa, [0] * (len(BUCKETS) + 1))
+            cubetas[bisect.bisect_left(BUCKETS, segundos)] += 1
+            self._sumas[etapa] += segundos
+
+    def contar(self, nombre, n=1):
+        with self._lock:
+            self._contadores[nombre] += n
+
+    def resumen(self):
+        """Estadísticas de las mediciones recientes por etapa (ms) y los contadores acumulados."""
+        with self._lock:
+            recientes = list(self._recientes)
+            contadores = dict(self._contadores)
+        por_etapa = {}
+        for _, etapa, seg in recientes:
+            por_etapa.setdefault(etapa, []).append(seg * 1000)
+        etapas = {
+            etapa: {
+                'n': len(v),
+                'p50_ms': float(np.percentile(v, 50)),
+                'p95_ms': float(np.percentile(v, 95)),
+                'max_ms': float(max(v)),
+            }
+            for etapa, v in sorted(por_etapa.items())
+        }
+        return etapas, contadores
+
+    def histogramas(self):
+        with self._lock:
+            return {etapa: list(c) for etapa, c in self._histogramas.items()}
+
+    def tasa_aciertos(self, prefijo):
+        """Fracción de aciertos de una cache a partir de los contadores `<prefijo>.hit/.stale/.miss`."""
+        with self._lock:
+            hit = self._contadores[f'{prefijo}.hit']
+            total = hit + self._contadores[f'{prefijo}.stale'] + self._contadores[f'{prefijo}.miss']
+        return hit / total if total else None
+
+    def prometheus(self):
+        with self._lock:
+            histogramas = {e: list(c) for e, c in self._histogramas.items()}
+            sumas = dict(self._sumas)
+            contadores = dict(self._contadores)
+        lineas = [
+            '# HELP monitor_etapa_segundos Duración de las etapas del monitor.',
+            '# TYPE monitor_etapa_segundos histogram',
+        ]
+        for etapa, cubetas in sorted(histogramas.items()):
+            acumulado = 0
+            for limite, n in zip(BUCKETS + ('+Inf',), cubetas):
+                acumulado += n
+                lineas.append(f'monitor_etapa_segundos_bucket{{etapa="{etapa}",le="{limite}"}} {acumulado}')
+            lineas.append(f'monitor_etapa_segundos_sum{{etapa="{etapa}"}} {sumas[etapa]:.6f}')
+            lineas.append(f'monitor_etapa_segundos_count{{etapa="{etapa}"}} {acumulado}')
+        lineas += [
+            '# HELP monitor_eventos_total Eventos contados por el monitor (cache, reintentos, respuestas del CEN).',
+            '# TYPE monitor_eventos_total counter',
+        ]
+        for nombre, n in sorted(contadores.items()):
+            lineas.append(f'monitor_eventos_total{{evento="{nombre}"}} {n}')
+        return '\n'.join(lineas) + '\n'
+
+    def exportar_prometheus(self, ruta=None):
+        """Escribe el formato de texto de Prometheus (p. ej. para el textfile collector de node_exporter)."""
+        ruta = ruta or RUTA_PROMETHEUS
+        if not ruta:
+            return
+        tmp = f'{ruta}.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                f.write(self.prometheus())
+            os.replace(tmp, ruta)
+        except OSError:
+            self.contar('metricas.errores_exportar')
+
+
+metricas = Metricas()
@@ -0,0 +1,65 @@
+"""Serie normalizada de una central: fechas en hora de Chile y columnas derivadas calculadas una vez.
+
+Se arma al ingerir (tras cada descarga) y las vistas leen sus columnas tal cual, sin volver
+a parsear fechas ni recalcular caudal, carga o estado.
+"""
+import numpy as np
+import pandas as pd
+
+from monitor.centrales import registro
+
+ZONA = 'America/Santiago'
+# Etiqueta `HH:MM` de cada minuto del día: formatear es indexar, sin strftime por fila.
+_ETIQUETAS_MINUTO = np.array([f'{m // 60:02d}:{m % 60:02d}' for m in range(24 * 60)], dtype=object)
+
+
+def a_hora_local(fechas):
+    """Fechas sin zona, como las publica el CEN, a `America/Santiago` (UTC-3 / UTC-4 según la época).
+
+    La hora que se repite al pasar a horario de invierno se desambigua por orden si viene
+    dos veces y, si viene una sola, se toma como horario de invierno. Las horas que no
+    existen (cambio a horario de verano) se corren a la siguiente.
+    """
+    ascendentes = fechas.iloc[::-1]
+    try:
+        local = ascendentes.dt.tz_localize(ZONA, ambiguous='infer', nonexistent='shift_forward')
+    except ValueError:
+        local = ascendentes.dt.tz_localize(ZONA, ambiguous=np.zeros(len(fechas), dtype=bool), nonexistent='shift_forward')
+    return local.iloc[::-1]
+
+
+def normalizar(historia, nombre_central):
+    """Serie de la central (más reciente primero) con columnas listas para mostrar.
+
+    - `fecha_hora`: datetime con zona America/Santiago.
+    - `gen_real_mw`, `caudal_m3s`, `uso_pct`: float32.
+    - `online`: generación mayor que cero.
+    - `hora`: `HH:MM` local, para tablas y etiquetas.
+    """
+    gen = historia['gen_real_mw'].to_numpy(dtype=np.float32)
+    eficiencia = registro.eficiencia(nombre_central)
+    capacidad = registro.capacidad(nombre_central)
+    fecha_hora = a_hora_local(historia['fecha_hora'])
+    return pd.DataFrame({
+        'fecha_hora':  fecha_hora.array,
+        'gen_real_mw': gen,
+        'caudal_m3s':  gen / np.float32(eficiencia) if eficiencia > 0 else np.zeros_like(gen),
+        'uso_pct':     gen * np.float32(100 / capacidad) if capacidad > 0 else np.zeros_like(gen),
+        'online':      gen > 0,
+        'hora':        _ETIQUETAS_MINUTO[_minuto_del_dia(fecha_hora)],
+    })
+
+
+def _minuto_del_dia(fechas):
+    pared = fechas.dt.tz_localize(None).to_numpy().astype('datetime64[m]').astype(np.int64)
+    return pared % (24 * 60)
+
+
+def zona_horaria(fecha):
+    """Etiqueta `UTC-3` / `UTC-4` de una fecha local."""
+    return f"UTC{int(fecha.utcoffset().total_seconds() // 3600):+d}"
+
+
+def hora_local_ingenua(historia):
+    """Hora local de pared sin zona, en `datetime64`, para ejes de gráficos."""
+    return historia['fecha_hora'].dt.tz_localize(None).to_numpy()
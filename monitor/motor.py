@@ -0,0 +1,70 @@
+"""Motor de consultas concurrentes a la API del CEN."""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+class TokenBucket:
+    """Limitador de tasa compartido entre todos los hilos del proceso."""
+
+    def __init__(self, tasa, capacidad):
+        self.tasa = float(tasa)
+        self.capacidad = float(capacidad)
+        self._tokens = self.capacidad
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reponer(self, ahora):
+        self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.tasa)
+        self._ultimo = ahora
+
+    def adquirir(self, tokens=1):
+        while True:
+            with self._lock:
+                self._reponer(time.monotonic())
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                espera = (tokens - self._tokens) / self.tasa
+            time.sleep(espera)
+
+
+MAX_WORKERS = int(os.environ.get('CEN_MAX_WORKERS', '16'))
+
+limitador_cen = TokenBucket(
+    tasa=float(os.environ.get('CEN_RPS', '4')),
+    capacidad=float(os.environ.get('CEN_BURST', '8')),
+)
+limitador_dga = TokenBucket(
+    tasa=float(os.environ.get('DGA_RPS', '2')),
+    capacidad=float(os.environ.get('DGA_BURST', '4')),
+)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='cen')
+        return _executor
+
+
+def consultar_en_paralelo(funcion, tareas):
+    """Ejecuta `funcion(*args)` para cada tarea y entrega `(clave, resultado)` a medida que terminan.
+
+    `tareas` es un dict clave -> tupla de argumentos. El orden de entrega es el de llegada,
+    de modo que quien consume puede ir actualizando la barra de progreso.
+    """
+    executor = _get_executor()
+    futuros = {executor.submit(funcion, *args): clave for clave, args in tareas.items()}
+    for futuro in as_completed(futuros):
+        clave = futuros[futuro]
+        try:
+            resultado = futuro.result()
+        except Exception as e:
+            resultado = {'error': True, 'mensaje': f'Falla interna: {e}'}
+        yield clave, resultado
@@ -0,0 +1,250 @@
+"""Sondeo periódico del CEN, único por proceso, independiente de las sesiones de Streamlit."""
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from operator import itemgetter
+
+import pandas as pd
+
+from monitor.alertas import detector
+from monitor.cache import cache_cen
+from monitor.centrales import registro
+from monitor.cen import obtener_datos_central, rellenar_historial
+from monitor.dga import dga_habilitada, obtener_datos_estacion
+from monitor.metricas import metricas
+from monitor.motor import consultar_en_paralelo
+from monitor.pronostico import pronosticador
+
+INTERVALO_SEG = int(os.environ.get('CEN_POLL_SEG', '300'))
+# Tope de espera por reintentos cuando hay alguien mirando la barra de progreso.
+ESPERA_INTERACTIVA = float(os.environ.get('CEN_ESPERA_INTERACTIVA', '3'))
+# Filas de cada serie que se publican: las que usan el gráfico del popup (24 h) y la tabla.
+FILAS_PUBLICADAS = int(os.environ.get('MONITOR_FILAS_PUBLICADAS', '24'))
+MAX_INSTANTANEAS = int(os.environ.get('MONITOR_INSTANTANEAS', '3'))
+
+
+def compactar(resultado, filas=FILAS_PUBLICADAS):
+    """Resultado con `full_history` recortada a sus `filas` más recientes, en arreglos propios.
+
+    Copiar el recorte (y no quedarse con una vista) suelta la serie completa de la descarga.
+    """
+    historia = resultado.get('full_history')
+    if historia is None or len(historia) <= filas:
+        return resultado
+    return {**resultado, 'full_history': historia.iloc[:filas].copy()}
+
+
+def _mismo(a, b):
+    if isinstance(a, pd.DataFrame) or isinstance(b, pd.DataFrame):
+        return a is b
+    return a == b
+
+
+def _deduplicar(nuevo, anterior):
+    """`nuevo` con los DataFrames iguales a los de `anterior` reemplazados por esos mismos objetos.
+
+    Si todo coincide devuelve `anterior`: una central sin cambios no ocupa memoria nueva.
+    """
+    if not isinstance(anterior, dict):
+        return nuevo
+    salida = {}
+    for clave, valor in nuevo.items():
+        previo = anterior.get(clave)
+        if isinstance(valor, dict):
+            valor = _deduplicar(valor, previo)
+        elif isinstance(valor, pd.DataFrame) and isinstance(previo, pd.DataFrame) and (
+                valor is previo or valor.equals(previo)):
+            valor = previo
+        salida[clave] = valor
+    if salida.keys() == anterior.keys() and all(_mismo(v, anterior[k]) for k, v in salida.items()):
+        return anterior
+    return salida
+
+
+class AlmacenDatos:
+    """Instantáneas publicadas por el sondeo, inmutables y compartidas por todas las sesiones.
+
+    Cada publicación recibe una versión y se guarda como tupla; se conservan las últimas
+    `max_instantaneas`. Lo que no cambió respecto de la publicación anterior (por central,
+    según `clave`) se reutiliza en vez de guardarse de nuevo, así varias versiones vivas no
+    duplican las series. Las sesiones no copian nada: leen la versión que necesitan.
+    """
+
+    def __init__(self, clave=itemgetter('nombre'), max_instantaneas=MAX_INSTANTANEAS):
+        self._lock = threading.Lock()
+        self._clave = clave
+        self._version = 0
+        self._datos = None
+        self._ts = None
+        self._instantaneas = OrderedDict()
+        self._max_instantaneas = max(max_instantaneas, 1)
+        self._observadores = []
+
+    def suscribir(self, funcion):
+        """`funcion(version, datos)` se llama tras cada publicación, fuera del lock."""
+        with self._lock:
+            self._observadores.append(funcion)
+
+    def publicar(self, datos, ts=None):
+        """Publica `datos` como una versión nueva; `ts` es la hora de la consulta (ahora, si no se da)."""
+        with self._lock:
+            anterior = self._datos
+        # Sólo publica el sondeo (uno por almacén): comparar con la versión anterior puede ir fuera del lock.
+        previos = {self._clave(item): item for item in anterior or ()}
+        datos = tuple(_deduplicar(item, previos.get(self._clave(item))) for item in datos)
+        metricas.contar('almacen.reutilizados', sum(item is previos.get(self._clave(item)) for item in datos))
+        with self._lock:
+            self._version += 1
+            self._datos = datos
+            self._ts = ts or datetime.now()
+            self._instantaneas[self._version] = (datos, self._ts)
+            while len(self._instantaneas) > self._max_instantaneas:
+                self._instantaneas.popitem(last=False)
+            version, observadores = self._version, list(self._observadores)
+        for funcion in observadores:
+            funcion(version, datos)
+
+    def leer(self, version=None):
+        """`(version, datos, ts)` de la versión pedida si aún se conserva; si no, de la última."""
+        with self._lock:
+            if version is not None and version in self._instantaneas:
+                return (version, *self._instantaneas[version])
+            return self._version, self._datos, self._ts
+
+
+class Poller(threading.Thread):
+
+    def __init__(self, user_key, almacen, centrales=registro, intervalo=INTERVALO_SEG, almacen_dga=None,
+                 estaciones=registro.estaciones, detector=detector, pronosticador=pronosticador, activo=None):
+        super().__init__(daemon=True, name='cen-poller')
+        self.user_key = user_key
+        self.almacen = almacen
+        self.almacen_dga = almacen_dga
+        self.centrales = centrales
+        self.estaciones = estaciones
+        self.detector = detector
+        self.pronosticador = pronosticador
+        self.intervalo = intervalo
+        # En modo compartido, `activo()` dice si este proceso es el líder: si no, el hilo espera sin consultar.
+        self.activo = activo
+        self._despertar = threading.Event()
+        self._ciclo_lock = threading.Lock()
+        self._relleno_lock = threading.Lock()
+        self._relleno = None
+
+    def run(self):
+        while True:
+            if self.activo is None or self.activo():
+                try:
+                    self.refrescar()
+                    self.refrescar_dga()
+                    metricas.exportar_prometheus()
+                except Exception:
+                    # Un ciclo fallido no debe terminar el hilo: el siguiente vuelve a intentar.
+                    metricas.contar('poller.errores')
+            self._despertar.wait(self.intervalo)
+            self._despertar.clear()
+
+    def despertar(self):
+        """Adelanta el próximo ciclo del hilo, sin esperar a que se cumpla el intervalo."""
+        self._despertar.set()
+
+    def refrescar(self, al_recibir=None, espera_max=None):
+        """Consulta todas las centrales y publica el resultado en el almacén.
+
+        `al_recibir(nombre, i, n)` se invoca a medida que llega cada central. Con `espera_max`
+        una central que necesite reintentar más que eso conserva su último valor en cache, y si
+        ya hay un ciclo en curso se espera a lo más eso a que publique en vez de lanzar otro.
+        Devuelve False si ese ciclo no terminó a tiempo: queda publicado lo anterior.
+        """
+        if not self._ciclo_lock.acquire(blocking=False):
+            if not self._ciclo_lock.acquire(timeout=-1 if espera_max is None else espera_max):
+                metricas.contar('poller.ciclo_ocupado')
+                return False
+            if espera_max is not None:
+                # El ciclo en curso acaba de publicar: no hace falta consultar de nuevo.
+                self._ciclo_lock.release()
+                return True
+        try:
+            self._ciclo(al_recibir, espera_max)
+        finally:
+            self._ciclo_lock.release()
+        return True
+
+    def _ciclo(self, al_recibir, espera_max):
+        with metricas.span('poller.ciclo'):
+            for info in self.centrales.values():
+                cache_cen.invalidar(info['id'])
+            tareas = {nombre: (info['id'], nombre, self.user_key, True, espera_max)
+                      for nombre, info in self.centrales.items()}
+            resultados = {}
+            for i, (nombre, resultado) in enumerate(consultar_en_paralelo(obtener_datos_central, tareas), 1):
+                resultados[nombre] = resultado
+                if al_recibir is not None:
+                    al_recibir(nombre, i, len(tareas))
+            with metricas.span('poller.alertas'):
+                alertas = {nombre: self.detector.procesar(nombre, resultado) for nombre, resultado in resultados.items()}
+            pronosticos = self.pronosticar()
+            self.almacen.publicar([{'nombre': nombre, 'info': info, 'datos': compactar(resultados[nombre]), 'alertas': alertas[nombre],
+                                    'pronostico': pronosticos.get(nombre)}
+                                   for nombre, info in self.centrales.items()])
+
+    def pronosticar(self):
+        """Avanza los modelos con lo recién guardado; si fallan, la publicación sigue sin pronóstico."""
+        try:
+            return self.pronosticador.actualizar()
+        except Exception:
+            metricas.contar('pronostico.errores')
+            return {}
+
+    def refrescar_dga(self):
+        """Consulta las estaciones DGA y publica sus últimas lecturas, si la ingesta está activa."""
+        if self.almacen_dga is None or not self.estaciones or not dga_habilitada():
+            return
+        with metricas.span('poller.ciclo_dga'):
+            tareas = {est['bna']: (est, True) for est in self.estaciones}
+            resultados = dict(consultar_en_paralelo(obtener_datos_estacion, tareas))
+            self.almacen_dga.publicar([{'estacion': est, 'datos': compactar(resultados[est['bna']])} for est in self.estaciones])
+
+    @property
+    def rellenando(self):
+        return self._relleno is not None and self._relleno.is_alive()
+
+    def rellenar(self, dias):
+        """Completa en segundo plano la historia de los últimos `dias` días; no hace nada si ya hay uno en curso."""
+        with self._relleno_lock:
+            if self.rellenando:
+                return False
+            desde = (datetime.now() - timedelta(days=dias)).strftime('%Y-%m-%d')
+            tareas = {nombre: (info['id'], self.user_key, desde) for nombre, info in self.centrales.items()}
+            self._relleno = threading.Thread(
+                target=lambda: list(consultar_en_paralelo(rellenar_historial, tareas)),
+                daemon=True, name='cen-relleno',
+            )
+            self._relleno.start()
+            return True
+
+
+almacen = AlmacenDatos()
+almacen_dga = AlmacenDatos(clave=lambda item: item['estacion']['bna'])
+_poller = None
+_poller_lock = threading.Lock()
+
+
+def iniciar_poller(user_key):
+    """Arranca el sondeo la primera vez que se llama; las siguientes devuelven el mismo hilo.
+
+    Con `MONITOR_COMPARTIDO=1` devuelve el coordinador de `monitor.coordinacion`, que tiene la
+    misma interfaz y sólo deja sondear al proceso líder.
+    """
+    global _poller
+    with _poller_lock:
+        if _poller is None:
+            from monitor.coordinacion import MODO_COMPARTIDO, Coordinador
+            if MODO_COMPARTIDO:
+                _poller = Coordinador(user_key, almacen, almacen_dga)
+            else:
+                _poller = Poller(user_key, almacen, almacen_dga=almacen_dga)
+            _poller.start()
+        return _poller
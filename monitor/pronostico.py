@@ -0,0 +1,260 @@
+"""Pronóstico de generación y caudal estimado a 24–72 h por central.
+
+Dos modelos livianos sobre la serie horaria guardada, ajustados para todas las centrales a
+la vez (cada hora es una operación NumPy sobre el vector de centrales):
+
+- estacional ingenuo: el último valor observado a la misma hora del día;
+- Holt-Winters aditivo con tendencia amortiguada y estacionalidad diaria, de suavizamiento fijo.
+
+Cada central usa el modelo con menor error cuadrático a un paso (media exponencial), que
+también da el ancho de la banda. El estado queda guardado: con cada sondeo sólo se avanza
+sobre las horas nuevas, sin volver a ajustar desde cero.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from monitor.centrales import registro
+from monitor.historial import historial
+from monitor.metricas import metricas
+from monitor.modelo import a_hora_local
+
+HORIZONTE = min(max(int(os.environ.get('MONITOR_PRONOSTICO_HORAS', '48')), 24), 72)
+DIAS_AJUSTE = int(os.environ.get('MONITOR_PRONOSTICO_DIAS', '14'))
+# Procesos para el ajuste inicial; 0 lo hace en el mismo proceso. Sólo se reparte si hay al
+# menos CENTRALES_POR_PROCESO centrales por proceso: bajo eso NumPy ya es más rápido que el IPC.
+PROCESOS = int(os.environ.get('MONITOR_PRONOSTICO_PROCESOS', '0'))
+CENTRALES_POR_PROCESO = 256
+# Horas que se vuelve a leer hacia atrás por una central atrasada (su consulta falló o publica
+# con más retraso): lo que llegue más tarde que eso ya no se incorpora a su modelo.
+ATRASO_MAX = int(os.environ.get('MONITOR_PRONOSTICO_ATRASO_HORAS', '48'))
+
+TEMPORADA = 24
+ALFA, BETA, GAMMA, FI = 0.1, 0.01, 0.3, 0.9
+# Peso de cada error nuevo en la media exponencial del error cuadrático.
+LAMBDA_ERROR = 0.05
+Z_BANDA = 1.2816  # banda central del 80 %
+
+MODELOS = ('Estacional', 'Holt-Winters')
+
+
+def estado_inicial(n):
+    nan = np.full(n, np.nan)
+    return {
+        'nivel':     nan.copy(),
+        'tendencia': np.zeros(n),
+        'estacion':  np.zeros((n, TEMPORADA)),
+        'previos':   np.full((n, TEMPORADA), np.nan),
+        'err_hw':    nan.copy(),
+        'err_sn':    nan.copy(),
+        'vistos':    np.zeros(n, dtype=np.int64),
+        # Última hora incorporada por central, en horas desde 1970 (hora de pared); -1 si ninguna.
+        'ultima':    np.full(n, -1, dtype=np.int64),
+    }
+
+
+def _horas_epoch(indice):
+    return indice.to_numpy().astype('datetime64[h]').astype(np.int64)
+
+
+def _media_error(err, e, ok):
+    nuevo = np.where(np.isnan(err), e * e, (1 - LAMBDA_ERROR) * err + LAMBDA_ERROR * e * e)
+    return np.where(ok, nuevo, err)
+
+
+def ajustar(estado, y, tiempos):
+    """Avanza el estado con las observaciones `y` (horas x centrales, NaN si faltan) en `tiempos`
+    (horas desde 1970, consecutivas).
+
+    Cada central sólo avanza sobre las horas posteriores a su `ultima` y hasta su última
+    observación del lote: las que llegan atrasadas se incorporan en una llamada siguiente
+    y las horas ya vistas se ignoran. No modifica `estado`; devuelve uno nuevo. Es una
+    función pura de arreglos, para poder repartir las centrales entre procesos.
+    """
+    estado = {k: v.copy() for k, v in estado.items()}
+    nivel, tendencia, estacion, previos = estado['nivel'], estado['tendencia'], estado['estacion'], estado['previos']
+    err_hw, err_sn, vistos, ultima = estado['err_hw'], estado['err_sn'], estado['vistos'], estado['ultima']
+    observado = ~np.isnan(y)
+    # Fila de la última observación de cada central en el lote (-1 si no tiene ninguna).
+    ultima_fila = np.where(observado.any(axis=0), len(y) - 1 - np.argmax(observado[::-1], axis=0), -1)
+    for i, (fila, t) in enumerate(zip(y, tiempos)):
+        activo = (t > ultima) & (i <= ultima_fila)
+        if not activo.any():
+            continue
+        ok = activo & observado[i]
+        h = t % TEMPORADA
+        s = estacion[:, h]
+        # Errores a un paso de cada modelo, antes de ver el dato.
+        err_hw = _media_error(err_hw, fila - (nivel + FI * tendencia + s), ok & (vistos >= TEMPORADA))
+        err_sn = _media_error(err_sn, fila - previos[:, h], ok & ~np.isnan(previos[:, h]))
+
+        base = nivel + FI * tendencia
+        nivel_nuevo = np.where(np.isnan(nivel), fila - s, ALFA * (fila - s) + (1 - ALFA) * base)
+        tendencia_nueva = np.where(np.isnan(nivel), 0, BETA * (nivel_nuevo - nivel) + (1 - BETA) * FI * tendencia)
+        estacion[:, h] = np.where(ok, GAMMA * (fila - nivel_nuevo) + (1 - GAMMA) * s, s)
+        # Una hora faltante (con datos más adelante) avanza el modelo sin corregirlo.
+        nivel = np.where(ok, nivel_nuevo, np.where(activo, base, nivel))
+        tendencia = np.where(ok, tendencia_nueva, np.where(activo, FI * tendencia, tendencia))
+        previos[:, h] = np.where(ok, fila, previos[:, h])
+        vistos = vistos + ok
+        ultima = np.where(activo, t, ultima)
+    estado.update(nivel=nivel, tendencia=tendencia, err_hw=err_hw, err_sn=err_sn, vistos=vistos, ultima=ultima)
+    return estado
+
+
+def proyectar(estado, ultima_hora, horizonte=HORIZONTE):
+    """Pronóstico, desviación y modelo elegido por central para las `horizonte` horas siguientes a
+    `ultima_hora` (horas desde 1970).
+
+    Una central atrasada proyecta desde su propia última hora: más pasos, con la tendencia
+    más amortiguada y la banda más ancha. Devuelve `(media, sigma, usa_hw)` con `media` y
+    `sigma` de forma centrales x horizonte; `sigma` es NaN mientras el modelo no tenga una
+    estimación del error.
+    """
+    objetivo = ultima_hora + np.arange(1, horizonte + 1)
+    horas = objetivo % TEMPORADA
+    pasos = np.maximum(objetivo[None, :] - estado['ultima'][:, None], 1)
+    amortiguado = FI * (1 - FI ** pasos) / (1 - FI)  # suma de FI**j para j = 1..pasos
+    hw = estado['nivel'][:, None] + estado['tendencia'][:, None] * amortiguado + estado['estacion'][:, horas]
+    sn = estado['previos'][:, horas]
+    usa_hw = (estado['vistos'] >= 2 * TEMPORADA) & (np.nan_to_num(estado['err_hw'], nan=np.inf)
+                                                    <= np.nan_to_num(estado['err_sn'], nan=np.inf))
+    # Horas del día que el ingenuo aún no ha visto: se usa Holt-Winters, finito desde el primer dato.
+    media = np.where(usa_hw[:, None] | np.isnan(sn), hw, sn)
+    # Crecimiento aproximado de la varianza con el horizonte: nivel suavizado en HW, días repetidos en el ingenuo.
+    crece_hw = np.sqrt(1 + (pasos - 1) * ALFA ** 2)
+    crece_sn = np.sqrt(1 + (pasos - 1) // TEMPORADA)
+    sigma = np.where(usa_hw[:, None], np.sqrt(estado['err_hw'])[:, None] * crece_hw,
+                     np.sqrt(estado['err_sn'])[:, None] * crece_sn)
+    return media, sigma, usa_hw
+
+
+def _ajustar_por_partes(estado, y, tiempos, procesos):
+    n = y.shape[1]
+    partes = min(procesos, n // CENTRALES_POR_PROCESO)
+    if partes < 2:
+        return ajustar(estado, y, tiempos)
+    cortes = np.array_split(np.arange(n), partes)
+    executor = _pool(procesos)
+    futuros = [executor.submit(ajustar, {k: v[c] for k, v in estado.items()}, y[:, c], tiempos) for c in cortes]
+    resultados = [f.result() for f in futuros]
+    return {k: np.concatenate([r[k] for r in resultados]) for k in estado}
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _pool(procesos):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: hacer fork de un proceso con hilos (Streamlit, sondeo) no es seguro.
+            _executor = ProcessPoolExecutor(procesos, mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+
+class Pronosticador:
+    """Modelos de todas las centrales y su último pronóstico, avanzados hora a hora desde el historial."""
+
+    def __init__(self, centrales=registro, horizonte=HORIZONTE, dias=DIAS_AJUSTE, procesos=PROCESOS):
+        self.centrales = centrales
+        self.horizonte = horizonte
+        self.dias = dias
+        self.procesos = procesos
+        self._estado = None
+        self._ultima_hora = None
+        self._pronosticos = {}
+        self._lock = threading.Lock()
+
+    def actualizar(self):
+        """Incorpora las horas guardadas desde la última actualización y recalcula los pronósticos."""
+        with self._lock, metricas.span('pronostico.actualizar'):
+            ancha = self._leer_nuevas()
+            if ancha.empty:
+                return self._pronosticos
+            # Grilla horaria: las horas sin registro de ninguna central cuentan como faltantes.
+            ancha = ancha.reindex(pd.date_range(ancha.index[0].floor('h'), ancha.index[-1].floor('h'), freq='h'))
+
+            estado = self._estado or estado_inicial(len(self.centrales))
+            y = ancha.to_numpy(dtype=np.float64)
+            tiempos = _horas_epoch(ancha.index)
+            if self._estado is None and self.procesos:
+                self._estado = _ajustar_por_partes(estado, y, tiempos, self.procesos)
+            else:
+                self._estado = ajustar(estado, y, tiempos)
+            ultima = int(self._estado['ultima'].max())
+            if ultima < 0:
+                return self._pronosticos
+            self._ultima_hora = pd.Timestamp(np.datetime64(ultima, 'h'))
+            self._pronosticos = self._armar()
+            metricas.contar('pronostico.horas', len(ancha))
+            return self._pronosticos
+
+    def _leer_nuevas(self):
+        """Horas guardadas que los modelos aún no incorporan, una columna por central.
+
+        Las centrales al día se leen desde la hora siguiente a la más reciente; las atrasadas,
+        desde su propia última hora (a lo más `ATRASO_MAX` horas atrás), en otra consulta.
+        """
+        ids = [info['id'] for info in self.centrales.values()]
+        if self._estado is None or self._estado['ultima'].max() < 0:
+            return historial.leer_ancho(ids, desde=(datetime.now() - timedelta(days=self.dias)).strftime('%Y-%m-%d'))
+        ultima = self._estado['ultima']
+        mas_reciente = int(ultima.max())
+        atrasadas = ultima < mas_reciente
+        partes = []
+        for mascara, desde in ((~atrasadas, mas_reciente + 1),
+                               (atrasadas, max(int(ultima[atrasadas].min(initial=mas_reciente)), mas_reciente - ATRASO_MAX) + 1)):
+            if mascara.any():
+                texto = pd.Timestamp(np.datetime64(desde, 'h')).strftime('%Y-%m-%d %H:%M:%S')
+                partes.append(historial.leer_ancho([i for i, m in zip(ids, mascara) if m], desde=texto))
+        partes = [p for p in partes if not p.empty]
+        if not partes:
+            return pd.DataFrame()
+        return pd.concat(partes, axis=1, sort=True).reindex(columns=ids)
+
+    def _armar(self):
+        ultima = int(self._estado['ultima'].max())
+        media, sigma, usa_hw = proyectar(self._estado, ultima, self.horizonte)
+        inicio = a_hora_local(pd.Series([self._ultima_hora])).iat[0]
+        fechas = pd.date_range(inicio + pd.Timedelta(hours=1), periods=self.horizonte, freq='h').array
+        # Recortes y conversión a caudal sobre la matriz completa; por central sólo se arma el DataFrame.
+        capacidad = np.array([self.centrales.capacidad(n) for n in self.centrales], dtype=np.float64)[:, None]
+        eficiencia = np.array([self.centrales.eficiencia(n) for n in self.centrales], dtype=np.float64)[:, None]
+        a_caudal = np.divide(1, eficiencia, out=np.full_like(eficiencia, np.nan), where=eficiencia > 0)
+        # Sin estimación del error la banda queda en NaN (no se dibuja), no en ancho cero.
+        banda = Z_BANDA * sigma
+        gen = np.clip(media, 0, capacidad).astype(np.float32)
+        inf = np.clip(media - banda, 0, capacidad).astype(np.float32)
+        sup = np.clip(media + banda, 0, capacidad).astype(np.float32)
+        caudal, caudal_inf, caudal_sup = (m * a_caudal.astype(np.float32) for m in (gen, inf, sup))
+        validas = ~np.isnan(media).all(axis=1)
+        pronosticos = {}
+        for i, nombre in enumerate(self.centrales):
+            if not validas[i]:
+                continue
+            df = pd.DataFrame({
+                'fecha_hora': fechas,
+                'gen_mw':     gen[i],
+                'gen_inf':    inf[i],
+                'gen_sup':    sup[i],
+                'caudal_m3s': caudal[i],
+                'caudal_inf': caudal_inf[i],
+                'caudal_sup': caudal_sup[i],
+            }, copy=False)
+            df.attrs['modelo'] = MODELOS[int(usa_hw[i])]
+            pronosticos[nombre] = df
+        return pronosticos
+
+    def pronostico(self, nombre):
+        with self._lock:
+            return self._pronosticos.get(nombre)
+
+
+pronosticador = Pronosticador()
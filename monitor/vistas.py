@@ -0,0 +1,135 @@
+"""Tablas y agregados que consumen las vistas, sin dependencias de Streamlit."""
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from monitor.cache import CacheLRU
+from monitor.centrales import registro
+from monitor.historial import historial
+from monitor.metricas import metricas
+
+RANGOS_DIAS = {'7 días': 7, '30 días': 30, '90 días': 90, '1 año': 365}
+PERIODOS = {'Diario': 'D', 'Mensual': 'MS'}
+MAX_PUNTOS = 1500
+
+cache_series = CacheLRU(int(float(os.environ.get('MONITOR_SERIES_CACHE_MB', '64')) * 1024 * 1024), 'cache_series',
+                        medir=lambda df: int(df.memory_usage(index=True).sum()))
+
+
+cache_tablas = CacheLRU(int(float(os.environ.get('MONITOR_TABLAS_CACHE_MB', '8')) * 1024 * 1024), 'cache_tablas',
+                        medir=lambda df: int(df.memory_usage(index=True, deep=True).sum()))
+
+
+def tabla_registros(datos, n=5, version=None):
+    """Últimos `n` registros de cada central, o None si ninguna tiene historia.
+
+    Con `version` (la del almacén) la tabla se arma una vez por versión de los datos.
+    """
+    if version is not None:
+        df = cache_tablas.obtener((version, n))
+        if df is None:
+            df = tabla_registros(datos, n)
+            if df is not None:
+                cache_tablas.guardar((version, n), df)
+        return df
+
+    all_records = []
+    for item in datos:
+        res = item['datos']
+        if res.get('error'): continue
+
+        hist = res['full_history'].head(n)
+        all_records.append(pd.DataFrame({
+            'Central': res['nombre'],
+            'Hora': hist['hora'],
+            'Gen (MW)': hist['gen_real_mw']
+        }))
+
+    if not all_records:
+        return None
+    return pd.concat(all_records, ignore_index=True)
+
+
+def serie_historica(dias, centrales=registro):
+    """Generación horaria de los últimos `dias` días, una columna por central.
+
+    Se guarda en cache por día y versión del historial: mientras no llegue un dato nuevo,
+    cambiar de vista o de periodo no vuelve a leer SQLite.
+    """
+    desde = (datetime.now() - timedelta(days=dias)).strftime('%Y-%m-%d')
+    nombres = list(centrales)
+    ids = [info['id'] for info in centrales.values()]
+    clave = (desde, tuple(nombres), historial.version)
+    ancha = cache_series.obtener(clave)
+    if ancha is None:
+        with metricas.span('historico.lectura'):
+            ancha = historial.leer_ancho(ids, desde=desde)
+            ancha.columns = nombres
+        cache_series.guardar(clave, ancha)
+    return ancha
+
+
+def _horas_por_registro(ancha):
+    if len(ancha) < 2:
+        return 1.0
+    return float(np.median(np.diff(ancha.index.to_numpy()).astype('timedelta64[s]').astype(np.int64))) / 3600
+
+
+def agregar_historia(ancha, periodo='D'):
+    """Energía, factor de planta, caudal estimado y horas fuera de línea por central y periodo.
+
+    `periodo` es una regla de `resample` ('D', 'MS'). Cada registro representa la energía
+    de su intervalo, que se infiere del paso mediano de la serie (horario en el CEN).
+    """
+    if ancha.empty:
+        return pd.DataFrame()
+    paso_h = _horas_por_registro(ancha)
+    capacidad = pd.Series([registro.capacidad(n) for n in ancha.columns], index=ancha.columns)
+    eficiencia = pd.Series([registro.eficiencia(n) for n in ancha.columns], index=ancha.columns).where(lambda s: s > 0)
+
+    with metricas.span('historico.agregado'):
+        grupos = ancha.astype(np.float64).resample(periodo)
+        media = grupos.mean()
+        indicadores = {
+            'Energía (MWh)':          grupos.sum(min_count=1) * paso_h,
+            'Factor de planta (%)':   media.div(capacidad, axis=1) * 100,
+            'Caudal medio (m³/s)':    media.div(eficiencia, axis=1),
+            'Horas fuera de línea':   ancha.eq(0).resample(periodo).sum() * paso_h,
+        }
+        tabla = pd.concat({k: v.stack() for k, v in indicadores.items()}, axis=1)
+        tabla = tabla[tabla['Energía (MWh)'].notna()]
+    tabla.index.names = ['Periodo', 'Central']
+    return tabla.reset_index()
+
+
+def reducir_serie(ancha, max_puntos=MAX_PUNTOS):
+    """Reduce la serie a unos `max_puntos` por central para graficarla.
+
+    Conserva el mínimo y el máximo de cada tramo, de modo que los valles (horas en cero)
+    y los picos siguen visibles aunque se descarte la mayoría de los puntos.
+    """
+    if len(ancha) <= max_puntos:
+        return ancha
+    tam = -(-len(ancha) // (max_puntos // 2))
+    tramos = ancha.groupby(np.arange(len(ancha)) // tam)
+    inicio = ancha.index[::tam]
+    minimos, maximos = tramos.min(), tramos.max()
+    minimos.index = inicio
+    maximos.index = inicio + pd.Timedelta(hours=_horas_por_registro(ancha)) * (tam // 2)
+    return pd.concat([minimos, maximos]).sort_index()
+
+
+def comparar_caudales(bna, nombre_central, dias=2):
+    """Caudal medido en la estación DGA junto al estimado por la generación de la central, por hora."""
+    desde = (datetime.now() - timedelta(days=dias)).strftime('%Y-%m-%d')
+    medido = historial.leer_caudales(bna, desde=desde).set_index('fecha_hora')['caudal_m3s']
+    generacion = historial.leer(registro.info(nombre_central)['id'], desde=desde).set_index('fecha_hora')['gen_real_mw']
+    eficiencia = registro.eficiencia(nombre_central)
+    estimado = generacion / eficiencia if eficiencia > 0 else generacion * np.nan
+    tabla = pd.concat({'Medido DGA (m³/s)': medido.sort_index(), 'Estimado generación (m³/s)': estimado.sort_index()},
+                      axis=1)
+    if tabla.empty:
+        return tabla
+    return tabla.resample('h').mean()
@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# Los módulos abren su base SQLite al importarse: que las pruebas no toquen `datos/`.
+os.environ.setdefault('MONITOR_DB', os.path.join(tempfile.mkdtemp(prefix='monitor_pruebas_'), 'historial.sqlite3'))
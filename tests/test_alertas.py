@@ -0,0 +1,69 @@
+"""Reglas de `DetectorAlertas` sobre series sintéticas: qué alertas se abren y se cierran."""
+import pandas as pd
+import pytest
+
+from monitor.alertas import DetectorAlertas
+from monitor.centrales import Registro
+from monitor.modelo import ZONA
+
+INICIO = pd.Timestamp('2024-06-01 00:00', tz=ZONA)
+CENTRAL = 'Prueba'
+
+
+def _datos(gen, inicio=INICIO):
+    """Resultado como el de `resumir_central`: serie horaria más reciente primero."""
+    fechas = pd.date_range(inicio, periods=len(gen), freq='h')
+    return {'error': False, 'full_history': pd.DataFrame({'fecha_hora': fechas[::-1], 'gen_real_mw': gen[::-1]})}
+
+
+def _detector():
+    registro = Registro([{'nombre': CENTRAL, 'id': 1, 'lat': -37, 'lon': -71, 'capacidad_mw': 100}])
+    return DetectorAlertas(registro, horas_apagon=3, rampa_pct=50, horas_atraso=3)
+
+
+def _eventos(detector):
+    return [(e.alerta, e.evento) for e in detector.bitacora().iloc[::-1].itertuples()]
+
+
+@pytest.mark.parametrize('gen, eventos, activas', [
+    ([50, 55, 60], [], []),
+    ([50, 0, 0, 0, 40], [('Apagón', 'inicio'), ('Apagón', 'fin')], []),
+    ([50, 0, 0, 0, 0], [('Apagón', 'inicio')], ['Apagón 4 h']),
+    ([50, 0, 0, 30], [], []),
+    ([10, 80, 85], [('Rampa', 'inicio'), ('Rampa', 'fin')], []),
+    ([80, 10], [('Rampa', 'inicio')], ['Rampa -70.0 MW/h']),
+    ([90, 110, 95], [('Sobre capacidad', 'inicio'), ('Sobre capacidad', 'fin')], []),
+    ([90, 95, 120], [('Sobre capacidad', 'inicio')], ['Sobre capacidad 120.0/100 MW']),
+], ids=['normal', 'apagon', 'apagon_activo', 'ceros_cortos', 'rampa', 'rampa_activa', 'sobrecapacidad',
+        'sobrecapacidad_activa'])
+def test_reglas(gen, eventos, activas):
+    detector = _detector()
+    ahora = INICIO + pd.Timedelta(hours=len(gen))
+    assert detector.procesar(CENTRAL, _datos(gen), ahora=ahora) == activas
+    assert _eventos(detector) == eventos
+
+
+def test_datos_atrasados_abre_y_cierra():
+    detector = _detector()
+    gen = [50, 50, 50]
+    ultima = INICIO + pd.Timedelta(hours=2)
+    assert detector.procesar(CENTRAL, _datos(gen), ahora=ultima + pd.Timedelta(hours=1)) == []
+    assert detector.procesar(CENTRAL, _datos(gen), ahora=ultima + pd.Timedelta(hours=5)) == ['Sin datos nuevos hace 5 h']
+    # Una consulta fallida no cierra la alerta.
+    assert detector.procesar(CENTRAL, {'error': True, 'mensaje': 'HTTP 500'},
+                             ahora=ultima + pd.Timedelta(hours=6)) == ['Sin datos nuevos hace 6 h']
+
+    gen += [50, 50, 50, 50, 50]
+    assert detector.procesar(CENTRAL, _datos(gen), ahora=ultima + pd.Timedelta(hours=6)) == []
+    assert _eventos(detector) == [('Datos atrasados', 'inicio'), ('Datos atrasados', 'fin')]
+
+
+def test_solo_procesa_registros_nuevos():
+    detector = _detector()
+    gen = [50, 0, 0, 0]
+    detector.procesar(CENTRAL, _datos(gen[:2]), ahora=INICIO + pd.Timedelta(hours=2))
+    detector.procesar(CENTRAL, _datos(gen), ahora=INICIO + pd.Timedelta(hours=4))
+    # La misma serie otra vez no repite eventos ni alarga la racha en cero.
+    assert detector.procesar(CENTRAL, _datos(gen), ahora=INICIO + pd.Timedelta(hours=4)) == ['Apagón 3 h']
+    assert _eventos(detector) == [('Apagón', 'inicio')]
+    assert detector.resumen() == {'Apagón': 1}
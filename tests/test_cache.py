@@ -0,0 +1,71 @@
+"""Comportamiento de `CacheRespuestas`: carga única por clave, valor viejo ante errores."""
+import threading
+import time
+
+from monitor.cache import CacheRespuestas
+
+CLAVE = (1, '2024-01-01', '2024-01-02')
+
+
+def test_cargas_concurrentes_de_una_clave_se_colapsan():
+    cache = CacheRespuestas()
+    liberar = threading.Event()
+    cargas = []
+
+    def cargar():
+        cargas.append(1)
+        liberar.wait(5)
+        return {'data': [1]}
+
+    resultados = []
+    hilos = [threading.Thread(target=lambda: resultados.append(cache.obtener(CLAVE, cargar, esperar=True)))
+             for _ in range(8)]
+    for h in hilos:
+        h.start()
+    time.sleep(0.2)
+    liberar.set()
+    for h in hilos:
+        h.join(5)
+
+    assert len(cargas) == 1
+    assert resultados == [{'data': [1]}] * 8
+
+
+def test_error_conserva_el_ultimo_valor_bueno():
+    cache = CacheRespuestas(refresco_min=0)
+    assert cache.obtener(CLAVE, lambda: {'data': [1]}) == {'data': [1]}
+
+    cache.invalidar(CLAVE[0])
+    assert cache.obtener(CLAVE, lambda: {'error': True, 'mensaje': 'HTTP 500'}, esperar=True) == {'data': [1]}
+
+    def falla():
+        raise RuntimeError('sin red')
+
+    assert cache.obtener(CLAVE, falla, esperar=True) == {'data': [1]}
+
+
+def test_error_sin_valor_previo_se_entrega():
+    cache = CacheRespuestas()
+    valor = cache.obtener(CLAVE, lambda: {'error': True, 'mensaje': 'HTTP 500'})
+    assert valor['error']
+    # El error no queda en cache: la siguiente llamada vuelve a cargar.
+    assert cache.obtener(CLAVE, lambda: {'data': [2]}) == {'data': [2]}
+
+
+def test_entrada_invalidada_se_entrega_mientras_se_refresca():
+    cache = CacheRespuestas(refresco_min=0)
+    cache.obtener(CLAVE, lambda: {'data': [1]})
+    cache.invalidar(CLAVE[0])
+    liberar = threading.Event()
+    cargas = []
+
+    def cargar():
+        cargas.append(1)
+        liberar.wait(5)
+        return {'data': [2]}
+
+    assert cache.obtener(CLAVE, cargar) == {'data': [1]}
+    assert cache.obtener(CLAVE, cargar) == {'data': [1]}
+    liberar.set()
+    assert cache.obtener(CLAVE, cargar, esperar=True) == {'data': [2]}
+    assert len(cargas) == 1
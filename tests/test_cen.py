@@ -0,0 +1,58 @@
+"""Paginación de findByDate en `iterar_registros`."""
+import pytest
+
+from monitor import cen
+
+
+class _Cliente:
+    """Responde cada página con `paginas(page)` y cuenta las peticiones."""
+
+    def __init__(self, paginas):
+        self.paginas = paginas
+        self.pedidas = []
+
+    def pedir(self, params, espera_max=None):
+        page = int(params['page'])
+        self.pedidas.append(page)
+        return self.paginas(page)
+
+
+def _pagina(page, tam=2, total=None):
+    datos = [{'fecha_hora': f'2024-01-01 {(page - 1) * tam + i:02d}:00:00', 'gen_real_mw': 1.0} for i in range(tam)]
+    return {'data': datos, **({'totalPages': total} if total is not None else {})}
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    def usar(paginas):
+        falso = _Cliente(paginas)
+        monkeypatch.setattr(cen, 'cliente_cen', falso)
+        return falso
+    return usar
+
+
+def test_recorre_hasta_total_pages(cliente):
+    falso = cliente(lambda page: _pagina(page, total=3))
+    registros = list(cen.iterar_registros(1, '2024-01-01', '2024-01-02', 'k', page_size=2))
+    assert falso.pedidas == [1, 2, 3]
+    assert len(registros) == 6
+
+
+def test_para_en_pagina_corta_sin_total_pages(cliente):
+    falso = cliente(lambda page: _pagina(page, tam=2 if page < 3 else 1))
+    assert len(list(cen.iterar_registros(1, '2024-01-01', '2024-01-02', 'k', page_size=2))) == 5
+    assert falso.pedidas == [1, 2, 3]
+
+
+def test_para_si_la_api_ignora_page(cliente):
+    falso = cliente(lambda page: _pagina(1))
+    registros = list(cen.iterar_registros(1, '2024-01-01', '2024-01-02', 'k', page_size=2))
+    assert falso.pedidas == [1, 2]
+    assert len(registros) == 2
+
+
+def test_para_en_el_tope_de_paginas(cliente):
+    falso = cliente(lambda page: _pagina(page))
+    registros = list(cen.iterar_registros(1, '2024-01-01', '2024-01-02', 'k', page_size=2, max_paginas=4))
+    assert falso.pedidas == [1, 2, 3, 4]
+    assert len(registros) == 8
@@ -0,0 +1,119 @@
+"""Circuit breaker, limitador de tasa y Retry-After del cliente del CEN."""
+import math
+import threading
+import time
+
+import pytest
+
+from monitor.cliente import CircuitBreaker, ClienteCEN, ErrorCEN
+from monitor.motor import TokenBucket
+
+
+class _Respuesta:
+    def __init__(self, status_code, cuerpo=None, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._cuerpo = cuerpo
+
+    def json(self):
+        return self._cuerpo
+
+
+class _Sesion:
+    """Entrega las respuestas en orden y anota el instante de cada llamada."""
+
+    def __init__(self, *respuestas):
+        self.respuestas = list(respuestas)
+        self.llamadas = []
+
+    def get(self, url, params=None, timeout=None):
+        self.llamadas.append(time.monotonic())
+        return self.respuestas.pop(0)
+
+
+class _SinLimite:
+    def adquirir(self, tokens=1):
+        pass
+
+
+def test_semiabierto_deja_pasar_una_sola_prueba():
+    breaker = CircuitBreaker(umbral=2, enfriamiento=0.1)
+    breaker.falla()
+    breaker.falla()
+    assert breaker.estado == 'abierto'
+    assert breaker.permitir() == math.inf
+
+    time.sleep(0.15)
+    assert breaker.estado == 'semiabierto'
+    permisos = []
+    hilos = [threading.Thread(target=lambda: permisos.append(breaker.permitir())) for _ in range(8)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    assert sorted(permisos) == [0] + [math.inf] * 7
+
+    breaker.exito()
+    assert breaker.estado == 'cerrado'
+    assert breaker.permitir() == 0
+
+
+def test_prueba_fallida_vuelve_a_abrir():
+    breaker = CircuitBreaker(umbral=2, enfriamiento=0.1)
+    breaker.falla()
+    breaker.falla()
+    time.sleep(0.15)
+    assert breaker.permitir() == 0
+    breaker.falla()
+    assert breaker.estado == 'abierto'
+    assert breaker.permitir() == math.inf
+
+
+def test_retry_after_pausa_a_los_demas_sin_abrir_el_circuito():
+    breaker = CircuitBreaker(umbral=5, enfriamiento=60)
+    breaker.falla(retry_after=0.3)
+    restante = breaker.permitir()
+    assert 0 < restante <= 0.3
+    assert breaker.estado == 'abierto'
+    time.sleep(restante)
+    assert breaker.permitir() == 0
+
+
+def test_cliente_espera_la_pausa_pedida_por_otra_llamada():
+    breaker = CircuitBreaker()
+    breaker.falla(retry_after=0.3)
+    sesion = _Sesion(_Respuesta(200, {'data': []}))
+    cliente = ClienteCEN(url='http://cen.local', session=sesion, breaker=breaker, limitador=_SinLimite())
+
+    inicio = time.monotonic()
+    assert cliente.pedir({}) == {'data': []}
+    assert sesion.llamadas[0] - inicio >= 0.25
+
+
+def test_cliente_desiste_si_la_pausa_excede_el_presupuesto():
+    breaker = CircuitBreaker()
+    breaker.falla(retry_after=5)
+    sesion = _Sesion()
+    cliente = ClienteCEN(url='http://cen.local', session=sesion, breaker=breaker, limitador=_SinLimite())
+
+    with pytest.raises(ErrorCEN):
+        cliente.pedir({}, espera_max=1)
+    assert sesion.llamadas == []
+
+
+def test_cliente_respeta_retry_after_de_un_429():
+    sesion = _Sesion(_Respuesta(429, headers={'Retry-After': '0.3'}), _Respuesta(200, {'data': [1]}))
+    cliente = ClienteCEN(url='http://cen.local', session=sesion, breaker=CircuitBreaker(),
+                         limitador=_SinLimite(), backoff_base=0.01)
+
+    assert cliente.pedir({}) == {'data': [1]}
+    assert sesion.llamadas[1] - sesion.llamadas[0] >= 0.25
+
+
+def test_token_bucket_limita_la_tasa():
+    limitador = TokenBucket(tasa=20, capacidad=5)
+    inicio = time.monotonic()
+    for _ in range(15):
+        limitador.adquirir()
+    # La ráfaga inicial es gratis; los 10 restantes esperan 1/20 s cada uno.
+    assert time.monotonic() - inicio >= 0.45
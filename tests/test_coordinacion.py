@@ -0,0 +1,94 @@
+"""Arriendo del líder e instantáneas compartidas entre dos `BaseCompartida` sobre el mismo archivo."""
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from monitor.coordinacion import BaseCompartida, Coordinador
+from monitor.poller import AlmacenDatos
+
+
+class _SinAlertas:
+    def procesar(self, nombre, resultado):
+        return []
+
+
+@pytest.fixture
+def bases(tmp_path):
+    ruta = str(tmp_path / 'compartida.sqlite3')
+    return BaseCompartida(ruta), BaseCompartida(ruta)
+
+
+def test_otro_worker_toma_el_arriendo_vencido(bases):
+    a, b = bases
+    assert a.tomar_arriendo('a', duracion=0.3)
+    assert not b.tomar_arriendo('b', duracion=0.3)
+    assert a.tomar_arriendo('a', duracion=0.3)
+    assert b.lider()[0] == 'a'
+
+    time.sleep(0.4)
+    assert b.tomar_arriendo('b', duracion=30)
+    assert not a.tomar_arriendo('a', duracion=30)
+    assert a.lider()[0] == 'b'
+
+
+def test_arriendo_soltado_se_toma_de_inmediato(bases):
+    a, b = bases
+    assert a.tomar_arriendo('a', duracion=30, rellenando=True)
+    assert b.lider() == ('a', pytest.approx(time.time() + 30, abs=5), True)
+    a.soltar_arriendo('a')
+    assert b.tomar_arriendo('b', duracion=30)
+
+
+def test_instantanea_ida_y_vuelta(bases):
+    a, b = bases
+    serie = pd.DataFrame({
+        'fecha_hora': pd.to_datetime(['2024-01-01 01:00', '2024-01-01 00:00']),
+        'gen_real_mw': np.array([1.5, 0.0], dtype=np.float32),
+        'hora': ['01:00', '00:00'],
+    })
+    serie.attrs['central'] = 'El Toro'
+    datos = [{'nombre': 'El Toro', 'info': {'id': 1, 'capacidad': np.float64(450.0)},
+              'datos': {'error': False, 'gen_mw': 1.5, 'full_history': serie}, 'alertas': ['Sin datos']}]
+    ts = datetime(2024, 1, 1, 1, 5)
+
+    assert a.guardar_instantanea('generacion', datos, ts) == 1
+    assert a.guardar_instantanea('generacion', datos, ts) == 2
+    assert b.version('generacion') == 2
+    version, leidos, ts_leido = b.leer_instantanea('generacion')
+
+    assert (version, ts_leido) == (2, ts)
+    item = leidos[0]
+    assert item['info'] == {'id': 1, 'capacidad': 450.0}
+    assert item['alertas'] == ['Sin datos']
+    pd.testing.assert_frame_equal(item['datos']['full_history'], serie)
+    assert item['datos']['full_history'].attrs == {'central': 'El Toro'}
+    assert b.leer_instantanea('dga') is None
+
+
+def test_seguidor_no_espera_mas_que_espera_max(bases):
+    a, b = bases
+    coordinador = Coordinador('k', AlmacenDatos(), base=b, detector=_SinAlertas())
+    inicio = time.monotonic()
+    assert coordinador.refrescar(espera_max=0.3) is False
+    assert time.monotonic() - inicio < 2
+    assert [orden for _, orden, _ in a.pedidos(0)] == ['refrescar']
+
+
+def test_seguidor_informa_al_cargar_la_publicacion(bases):
+    a, b = bases
+    coordinador = Coordinador('k', AlmacenDatos(), base=b, detector=_SinAlertas())
+    datos = [{'nombre': 'El Toro', 'datos': {'error': False}}, {'nombre': 'Antuco', 'datos': {'error': False}}]
+
+    def lider():
+        time.sleep(0.2)
+        a.guardar_instantanea('generacion', datos, datetime.now())
+        coordinador._seguir()
+
+    threading.Thread(target=lider).start()
+    recibidos = []
+    assert coordinador.refrescar(lambda nombre, i, n: recibidos.append((nombre, i, n)), espera_max=5) is True
+    assert recibidos == [('El Toro', 1, 2), ('Antuco', 2, 2)]
@@ -0,0 +1,77 @@
+"""Exportación a CSV, Parquet y Arrow, con datos y con un rango vacío."""
+import io
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from monitor import exportar
+from monitor.centrales import Registro
+from monitor.historial import Historial
+
+COLUMNAS = {
+    'generacion': ['central', 'fecha_hora', 'gen_real_mw', 'caudal_m3s', 'uso_pct', 'online'],
+    'caudales':   ['estacion', 'bna', 'fecha_hora', 'caudal_m3s', 'altura_m'],
+}
+
+
+@pytest.fixture(autouse=True)
+def base(tmp_path, monkeypatch):
+    historial = Historial(str(tmp_path / 'historial.sqlite3'))
+    registro = Registro([{'nombre': 'Central A', 'id': 1, 'lat': -37, 'lon': -71},
+                         {'nombre': 'Central B', 'id': 2, 'lat': -37, 'lon': -71}],
+                        [{'nombre': 'Estación', 'lat': -37, 'lon': -71, 'bna': '08380008-9'}])
+    monkeypatch.setattr(exportar, 'historial', historial)
+    monkeypatch.setattr(exportar, 'registro', registro)
+    for id_central in (1, 2):
+        historial.guardar(id_central, [{'fecha_hora': f'2024-06-01 0{h}:00:00', 'gen_real_mw': 10.0 * h} for h in range(3)])
+    historial.guardar_caudales('08380008-9', [{'fecha_hora': f'2024-06-01 0{h}:00:00', 'caudal_m3s': 5.0, 'altura_m': None}
+                                              for h in range(3)])
+    return historial
+
+
+def _leer(contenido, formato):
+    if formato == 'csv':
+        return pd.read_csv(io.BytesIO(contenido))
+    if formato == 'parquet':
+        return pd.read_parquet(io.BytesIO(contenido))
+    return pa.ipc.open_stream(pa.py_buffer(contenido)).read_all().to_pandas()
+
+
+@pytest.mark.parametrize('formato', list(exportar.FORMATOS))
+@pytest.mark.parametrize('datos', list(COLUMNAS))
+def test_exporta_por_lotes(formato, datos):
+    destino = io.BytesIO()
+    filas = exportar.exportar(destino, formato, datos, lote=2)
+    marco = _leer(destino.getvalue(), formato)
+
+    assert filas == len(marco) == (6 if datos == 'generacion' else 3)
+    assert list(marco.columns) == COLUMNAS[datos]
+    if datos == 'generacion':
+        assert sorted(marco['central'].unique()) == ['Central A', 'Central B']
+        assert sorted(marco['gen_real_mw']) == [0, 0, 10, 10, 20, 20]
+    else:
+        assert marco['altura_m'].isna().all()
+    if formato == 'csv':
+        # Un solo encabezado aunque haya varios lotes.
+        assert destino.getvalue().decode().count(COLUMNAS[datos][0]) == 1
+
+
+@pytest.mark.parametrize('formato', list(exportar.FORMATOS))
+@pytest.mark.parametrize('datos', list(COLUMNAS))
+def test_rango_vacio_conserva_columnas(formato, datos):
+    destino = io.BytesIO()
+    assert exportar.exportar(destino, formato, datos, desde='2025-01-01') == 0
+    marco = _leer(destino.getvalue(), formato)
+
+    assert marco.empty
+    assert list(marco.columns) == COLUMNAS[datos]
+    if formato != 'csv':
+        # El esquema vacío lleva los mismos tipos que uno con datos.
+        assert str(marco['fecha_hora'].dt.tz) == 'America/Santiago'
+        assert marco['caudal_m3s'].dtype == 'float32'
+
+
+def test_formato_desconocido():
+    with pytest.raises(ValueError):
+        exportar.exportar(io.BytesIO(), 'xlsx')
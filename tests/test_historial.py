@@ -0,0 +1,26 @@
+"""Huecos en la historia guardada y tramos que se piden para completarla."""
+from monitor.cen import _tramos
+from monitor.historial import Historial
+
+
+def _horas(dia, horas=range(24)):
+    return [{'fecha_hora': f'{dia} {h:02d}:00:00', 'gen_real_mw': 1.0} for h in horas]
+
+
+def test_dias_incompletos_incluye_huecos_internos():
+    historial = Historial(':memory:')
+    historial.guardar(1, _horas('2024-01-01') + _horas('2024-01-03', range(12)) + _horas('2024-01-05'))
+    historial.guardar(2, _horas('2024-01-02'))
+    assert historial.dias_incompletos(1, '2024-01-01', '2024-01-06') == ['2024-01-02', '2024-01-03', '2024-01-04']
+
+
+def test_dias_incompletos_historia_completa():
+    historial = Historial(':memory:')
+    historial.guardar(1, _horas('2024-01-01') + _horas('2024-01-02'))
+    assert historial.dias_incompletos(1, '2024-01-01', '2024-01-03') == []
+
+
+def test_tramos_agrupa_dias_consecutivos():
+    assert _tramos(['2024-01-30', '2024-01-31', '2024-02-01', '2024-02-05']) == [
+        ('2024-01-30', '2024-02-02'), ('2024-02-05', '2024-02-06')]
+    assert _tramos([]) == []
@@ -0,0 +1,44 @@
+"""`Poller.refrescar` interactivo frente a un ciclo en curso."""
+import threading
+import time
+
+from monitor.poller import AlmacenDatos, Poller
+
+
+class _Almacen(AlmacenDatos):
+    def __init__(self):
+        super().__init__()
+        self.publicaciones = 0
+
+    def publicar(self, datos, ts=None):
+        self.publicaciones += 1
+        super().publicar(datos, ts)
+
+
+def _poller():
+    return Poller('k', _Almacen(), centrales={}, pronosticador=None)
+
+
+def test_desiste_si_el_ciclo_en_curso_no_termina():
+    poller = _poller()
+    with poller._ciclo_lock:
+        inicio = time.monotonic()
+        assert poller.refrescar(espera_max=0.2) is False
+        assert time.monotonic() - inicio < 1
+    assert poller.almacen.publicaciones == 0
+
+
+def test_se_suma_al_ciclo_en_curso():
+    poller = _poller()
+    poller._ciclo_lock.acquire()
+    threading.Timer(0.1, poller._ciclo_lock.release).start()
+    assert poller.refrescar(espera_max=2) is True
+    # Lo publicó el ciclo que estaba en curso: no se lanza otro.
+    assert poller.almacen.publicaciones == 0
+
+
+def test_rellenar_no_espera_al_ciclo(monkeypatch):
+    poller = _poller()
+    monkeypatch.setattr('monitor.poller.consultar_en_paralelo', lambda funcion, tareas: iter(()))
+    with poller._ciclo_lock:
+        assert poller.rellenar(7) is True
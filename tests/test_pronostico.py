@@ -0,0 +1,89 @@
+"""El avance incremental de los modelos coincide con un ajuste completo y el pronóstico es utilizable."""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from monitor.centrales import Registro
+from monitor.historial import historial
+from monitor.pronostico import Pronosticador, ajustar, estado_inicial
+
+HORAS = 10 * 24
+
+
+def _serie(n_centrales=3, horas=HORAS, semilla=0):
+    rng = np.random.default_rng(semilla)
+    h = np.arange(horas)[:, None]
+    base = np.array([40.0, 120.0, 5.0][:n_centrales])
+    y = base * (0.7 + 0.3 * np.sin(2 * np.pi * (h - 6) / 24)) + rng.normal(0, 2, (horas, n_centrales))
+    y = np.clip(y, 0, None)
+    y[rng.random(y.shape) < 0.05] = np.nan
+    return y, 480_000 + np.arange(horas)
+
+
+def _comparar(a, b):
+    assert a.keys() == b.keys()
+    for clave in a:
+        np.testing.assert_allclose(a[clave], b[clave], rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=clave)
+
+
+def test_avance_por_lotes_igual_a_ajuste_completo():
+    y, tiempos = _serie()
+    completo = ajustar(estado_inicial(3), y, tiempos)
+
+    estado = estado_inicial(3)
+    for inicio, fin in ((0, 50), (50, 51), (51, 200), (200, HORAS)):
+        estado = ajustar(estado, y[inicio:fin], tiempos[inicio:fin])
+    _comparar(estado, completo)
+
+
+def test_horas_atrasadas_se_incorporan_despues():
+    y, tiempos = _serie()
+    completo = ajustar(estado_inicial(3), y, tiempos)
+
+    # La central 2 publica sus últimas 6 horas del primer lote recién en el segundo.
+    primero = y[:150].copy()
+    primero[-6:, 2] = np.nan
+    estado = ajustar(estado_inicial(3), primero, tiempos[:150])
+    assert estado['ultima'][2] < estado['ultima'][0]
+    estado = ajustar(estado, y[144:], tiempos[144:])
+    _comparar(estado, completo)
+
+
+@pytest.fixture
+def centrales():
+    nombres = ('Prueba A', 'Prueba B', 'Prueba C')
+    return Registro([{'nombre': n, 'id': 9001 + i, 'lat': -37, 'lon': -71, 'capacidad_mw': 150} for i, n in enumerate(nombres)])
+
+
+def _guardar(y, columnas, inicio, desde, hasta):
+    for j in columnas:
+        registros = [{'fecha_hora': (inicio + timedelta(hours=h)).strftime('%Y-%m-%d %H:%M:%S'), 'gen_real_mw': float(y[h, j])}
+                     for h in range(desde, hasta) if not np.isnan(y[h, j])]
+        historial.guardar(9001 + j, registros)
+
+
+def test_pronosticador_incremental_igual_a_reajuste(centrales):
+    y, _ = _serie(semilla=1)
+    inicio = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=HORAS)
+    _guardar(y, (0, 1), inicio, 0, 200)
+    # La tercera central va atrasada: sus últimas horas llegan con el sondeo siguiente.
+    _guardar(y, (2,), inicio, 0, 190)
+    incremental = Pronosticador(centrales, horizonte=48, dias=14)
+    incremental.actualizar()
+
+    _guardar(y, (0, 1), inicio, 200, HORAS)
+    _guardar(y, (2,), inicio, 190, HORAS)
+    pronosticos = incremental.actualizar()
+    completo = Pronosticador(centrales, horizonte=48, dias=14)
+    completo.actualizar()
+
+    _comparar(incremental._estado, completo._estado)
+    assert pronosticos.keys() == set(centrales)
+    for df in pronosticos.values():
+        assert len(df) == 48
+        for columna in ('gen_mw', 'gen_inf', 'gen_sup', 'caudal_m3s'):
+            valores = df[columna].to_numpy()
+            assert np.isfinite(valores).all(), columna
+            assert (valores >= 0).all(), columna
+        assert (df['gen_inf'] <= df['gen_mw']).all() and (df['gen_mw'] <= df['gen_sup']).all()